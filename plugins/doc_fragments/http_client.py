@@ -0,0 +1,147 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+
+class ModuleDocFragment(object):
+
+    # HTTP client options of all modules that connect to the SAP Launchpad.
+    DOCUMENTATION = r'''
+options:
+  pool_connections:
+    description:
+      - The number of hosts to keep HTTP connection pools for.
+    required: false
+    type: int
+    default: 10
+  pool_maxsize:
+    description:
+      - The maximum number of HTTP connections kept open per host.
+      - Should be at least the number of concurrent requests, for example C(max_workers), so that connections are reused.
+    required: false
+    type: int
+    default: 10
+  pool_block:
+    description:
+      - Whether requests wait for a free connection when all connections to a host are in use.
+      - If C(false), additional connections are opened and closed again after the request.
+    required: false
+    type: bool
+    default: false
+  keep_alive:
+    description:
+      - Whether HTTP connections are kept open and reused between requests, with TCP keep-alive probes on idle connections.
+      - If C(false), a new connection is opened for every request.
+    required: false
+    type: bool
+    default: true
+  connect_timeout:
+    description:
+      - The number of seconds to wait for a connection to be established.
+    required: false
+    type: int
+    default: 30
+  read_timeout:
+    description:
+      - The number of seconds to wait for data on an open connection, for a response or between parts of a download.
+    required: false
+    type: int
+    default: 120
+  low_speed_limit:
+    description:
+      - The minimum transfer rate of downloads in bytes per second.
+      - A download that stays below this rate for C(low_speed_time) seconds is aborted and retried, resuming from the
+        downloaded part if the server supports it.
+      - Set to C(0) to disable the check.
+    required: false
+    type: int
+    default: 1024
+  low_speed_time:
+    description:
+      - The number of seconds a download may stay below C(low_speed_limit) before it is aborted and retried.
+    required: false
+    type: int
+    default: 120
+  retries:
+    description:
+      - The maximum number of retries of a failed request, download link resolution or download.
+      - Delays between retries grow randomly from one second, with decorrelated jitter. A C(Retry-After) header of the failed response is used as delay instead.
+    required: false
+    type: int
+    default: 3
+  retry_budget:
+    description:
+      - The maximum number of retries of all requests and downloads of the task.
+      - When the budget is used up, errors are raised without further retries.
+    required: false
+    type: int
+    default: 30
+  retry_max_delay:
+    description:
+      - The maximum number of seconds to wait before a retry, also if a C(Retry-After) header requests a longer delay.
+    required: false
+    type: int
+    default: 60
+  retry_max_wait:
+    description:
+      - The maximum number of seconds to wait before all retries of the task together.
+      - When this time is used up, errors are raised without further retries.
+    required: false
+    type: int
+    default: 600
+  circuit_breaker_threshold:
+    description:
+      - The number of consecutive failed requests to a host after which requests to it fail at once, without being sent.
+      - Failed requests are connection errors, timeouts and server errors that remain after the retries.
+      - Set to C(0) to disable the circuit breaker.
+    required: false
+    type: int
+    default: 5
+  circuit_breaker_cooldown:
+    description:
+      - The number of seconds requests to a failing host fail at once.
+      - Afterwards, one request is sent as probe. If it succeeds, requests are sent again, otherwise they fail for another cooldown.
+    required: false
+    type: int
+    default: 60
+  circuit_breaker_state_dir:
+    description:
+      - A directory to keep the state of the circuit breaker in, with one file per host.
+      - All tasks that use the same directory on the same machine share the state, so that a failing host is detected once for all of them.
+      - Each task counts the failed requests itself. When a circuit opens, lets a probe through or closes, the other tasks follow within two seconds.
+      - If not set, the state is kept in memory for the task.
+    required: false
+    type: path
+  cassette_path:
+    description:
+      - A file to record all HTTP responses to, or to replay them from without network access, depending on C(cassette_mode).
+      - Intended for offline benchmarks and regression tests, for example to compare the CPU time of different versions.
+      - Cookie values are not recorded, but response bodies can contain session data, so the file is created readable only by its owner.
+      - Not supported together with C(engine=asyncio).
+    required: false
+    type: path
+  cassette_mode:
+    description:
+      - Whether responses are recorded to C(cassette_path) or replayed from it.
+      - Replayed responses are matched by method and URL, in the recorded order.
+      - Volatile query parameters, like the C(_) timestamp of the Maintenance Planner API, are ignored.
+    required: false
+    type: str
+    default: record
+    choices:
+      - record
+      - replay
+  cassette_max_body_size:
+    description:
+      - The maximum number of bytes of a response body that are recorded. Larger bodies are truncated.
+      - Bodies of streamed responses, like downloads, are not recorded. They are replayed as zero bytes of the recorded size, without C(ETag) header.
+    required: false
+    type: int
+    default: 1048576
+  cassette_replay_latency:
+    description:
+      - Whether replayed responses are delayed by the recorded response time.
+    required: false
+    type: bool
+    default: false
+'''
@@ -0,0 +1,204 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: systems
+
+short_description: Builds an inventory of SAP systems registered in the SAP Launchpad.
+
+description:
+- This inventory plugin queries the SAP Launchpad for registered systems based on a filter string and adds one host per system.
+- The properties of each system are added as host variables, optionally together with the license keys of the system.
+- The systems can be cached with the inventory cache plugins, for example C(jsonfile) or C(redis), so that they are
+  retrieved once per cache timeout instead of with one C(community.sap_launchpad.systems_info) call per host.
+- The inventory source must be a YAML file whose name ends with C(sap_systems.yml) or C(sap_systems.yaml).
+
+version_added: 1.4.0
+
+options:
+  plugin:
+    description:
+      - The name of this plugin, which ensures that the source is used by it.
+    required: true
+    type: str
+    choices:
+      - community.sap_launchpad.systems
+  suser_id:
+    description:
+      - SAP S-User ID.
+    required: true
+    type: str
+    env:
+      - name: SAP_SUSER_ID
+  suser_password:
+    description:
+      - SAP S-User Password.
+    required: true
+    type: str
+    env:
+      - name: SAP_SUSER_PASSWORD
+  filter:
+    description:
+      - An ODATA filter expression to query the systems.
+    required: true
+    type: str
+  fields:
+    description:
+      - A list of system properties to retrieve, for example C(Sysnr), C(sysid) and C(Insnr).
+      - The property in C(hostname_field) is always retrieved.
+      - If not set, all properties are retrieved.
+    required: false
+    type: list
+    elements: str
+  page_size:
+    description:
+      - The number of systems to request per page.
+      - If not set, the page size is chosen by the server. Server-driven paging is always followed.
+    required: false
+    type: int
+  hostname_field:
+    description:
+      - The system property used as inventory hostname.
+      - The system number is unique, while system IDs can be used by several installations.
+      - Systems with an empty value are skipped.
+    required: false
+    type: str
+    default: Sysnr
+  vars_prefix:
+    description:
+      - The prefix of the host variables, which are named after the lowercase system properties, for example C(sap_sysid).
+    required: false
+    type: str
+    default: sap_
+  licenses:
+    description:
+      - Whether to retrieve the license keys of each system into the host variable C(<vars_prefix>licenses).
+      - The license keys of several systems are retrieved with OData $batch requests.
+    required: false
+    type: bool
+    default: false
+
+extends_documentation_fragment:
+  - constructed
+  - inventory_cache
+  - community.sap_launchpad.http_client
+
+author:
+    - Matthias Winzeler (@MatthiasWinzeler)
+    - Marcel Mamula (@marcelmamula)
+'''
+
+
+EXAMPLES = r'''
+# sap_systems.yml
+plugin: community.sap_launchpad.systems
+filter: "Insnr eq '1234567890'"
+fields:
+  - Sysnr
+  - sysid
+  - Insnr
+  - Systxt
+hostname_field: Sysnr
+licenses: true
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: /tmp/sap_systems_cache
+cache_timeout: 3600
+keyed_groups:
+  - key: sap_sysid
+    prefix: sid
+  - key: sap_insnr
+    prefix: installation
+'''
+
+
+from ansible.errors import AnsibleError, AnsibleParserError
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import auth, exceptions
+from ansible_collections.community.sap_launchpad.plugins.module_utils.client import ApiClient, http_client_argument_spec
+from ansible_collections.community.sap_launchpad.plugins.module_utils.systems import api
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+
+    NAME = 'community.sap_launchpad.systems'
+
+    def verify_file(self, path):
+        # Only YAML files with the expected name are used as inventory source for this plugin.
+        return super(InventoryModule, self).verify_file(path) and path.endswith(('sap_systems.yml', 'sap_systems.yaml'))
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        # The systems are read from the cache, unless caching is disabled or the inventory is refreshed.
+        cache_key = self.get_cache_key(path)
+        use_cache = self.get_option('cache') and cache
+        update_cache = self.get_option('cache') and not cache
+
+        systems = None
+        if use_cache:
+            try:
+                systems = self._cache[cache_key]
+            except KeyError:
+                update_cache = True
+
+        if systems is None:
+            systems = self._get_systems()
+
+        if update_cache:
+            self._cache[cache_key] = systems
+
+        self._populate(systems)
+
+    def _get_systems(self):
+        # Retrieves the systems, and if enabled their license keys, with one authenticated session.
+        hostname_field = self.get_option('hostname_field')
+        fields = self.get_option('fields')
+        if fields and hostname_field not in fields:
+            fields = fields + [hostname_field]
+
+        try:
+            client = ApiClient.from_params({option: self.get_option(option) for option in http_client_argument_spec()})
+            auth.login(client, self.get_option('suser_id'), self.get_option('suser_password'))
+            systems = list(api.iter_systems(client, self.get_option('filter'), fields, self.get_option('page_size')))
+
+            if self.get_option('licenses'):
+                system_nrs = [s['Sysnr'] for s in systems if s.get('Sysnr')]
+                licenses = api.get_existing_licenses_of_systems(client, system_nrs, self.get_option('suser_id'))
+                for system in systems:
+                    system['licenses'] = licenses.get(system.get('Sysnr'), [])
+        except ImportError as e:
+            raise AnsibleError(f"Failed to import the required Python library for the SAP systems inventory: {e}")
+        except (exceptions.SapLaunchpadError, api.SystemNotFoundError) as e:
+            raise AnsibleParserError(f"Failed to retrieve SAP systems: {e}")
+        except Exception as e:
+            raise AnsibleParserError(f"An unexpected error occurred while retrieving SAP systems: {type(e).__name__} - {e}")
+
+        return systems
+
+    def _populate(self, systems):
+        # Adds one host per system with its properties as host variables, and the constructed groups and variables.
+        hostname_field = self.get_option('hostname_field')
+        vars_prefix = self.get_option('vars_prefix')
+        strict = self.get_option('strict')
+
+        for system in systems:
+            hostname = system.get(hostname_field)
+            if not hostname:
+                self.display.warning(f"Skipping SAP system without a value for '{hostname_field}': {system.get('Sysnr')}")
+                continue
+
+            hostname = self.inventory.add_host(str(hostname))
+            for name, value in system.items():
+                if name == '__metadata':
+                    continue
+                self.inventory.set_variable(hostname, f'{vars_prefix}{name.lower()}', value)
+
+            host_vars = self.inventory.get_host(hostname).get_vars()
+            self._set_composite_vars(self.get_option('compose'), host_vars, hostname, strict=strict)
+            self._add_host_to_composed_groups(self.get_option('groups'), host_vars, hostname, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option('keyed_groups'), host_vars, hostname, strict=strict)
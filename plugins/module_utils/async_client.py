@@ -0,0 +1,179 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import importlib.util
+import re
+
+from urllib.parse import urlencode, urljoin, urlparse
+
+from . import exceptions
+from .client import _ERROR_PATTERNS, _ERROR_SNIFF_SIZE, classify_error_response
+from .constants import COMMON_HEADERS
+
+# aiohttp is only imported when an AsyncApiClient is created, as only the asyncio download engine uses it.
+HAS_AIOHTTP = importlib.util.find_spec('aiohttp') is not None
+# Placeholder until the first AsyncApiClient is created
+aiohttp = None
+
+# The same limit of redirects as a requests.Session.
+_MAX_REDIRECTS = 30
+
+_REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
+
+def _import_aiohttp():
+    # Imports aiohttp into the module namespace on first use.
+    global aiohttp
+    if aiohttp is None:
+        import aiohttp
+
+
+class _CookieResponse:
+    # Adapts the headers of an aiohttp response to the response interface expected by http.cookiejar.
+    def __init__(self, headers):
+        self._headers = headers
+
+    def info(self):
+        return self
+
+    def get_all(self, name, default=None):
+        return self._headers.getall(name, default)
+
+
+class AsyncApiClient:
+    # An asyncio client for SAP APIs, to multiplex many searches and downloads on one event loop.
+    #
+    # It is created from an authenticated ApiClient and shares its cookie jar and HTTP client options,
+    # so the login is done once with the synchronous client, and cookies set by either client are
+    # visible to the other. Redirects are followed with the same rules as _SessionAllowBasicAuthRedirects,
+    # and responses are checked like in ApiClient.request.
+    #
+    # The client must be used as an asynchronous context manager, which opens and closes its connections:
+    #   async with AsyncApiClient(client) as async_client:
+    #       res = await async_client.get(url)
+    def __init__(self, client):
+        if not HAS_AIOHTTP:
+            raise ImportError("The 'aiohttp' library is required but was not found.")
+        _import_aiohttp()
+        if client.cassette_path:
+            raise exceptions.InvalidOptionError("Recording and replaying HTTP responses is not supported by the asyncio client.")
+
+        self.client = client
+        self.cookies = client.session.cookies
+        self.low_speed_limit = client.low_speed_limit
+        self.low_speed_time = client.low_speed_time
+        self._session = None
+
+    async def __aenter__(self):
+        connect_timeout, read_timeout = self.client.timeout
+        connector = aiohttp.TCPConnector(
+            limit=self.client.pool_connections * self.client.pool_maxsize,
+            limit_per_host=self.client.pool_maxsize,
+            force_close=not self.client.keep_alive
+        )
+        # Cookies are handled with the cookie jar of the synchronous client instead of an aiohttp cookie jar.
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    async def request(self, method, url, headers=None, params=None, data=None, json=None, allow_redirects=True):
+        # Makes an HTTP request and returns the aiohttp response, whose body has not been read yet.
+        # The caller must read or release the response.
+        import asyncio
+
+        request_headers = COMMON_HEADERS.copy()
+        if not self.client.keep_alive:
+            request_headers['Connection'] = 'close'
+        request_headers.update(headers or {})
+
+        if params:
+            url = url + ('&' if '?' in url else '?') + urlencode(params)
+
+        # Like in ApiClient.request, failures are only counted for the requested host, not for the hosts of redirects.
+        host = urlparse(url).hostname
+        self.client.circuit_breaker.before_request(host)
+        try:
+            res = await self._request_following_redirects(method, url, request_headers, data, json, allow_redirects)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self.client.circuit_breaker.record_failure(host)
+            raise
+        if res.status >= 500:
+            self.client.circuit_breaker.record_failure(host)
+        else:
+            self.client.circuit_breaker.record_success(host)
+
+        await self._check_response(res)
+        return res
+
+    async def _request_following_redirects(self, method, url, request_headers, data, json, allow_redirects):
+        # Sends a request and follows its redirects, returning the last response.
+        import urllib.request
+
+        for _i in range(_MAX_REDIRECTS + 1):
+            res = await self._session.request(method, url, headers=self._add_cookie_header(url, request_headers),
+                                              data=data, json=json, allow_redirects=False)
+            self.cookies.extract_cookies(_CookieResponse(res.headers), urllib.request.Request(url))
+
+            location = res.headers.get('Location')
+            if not allow_redirects or res.status not in _REDIRECT_STATUS_CODES or not location:
+                return res
+
+            res.release()
+            url = urljoin(str(res.url), location)
+
+            # Like requests, a redirected POST becomes a GET, except for 307 and 308.
+            if (res.status == 303 and method != 'HEAD') or (res.status in (301, 302) and method == 'POST'):
+                method, data, json = 'GET', None, None
+                request_headers.pop('Content-Type', None)
+
+            # Like _SessionAllowBasicAuthRedirects, the Authorization header is kept for sap.com hosts only.
+            if 'Authorization' in request_headers and not re.match(r'.*sap.com$', urlparse(url).hostname or ''):
+                del request_headers['Authorization']
+
+        raise aiohttp.ClientError(f"Exceeded {_MAX_REDIRECTS} redirects: {url}")
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    def response_error(self, res, status, message):
+        # Returns the exception raised by the client for an unsuccessful response with the given status.
+        return aiohttp.ClientResponseError(res.request_info, res.history, status=status, message=message, headers=res.headers)
+
+    def _add_cookie_header(self, url, headers):
+        # Returns the request headers with the cookies of the shared cookie jar for the URL.
+        import urllib.request
+
+        cookie_request = urllib.request.Request(url)
+        self.cookies.add_cookie_header(cookie_request)
+        cookie_header = cookie_request.get_header('Cookie')
+        return dict(headers, Cookie=cookie_header) if cookie_header else headers
+
+    async def _check_response(self, res):
+        # Performs the same error handling for SAP API responses as ApiClient.request.
+        # Only the first bytes of the body are read for the status codes that carry an error message.
+        if res.status in _ERROR_PATTERNS:
+            body_head = b''
+            while len(body_head) < _ERROR_SNIFF_SIZE:
+                chunk = await res.content.read(_ERROR_SNIFF_SIZE - len(body_head))
+                if not chunk:
+                    break
+                body_head += chunk
+            error = classify_error_response(res.status, body_head)
+            if error:
+                res.release()
+                raise error
+
+        if res.status >= 400:
+            res.release()
+            raise self.response_error(res, res.status, res.reason)
@@ -2,6 +2,7 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import importlib.util
 import json
 import re
 from functools import wraps
@@ -11,21 +12,10 @@ from urllib.parse import parse_qs, quote_plus, urljoin
 from . import constants as C
 from . import exceptions
 
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    HAS_BS4 = False
-    BeautifulSoup = None
-else:
-    HAS_BS4 = True
-
-try:
-    from requests.models import HTTPError
-except ImportError:
-    HAS_REQUESTS = False
-    HTTPError = None
-else:
-    HAS_REQUESTS = True
+# bs4 is only imported when an HTML page is parsed, so module runs that skip the login do not load it.
+HAS_BS4 = importlib.util.find_spec('bs4') is not None
+# requests is only imported by the functions that raise its HTTPError, like the ApiClient that sends the requests.
+HAS_REQUESTS = importlib.util.find_spec('requests') is not None
 
 _GIGYA_SDK_BUILD_NUMBER = None
 
@@ -64,7 +54,7 @@ def login(client, username, password):
     # login with email address of SAP Universal ID will otherwise
     # incorrectly default to the last used SAP User ID
     if not re.match(r'^[sS]\d+$', username):
-        raise ValueError('Please login with SAP User ID (like `S1234567890`)')
+        raise exceptions.AuthenticationError('Please login with SAP User ID (like `S1234567890`)')
 
     endpoint = C.URL_LAUNCHPAD
     meta = {}
@@ -75,7 +65,8 @@ def login(client, username, password):
             meta['j_username'] = username
             meta['j_password'] = password
         if 'changePassword' in endpoint:
-            raise ValueError('SAP ID Service has requested `Change Your Password`, possibly the password is too old. Please reset manually and try again.')
+            raise exceptions.AuthenticationError(
+                'SAP ID Service has requested `Change Your Password`, possibly the password is too old. Please reset manually and try again.')
 
     if 'authn' in endpoint:
         support_endpoint, support_meta = get_sso_endpoint_meta(client, endpoint, data=meta)
@@ -116,7 +107,34 @@ def get_sso_endpoint_meta(client, url, **kwargs):
     # Scrapes an HTML page to find the next SSO form action URL and its input fields.
     method = 'POST' if kwargs.get('data') or kwargs.get('json') else 'GET'
     res = client.request(method, url, **kwargs)
-    soup = BeautifulSoup(res.content, features='lxml')
+    form = parse_sso_form(res.url, res.content)
+    if form is None:
+        res.status_code = 401
+        res.reason = 'Unauthorized'
+        res.raise_for_status()
+
+    return form
+
+
+@require_bs4
+async def async_get_sso_endpoint_meta(async_client, url, **kwargs):
+    # The asyncio version of get_sso_endpoint_meta, which sends the request with an AsyncApiClient.
+    method = 'POST' if kwargs.get('data') else 'GET'
+    res = await async_client.request(method, url, **kwargs)
+    form = parse_sso_form(str(res.url), await res.read())
+    if form is None:
+        raise async_client.response_error(res, 401, 'Unauthorized')
+
+    return form
+
+
+@require_bs4
+def parse_sso_form(url, content):
+    # Parses the HTML page of an SSO endpoint into the next form action URL and its input fields.
+    # Returns None if the page reports that the credentials were not accepted.
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, features='lxml')
 
     # SSO returns 200 OK even when the crendential is wrong, so we need to
     # detect the HTTP body for auth error message. This is only necessary
@@ -124,17 +142,16 @@ def get_sso_endpoint_meta(client, url, **kwargs):
     # during Gygia auth.
     error_message = soup.find('div', {'id': 'globalMessages'})
     if error_message and 'we could not authenticate you' in error_message.text:
-        res.status_code = 401
-        res.reason = 'Unauthorized'
-        res.raise_for_status()
+        return None
 
     form = soup.find('form')
     if not form:
+        text = content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
         raise ValueError(
-            f'Unable to find form: {res.url}\nContent:\n{res.text}')
+            f'Unable to find form: {url}\nContent:\n{text}')
     inputs = form.find_all('input')
 
-    endpoint = urljoin(res.url, form['action'])
+    endpoint = urljoin(url, form['action'])
     metadata = {
         i.get('name'): i.get('value')
         for i in inputs if i.get('type') != 'submit' and i.get('name')
@@ -262,6 +279,8 @@ def _select_account(client, uid, sid, id_token):
 def _get_sdk_build_number(client, api_key):
     # Fetches the gigya.js file to extract and cache the SDK build number.
     global _GIGYA_SDK_BUILD_NUMBER
+    from requests.exceptions import HTTPError
+
     if _GIGYA_SDK_BUILD_NUMBER is not None:
         return _GIGYA_SDK_BUILD_NUMBER
 
@@ -279,6 +298,8 @@ def _get_sdk_build_number(client, api_key):
 @require_requests
 def _cdc_api_request(client, endpoint, saml_params, query_params):
     # Helper to make requests to the Gigya/CDC API, handling common parameters and errors.
+    from requests.exceptions import HTTPError
+
     url = '/'.join((C.URL_ACCOUNT_CDC_API, endpoint))
 
     query = '&'.join([f'{k}={v}' for k, v in saml_params.items()])
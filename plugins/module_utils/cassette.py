@@ -0,0 +1,187 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+# Recording and replaying of the HTTP responses of an ApiClient, see the cassette_path option.
+# This module is only imported when an ApiClient is created with a cassette.
+
+import base64
+import collections
+import http.client
+import io
+import json
+import os
+import threading
+import time
+
+from urllib.parse import urlsplit, urlunsplit
+
+from . import exceptions
+from .http_session import _PoolingHTTPAdapter
+
+try:
+    import urllib3
+    from urllib3._collections import HTTPHeaderDict
+except ImportError:
+    # Placeholders to prevent errors on module load
+    urllib3 = None
+    HTTPHeaderDict = None
+
+
+# Response headers that are not recorded, as recorded bodies are stored decoded and their length can change.
+_CASSETTE_SKIPPED_HEADERS = frozenset(['content-encoding', 'transfer-encoding', 'content-length'])
+
+# Query parameters that change with every request, like the cache busting timestamp of the Maintenance Planner API.
+# They are removed from the URLs of the cassette, so that replayed requests match the recorded ones.
+_CASSETTE_VOLATILE_PARAMS = frozenset(['_'])
+
+# The value of all recorded cookies. Cookies are recorded with their name and attributes, so that code that checks
+# for a cookie behaves the same when replaying, but the cassette does not contain the session of the recording.
+_CASSETTE_COOKIE_VALUE = 'recorded'
+
+
+def _cassette_url(url):
+    # Returns the URL of a request without volatile query parameters. Other parameters are kept as they are encoded.
+    parts = urlsplit(url)
+    query = '&'.join(p for p in parts.query.split('&') if p and p.split('=', 1)[0] not in _CASSETTE_VOLATILE_PARAMS)
+    return urlunsplit(parts._replace(query=query))
+
+
+def _cassette_header(name, value):
+    # Returns the value of a response header as it is recorded, with the value of a Set-Cookie header replaced.
+    if name.lower() != 'set-cookie':
+        return value
+    cookie, separator, attributes = value.partition(';')
+    return f"{cookie.split('=', 1)[0].strip()}={_CASSETTE_COOKIE_VALUE}{separator}{attributes}"
+
+
+class _ReplayedOriginalResponse:
+    # Stands in for the http.client response of a replayed response, from which requests extracts the cookies.
+    def __init__(self, msg):
+        self.msg = msg
+
+    # The replayed body is not read through this object, so there is nothing to close.
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class _SyntheticBody(io.RawIOBase):
+    # A response body of the given size that consists of zero bytes, replayed for bodies that were not recorded.
+    def __init__(self, size):
+        super().__init__()
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = min(len(b), self._remaining)
+        b[:size] = bytes(size)
+        self._remaining -= size
+        return size
+
+
+class _CassetteHTTPAdapter(_PoolingHTTPAdapter):
+    # An HTTPAdapter that records all responses to a cassette file, or replays them from it without network access.
+    #
+    # The cassette is a JSON Lines file with one response per line, in the order in which they were received,
+    # including the responses of redirects. Replayed responses are matched by method and URL in the recorded order,
+    # so that repeated requests, like polling, replay their recorded sequence.
+    # Bodies of streamed responses, like downloads, are not recorded: they are replayed as zero bytes of the recorded
+    # size, without the ETag header, as their checksum would not match. Other bodies larger than max_body_size are
+    # truncated. URLs are recorded and matched without volatile query parameters, and cookie values are not recorded.
+    # Recorded bodies can still contain session data, like SAML assertions, so the cassette is only readable by its owner.
+    def __init__(self, cassette_path, mode='record', max_body_size=1048576, replay_latency=False, **kwargs):
+        super().__init__(**kwargs)
+        self._cassette_path = cassette_path
+        self._mode = mode
+        self._max_body_size = max_body_size
+        self._replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._responses = collections.defaultdict(collections.deque)
+
+        if mode == 'record':
+            os.close(os.open(cassette_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+            return
+
+        with open(cassette_path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses[(entry['method'], _cassette_url(entry['url']))].append(entry)
+
+    def send(self, request, stream=False, **kwargs):
+        if self._mode == 'replay':
+            return self._replay(request)
+
+        start = time.monotonic()
+        res = super().send(request, stream=stream, **kwargs)
+        self._record(request, res, stream, time.monotonic() - start)
+        return res
+
+    def _record(self, request, res, stream, elapsed):
+        # Appends a response to the cassette. The body of a response that is not streamed is read here.
+        raw_headers = res.raw.headers if res.raw is not None else {}
+        header_items = raw_headers.iteritems() if hasattr(raw_headers, 'iteritems') else raw_headers.items()
+        entry = {
+            'method': request.method,
+            'url': _cassette_url(request.url),
+            'status': res.status_code,
+            'reason': res.reason,
+            'headers': [[name, _cassette_header(name, value)] for name, value in header_items
+                        if name.lower() not in _CASSETTE_SKIPPED_HEADERS],
+            'elapsed': round(elapsed, 3),
+        }
+        if stream:
+            content_length = res.headers.get('Content-Length', '')
+            entry['body_size'] = int(content_length) if content_length.isdigit() else 0
+        else:
+            body = res.content or b''
+            entry['body'] = base64.b64encode(body[:self._max_body_size]).decode('ascii')
+            entry['truncated'] = len(body) > self._max_body_size
+
+        with self._lock:
+            with open(self._cassette_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def _replay(self, request):
+        # Builds the response of a request from the next recorded response with the same method and URL.
+        with self._lock:
+            recorded = self._responses.get((request.method, _cassette_url(request.url)))
+            if not recorded:
+                raise exceptions.SapLaunchpadError(
+                    f"No recorded response for {request.method} {request.url} in the cassette {self._cassette_path}.")
+            entry = recorded.popleft()
+
+        if self._replay_latency:
+            time.sleep(entry['elapsed'])
+
+        synthetic = 'body' not in entry
+        if synthetic:
+            body, body_size = _SyntheticBody(entry['body_size']), entry['body_size']
+        else:
+            content = base64.b64decode(entry['body'])
+            body, body_size = io.BytesIO(content), len(content)
+
+        headers = HTTPHeaderDict()
+        msg = http.client.HTTPMessage()
+        for name, value in entry['headers']:
+            if synthetic and name.lower() == 'etag':
+                continue
+            headers.add(name, value)
+            msg[name] = value
+        headers['Content-Length'] = str(body_size)
+
+        raw = urllib3.HTTPResponse(
+            body=body,
+            headers=headers,
+            status=entry['status'],
+            reason=entry['reason'],
+            preload_content=False,
+            decode_content=False,
+            original_response=_ReplayedOriginalResponse(msg),
+        )
+        return self.build_response(request, raw)
@@ -2,65 +2,454 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import copy
+import importlib.util
+import json
+import os
+import random
 import re
+import threading
+import time
 
-from urllib.parse import urlparse
-
-from .constants import COMMON_HEADERS
-
-try:
-    import requests
-    from requests.adapters import HTTPAdapter
-    _RequestsSession = requests.Session
-except ImportError:
-    HAS_REQUESTS = False
-    # Placeholders to prevent errors on module load
-    requests = None
-    HTTPAdapter = object
-    _RequestsSession = object
-else:
-    HAS_REQUESTS = True
-
-try:
-    import urllib3
-except ImportError:
-    HAS_URLLIB3 = False
-    # Placeholder to prevent errors on module load
-    urllib3 = None
-else:
-    HAS_URLLIB3 = True
-
-
-class _SessionAllowBasicAuthRedirects(_RequestsSession):
-    # By default, the `Authorization` header for Basic Auth will be removed
-    # if the redirect is to a different host.
-    # In our case, the DirectDownloadLink with `softwaredownloads.sap.com` domain
-    # will be redirected to `origin.softwaredownloads.sap.com`,
-    # so we need to override `rebuild_auth` to perseve the Authorization header
-    # for sap.com domains.
-    # This is only required for legacy API.
-    def rebuild_auth(self, prepared_request, response):
-        # The parent class might not be a real requests.Session if requests is not installed.
-        if HAS_REQUESTS and 'Authorization' in prepared_request.headers:
-            request_hostname = urlparse(prepared_request.url).hostname
-            if not re.match(r'.*sap.com$', request_hostname):
-                del prepared_request.headers['Authorization']
-
-
-def _is_updated_urllib3():
-    # `method_whitelist` argument for Retry is deprecated since 1.26.0,
-    # and will be removed in v2.0.0.
-    # Typically, the default version on RedHat 8.2 is 1.24.2,
-    # so we need to check the version of urllib3 to see if it's updated.
-    if not HAS_URLLIB3:
-        return False
-
-    urllib3_version = urllib3.__version__.split('.')
-    if len(urllib3_version) == 2:
-        urllib3_version.append('0')
-    major, minor, patch = urllib3_version
-    major, minor, patch = int(major), int(minor), int(patch)
-    return (major, minor, patch) >= (1, 26, 0)
+from datetime import datetime, timezone
+from urllib.parse import quote, urlencode, urlparse
+
+from . import exceptions
+from .constants import COMMON_HEADERS, MAX_RETRY_TIMES
+
+# requests and urllib3 are only imported when an ApiClient is created, see http_session,
+# so module runs that return before sending a request do not load them.
+HAS_REQUESTS = importlib.util.find_spec('requests') is not None
+HAS_URLLIB3 = importlib.util.find_spec('urllib3') is not None
+
+
+def http_client_argument_spec():
+    # Returns the argument spec of the HTTP client options, see the http_client documentation fragment.
+    return dict(
+        pool_connections=dict(type='int', default=10),
+        pool_maxsize=dict(type='int', default=10),
+        pool_block=dict(type='bool', default=False),
+        keep_alive=dict(type='bool', default=True),
+        connect_timeout=dict(type='int', default=30),
+        read_timeout=dict(type='int', default=120),
+        low_speed_limit=dict(type='int', default=1024),
+        low_speed_time=dict(type='int', default=120),
+        retries=dict(type='int', default=MAX_RETRY_TIMES),
+        retry_budget=dict(type='int', default=30),
+        retry_max_delay=dict(type='int', default=60),
+        retry_max_wait=dict(type='int', default=600),
+        circuit_breaker_threshold=dict(type='int', default=5),
+        circuit_breaker_cooldown=dict(type='int', default=60),
+        circuit_breaker_state_dir=dict(type='path'),
+        cassette_path=dict(type='path'),
+        cassette_mode=dict(type='str', default='record', choices=['record', 'replay']),
+        cassette_max_body_size=dict(type='int', default=1048576),
+        cassette_replay_latency=dict(type='bool', default=False),
+    )
+
+
+# Number of bytes at the start of a 403 or 404 response body that are searched for known SAP error messages.
+# Reading more is not needed, and would download complete files for streamed downloads.
+_ERROR_SNIFF_SIZE = 64 * 1024
+
+# Known SAP error messages of 403 and 404 responses, with the exception type and message raised for them.
+_ERROR_PATTERNS = {
+    403: [
+        (b'You are not authorized to download this file', exceptions.AuthorizationError,
+         'You are not authorized to download this file.'),
+        (b'Account Temporarily Locked Out', exceptions.AuthenticationError,
+         'Account Temporarily Locked Out. Please reset password to regain access and try again.'),
+    ],
+    404: [
+        (b'The file you have requested cannot be found', exceptions.FileNotFoundError,
+         'The file you have requested cannot be found.'),
+    ],
+}
+
+
+def classify_error_response(status_code, body_head):
+    # Returns the exception for a known SAP error message in the first bytes of a response body, or None.
+    for pattern, exception_type, message in _ERROR_PATTERNS.get(status_code, []):
+        if pattern in body_head:
+            return exception_type(message)
+    return None
+
+
+class _PrefixedRawStream:
+    # Wraps the raw body stream of a streamed response, of which the first bytes were already read.
+    # The bytes already read are returned first, so that the body can still be read completely.
+    # They were read with decode_content=True, as requests does for iter_content and content.
+    def __init__(self, prefix, raw):
+        self._prefix = prefix
+        self._raw = raw
+
+    def __getattr__(self, name):
+        # read1 is only offered if the wrapped stream has it, as readers fall back to read otherwise.
+        if name == 'read1':
+            getattr(self._raw, 'read1')
+            return self._read1
+        return getattr(self._raw, name)
+
+    def _read1(self, amt=None, *args, **kwargs):
+        # Returns the bytes already read first, without reading from the network.
+        if self._prefix:
+            return self.read(amt if amt is not None else len(self._prefix))
+        return self._raw.read1(amt, *args, **kwargs)
+
+    def read(self, amt=None, *args, **kwargs):
+        prefix, self._prefix = self._prefix, b''
+        if amt is None:
+            return prefix + self._raw.read(amt, *args, **kwargs)
+        if prefix:
+            self._prefix = prefix[amt:]
+            return prefix[:amt]
+        return self._raw.read(amt, *args, **kwargs)
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        if self._prefix:
+            prefix, self._prefix = self._prefix, b''
+            yield prefix
+        yield from self._raw.stream(amt, decode_content=decode_content)
+
+
+def _peek_body(res, stream):
+    # Returns the first bytes of a response body.
+    # The body of a streamed response is only read as far as needed, and stays readable from the start.
+    if not stream:
+        return res.content[:_ERROR_SNIFF_SIZE]
+    body_head = res.raw.read(_ERROR_SNIFF_SIZE, decode_content=True) or b''
+    res.raw = _PrefixedRawStream(body_head, res.raw)
+    return body_head
+
+
+# Characters of OData query paths that are kept unencoded in the request lines of a $batch body.
+_ODATA_PATH_SAFE_CHARS = "/?$=&'(),:*"
+
+
+def build_odata_batch(query_paths, headers=None):
+    # Builds the body of an OData $batch request with one GET operation per query path,
+    # relative to the service root the batch is posted to.
+    # Returns the Content-Type header value for the request and the multipart body.
+    import uuid
+
+    boundary = f'batch_{uuid.uuid4()}'
+    lines = []
+    for query_path in query_paths:
+        lines += [
+            f'--{boundary}',
+            'Content-Type: application/http',
+            'Content-Transfer-Encoding: binary',
+            '',
+            f'GET {quote(query_path, safe=_ODATA_PATH_SAFE_CHARS)} HTTP/1.1',
+        ]
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        lines += ['', '']
+    lines.append(f'--{boundary}--')
+    return f'multipart/mixed; boundary={boundary}', '\r\n'.join(lines) + '\r\n'
+
+
+def parse_odata_batch(content_type, body):
+    # Parses the body of an OData $batch response into one (status_code, body) tuple per operation, in request order.
+    # Raises ValueError if the response is not a multipart response with plain operations.
+    match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+    if not match:
+        raise ValueError(f"The $batch response is not a multipart response: '{content_type}'")
+
+    operations = []
+    for part in body.split(f'--{match.group(1)}')[1:]:
+        if part.startswith('--'):
+            break
+        # Each part consists of its MIME headers, the status line and headers of the operation, and its body.
+        sections = re.split(r'\r?\n\r?\n', part.strip(), maxsplit=2)
+        status_line = sections[1].splitlines()[0].split() if len(sections) > 1 and sections[1] else []
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+            raise ValueError(f"The $batch response contains an unexpected part: '{part[:100]}'")
+        operations.append((int(status_line[1]), sections[2].strip() if len(sections) > 2 else ''))
+    return operations
+
+
+# Delay in seconds before the first retry of an operation, from which the delays of further retries grow.
+_RETRY_BASE_DELAY = 1
+
+
+def _parse_retry_after(value):
+    # Returns the delay in seconds of a Retry-After header value, which is either seconds or an HTTP date.
+    # Returns None for a missing or invalid value.
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    from email.utils import parsedate_to_datetime
+
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    # The retry policy of an ApiClient, used both for the retries of single requests by urllib3
+    # and for the retries of download link resolution and downloads.
+    #
+    # Delays use decorrelated jitter: each delay is random between the base delay and three times the
+    # previous delay of the same operation, so that concurrent operations do not retry in lockstep.
+    # The Retry-After header of a failed response is used as delay instead. All delays are capped at max_delay.
+    # All retries of a client count against one budget of retries and a maximum total wait, after which
+    # errors are raised without further retries.
+    def __init__(self, retries=MAX_RETRY_TIMES, budget=30, max_delay=60, max_wait=600):
+        # retries: The maximum number of retries of a single request or download.
+        # budget: The maximum number of retries of all requests and downloads of the client.
+        # max_delay: The maximum delay in seconds before a retry.
+        # max_wait: The maximum total delay in seconds before all retries of the client.
+        self.retries = retries
+        self.budget = budget
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._retries_used = 0
+        self._waited = 0
+
+    def is_exhausted(self):
+        # Returns whether the retry budget or the maximum total wait is used up.
+        with self._lock:
+            return self._retries_used >= self.budget or self._waited >= self.max_wait
+
+    def next_delay(self, previous_delay=0, retry_after=None, wait=True):
+        # Takes a retry from the budget and returns the delay in seconds before it, or None if no retry is left.
+        # previous_delay: The delay before the previous retry of the same operation, 0 for the first retry.
+        # retry_after: The Retry-After header of the failed response, if any.
+        # wait: Whether to wait before the retry. Retries without delay, like of too slow downloads, only count against the budget.
+        with self._lock:
+            if self._retries_used >= self.budget or self._waited >= self.max_wait:
+                return None
+            self._retries_used += 1
+            if not wait:
+                return 0
+
+            delay = _parse_retry_after(retry_after)
+            if delay is None:
+                delay = random.uniform(_RETRY_BASE_DELAY, max(previous_delay, _RETRY_BASE_DELAY) * 3)
+            delay = min(delay, self.max_delay, self.max_wait - self._waited)
+            self._waited += delay
+            return delay
+
+    def get_stats(self):
+        # Returns the number of retries taken and their total delay in seconds.
+        with self._lock:
+            return {'retries': self._retries_used, 'retry_wait': round(self._waited, 1)}
+
+
+class CircuitBreaker:
+    # A circuit breaker per host for an ApiClient.
+    #
+    # After failure_threshold consecutive failed requests to a host, the circuit of the host opens, and requests
+    # to it fail at once with CircuitOpenError for cooldown seconds. Then one request is let through as probe:
+    # if it succeeds, the circuit closes again, otherwise it opens for another cooldown.
+    # Failures are connection errors, timeouts and server errors that remain after the retries of a request.
+    #
+    # With state_dir, the state of each host is also kept in a JSON file, so that all processes on the same machine
+    # share it, for example parallel tasks or forks of Ansible. Each process counts the failures of a host in memory.
+    # The file is only written, while it is locked, when the circuit opens, lets a probe through or closes, and
+    # it is read at most every _CIRCUIT_STATE_SYNC_INTERVAL seconds to pick up the transitions of other processes.
+    def __init__(self, failure_threshold=5, cooldown=60, state_dir=None):
+        # failure_threshold: The number of consecutive failures that open the circuit. 0 disables the circuit breaker.
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+        self._states = {}
+        self._synced_at = {}
+
+    def before_request(self, host):
+        # Raises CircuitOpenError if requests to the host are suspended, otherwise the request may be sent.
+        # After the cooldown, only the first request is let through as probe until its result is recorded.
+        def check(state):
+            opened_at = state.get('opened_at')
+            if opened_at is None:
+                return
+            now = time.time()
+            if now - opened_at < self.cooldown:
+                raise exceptions.CircuitOpenError(
+                    f"Requests to {host} are suspended for {int(self.cooldown - (now - opened_at)) + 1} seconds "
+                    f"after {state['failures']} consecutive failures."
+                )
+            # A probe that did not report back within the cooldown is considered lost.
+            probe_at = state.get('probe_at')
+            if probe_at is not None and now - probe_at < self.cooldown:
+                raise exceptions.CircuitOpenError(f"Requests to {host} are suspended until a probe request succeeds.")
+            state['probe_at'] = now
+
+        if self.failure_threshold:
+            self._update(host, check)
+
+    def record_success(self, host):
+        # Closes the circuit of the host.
+        def close(state):
+            state.clear()
+
+        if self.failure_threshold:
+            self._update(host, close)
+
+    def record_failure(self, host):
+        # Counts a failure of the host, and opens its circuit when the threshold is reached or a probe failed.
+        def fail(state):
+            state['failures'] = state.get('failures', 0) + 1
+            if state.get('opened_at') is not None or state['failures'] >= self.failure_threshold:
+                state['opened_at'] = time.time()
+                state['probe_at'] = None
+
+        if self.failure_threshold:
+            self._update(host, fail)
+
+    def _update(self, host, change):
+        # Applies a change function to the state of a host.
+        # With state_dir, a change of the circuit status is applied again to the current state file while it is locked,
+        # so that, for example, only one process lets a probe through.
+        with self._lock:
+            state = self._states.setdefault(host, {})
+            if not self.state_dir:
+                change(state)
+                return
+
+            now = time.monotonic()
+            if now - self._synced_at.get(host, -_CIRCUIT_STATE_SYNC_INTERVAL) >= _CIRCUIT_STATE_SYNC_INTERVAL:
+                state = _merge_circuit_state(state, self._read_state(host))
+                self._states[host] = state
+                self._synced_at[host] = now
+
+            new_state = dict(state)
+            change(new_state)
+            if _circuit_status(new_state) != _circuit_status(state):
+                self._synced_at[host] = now
+                new_state = self._write_state(host, state, change)
+            self._states[host] = new_state
+
+    def _state_file(self, host):
+        return os.path.join(self.state_dir, re.sub(r'[^\w.-]', '_', host or 'localhost') + '.json')
+
+    def _read_state(self, host):
+        # Returns the state of a host from its state file, which is locked against concurrent writes while it is read.
+        import fcntl
+
+        try:
+            with open(self._state_file(host), 'r') as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                return _load_circuit_state(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_state(self, host, state, change):
+        # Applies a change function to the state of a host merged with its state file, while the file is locked.
+        # Returns the new state. The file is only written if the state changed.
+        # If the change function raises, the merged state is kept in memory.
+        import fcntl
+
+        os.makedirs(self.state_dir, mode=0o700, exist_ok=True)
+        with open(self._state_file(host), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            shared_state = _load_circuit_state(f)
+            self._states[host] = _merge_circuit_state(state, shared_state)
+            state = dict(self._states[host])
+            change(state)
+            if state != shared_state:
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+            return state
+
+
+# Minimum number of seconds between reads of the state file of a host by a CircuitBreaker.
+_CIRCUIT_STATE_SYNC_INTERVAL = 2
+
+
+def _circuit_status(state):
+    # Returns whether the circuit of a CircuitBreaker state is closed, open, or half-open with a probe request.
+    if state.get('opened_at') is None:
+        return 'closed'
+    return 'open' if state.get('probe_at') is None else 'half-open'
+
+
+def _merge_circuit_state(state, shared_state):
+    # Returns the state of the state file, or the state of this process, with its failure count,
+    # while the circuit is closed for both.
+    if _circuit_status(state) == 'closed' and _circuit_status(shared_state) == 'closed':
+        return state
+    return shared_state
+
+
+def _load_circuit_state(f):
+    # Reads a CircuitBreaker state from an open state file. A damaged state file is treated like a closed circuit.
+    try:
+        state = json.loads(f.read() or '{}')
+    except ValueError:
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+# Arguments of GET requests that can be coalesced. Requests with other arguments, like streams, are always sent.
+_COALESCABLE_REQUEST_ARGS = frozenset(['headers', 'params', 'allow_redirects', 'timeout', 'stream'])
+
+
+class _InFlightCall:
+    # A call of _SingleFlight, whose result or error is shared with the callers waiting for it.
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SingleFlight:
+    # Coalesces concurrent calls with the same key: only the first call is executed,
+    # while the others wait for it and receive a copy of its result or exception.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, func, copy_result=copy.copy):
+        # Returns the result of func, or a copy of the result of the call with the same key in progress,
+        # and whether the result is shared with another caller.
+        # The callers that waited receive their own exception, raised from the exception of the call.
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _InFlightCall()
+            else:
+                self.shared += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise _copy_error(call.error, copy_result) from call.error
+            return copy_result(call.result), True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def _copy_error(error, copy_result):
+    # Returns a new exception like the exception of a coalesced call, with a copy of its response, if it has one.
+    try:
+        new_error = copy.copy(error)
+    except Exception:
+        return exceptions.SapLaunchpadError(f"The request failed: {error}")
+    if getattr(new_error, 'response', None) is not None:
+        new_error.response = copy_result(new_error.response)
+    return new_error
 
 
 class ApiClient:
@@ -70,21 +459,59 @@ class ApiClient:
     # automatic retries and custom header handling. It provides a clean,
     # object-oriented interface for making API requests, replacing the
     # previous global session and request functions.
-    def __init__(self):
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 connect_timeout=30, read_timeout=120, low_speed_limit=1024, low_speed_time=120,
+                 retries=MAX_RETRY_TIMES, retry_budget=30, retry_max_delay=60, retry_max_wait=600,
+                 circuit_breaker_threshold=5, circuit_breaker_cooldown=60, circuit_breaker_state_dir=None,
+                 cassette_path=None, cassette_mode='record', cassette_max_body_size=1048576, cassette_replay_latency=False):
+        # pool_connections: The number of hosts to keep connection pools for.
+        # pool_maxsize: The maximum number of connections kept per host, which should be at least the number of concurrent requests.
+        # pool_block: Whether requests wait for a free connection when all connections of a host are in use,
+        #   instead of opening additional connections that are not reused.
+        # keep_alive: Whether connections are reused between requests, with TCP keep-alive probes on idle connections.
+        # connect_timeout, read_timeout: Seconds to wait for a connection, and for data on an open connection.
+        # low_speed_limit, low_speed_time: Streamed downloads slower than low_speed_limit bytes per second
+        #   for low_speed_time seconds are aborted and retried. A limit of 0 disables the check.
+        # retries, retry_budget, retry_max_delay, retry_max_wait: The retry policy, see RetryPolicy.
+        # circuit_breaker_threshold, circuit_breaker_cooldown, circuit_breaker_state_dir: The circuit breaker, see CircuitBreaker.
+        # cassette_path, cassette_mode, cassette_max_body_size, cassette_replay_latency: Records all responses to a cassette file,
+        #   or replays them from it without network access, see cassette._CassetteHTTPAdapter.
         if not HAS_REQUESTS:
             raise ImportError("The 'requests' library is required but was not found.")
         if not HAS_URLLIB3:
             raise ImportError("The 'urllib3' library is required but was not found.")
+        from .http_session import _DownloadCookieJar, _PolicyRetry, _PoolingHTTPAdapter, _SessionAllowBasicAuthRedirects, _is_updated_urllib3
+
+        for name, value in (('pool_connections', pool_connections), ('pool_maxsize', pool_maxsize),
+                            ('connect_timeout', connect_timeout), ('read_timeout', read_timeout),
+                            ('low_speed_time', low_speed_time), ('circuit_breaker_cooldown', circuit_breaker_cooldown)):
+            if value < 1:
+                raise exceptions.InvalidOptionError(f"The option '{name}' must be at least 1.")
+        for name, value in (('low_speed_limit', low_speed_limit), ('retries', retries), ('retry_budget', retry_budget),
+                            ('retry_max_delay', retry_max_delay), ('retry_max_wait', retry_max_wait),
+                            ('circuit_breaker_threshold', circuit_breaker_threshold), ('cassette_max_body_size', cassette_max_body_size)):
+            if value < 0:
+                raise exceptions.InvalidOptionError(f"The option '{name}' must not be negative.")
 
         self.session = _SessionAllowBasicAuthRedirects()
+        self.session.cookies = _DownloadCookieJar()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.low_speed_limit = low_speed_limit
+        self.low_speed_time = low_speed_time
+        self.retry_policy = RetryPolicy(retries, retry_budget, retry_max_delay, retry_max_wait)
+        self.circuit_breaker = CircuitBreaker(circuit_breaker_threshold, circuit_breaker_cooldown, circuit_breaker_state_dir)
+        self._single_flight = _SingleFlight()
 
         # Configure retry logic for the session.
-        retries = urllib3.Retry(
-            connect=3,
-            read=3,
-            status=3,
+        retries = _PolicyRetry(
+            connect=retries,
+            read=retries,
+            status=retries,
             status_forcelist=[413, 429, 500, 502, 503, 504, 509],
-            backoff_factor=1
+            policy=self.retry_policy
         )
 
         # Set allowed methods for retries, handling different urllib3 versions.
@@ -97,9 +524,50 @@ class ApiClient:
             retries.method_whitelist = allowed_methods
 
         # Mount the adapter to the session.
-        adapter = HTTPAdapter(max_retries=retries)
-        self.session.mount('https://', adapter)
-        self.session.mount('http://', adapter)
+        adapter_kwargs = dict(
+            tcp_keepalive=keep_alive,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=retries
+        )
+        self.cassette_path = cassette_path
+        if cassette_path:
+            if cassette_mode not in ('record', 'replay'):
+                raise exceptions.InvalidOptionError("The option 'cassette_mode' must be 'record' or 'replay'.")
+            from .cassette import _CassetteHTTPAdapter
+
+            self._adapter = _CassetteHTTPAdapter(cassette_path, cassette_mode, cassette_max_body_size, cassette_replay_latency, **adapter_kwargs)
+        else:
+            self._adapter = _PoolingHTTPAdapter(**adapter_kwargs)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+
+    @classmethod
+    def from_params(cls, params):
+        # Creates a client with the HTTP client options of module parameters, using the defaults for missing options.
+        return cls(**{
+            option: params[option] for option in http_client_argument_spec()
+            if params.get(option) is not None
+        })
+
+    def get_pool_stats(self):
+        # Returns the number of requests sent and connections opened by the open connection pools.
+        # Fewer connections than requests means connections were reused.
+        stats = {'pools': 0, 'requests': 0, 'connections': 0}
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['pools'] += 1
+            stats['requests'] += pool.num_requests
+            stats['connections'] += pool.num_connections
+        return stats
+
+    def get_stats(self):
+        # Returns the statistics of the connection pools, of the retries and of the coalesced requests of the client.
+        return dict(self.get_pool_stats(), **self.retry_policy.get_stats(), coalesced=self._single_flight.shared)
 
     def request(self, method, url, **kwargs):
         # Makes an HTTP request.
@@ -108,6 +576,8 @@ class ApiClient:
         # automatically adding common headers and performing generic
         # error handling for SAP API responses.
         headers = COMMON_HEADERS.copy()
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
         if 'headers' in kwargs:
             headers.update(kwargs['headers'])
         kwargs['headers'] = headers
@@ -115,24 +585,56 @@ class ApiClient:
         if 'allow_redirects' not in kwargs:
             kwargs['allow_redirects'] = True
 
-        res = self.session.request(method, url, **kwargs)
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = self.timeout
 
-        # Validating against `res.text` can cause long execution time, because fuzzy search result can contain large `res.text`.
-        # This can be prevented by validating `res.status_code` check before `res.text`.
-        # Example: 'Two-Factor Authentication' is only in `res.text`, which can lead to long execution.
-        if res.status_code == 403:
-            if 'You are not authorized to download this file' in res.text:
-                raise Exception('You are not authorized to download this file.')
-            elif 'Account Temporarily Locked Out' in res.text:
-                raise Exception('Account Temporarily Locked Out. Please reset password to regain access and try again.')
-            else:
-                res.raise_for_status()
+        # Concurrent identical GET requests, for example of parallel searches or downloads, share one request and its response.
+        # Only requests that are not streamed are coalesced, as their body is read before the response is shared.
+        # Each caller receives its own copy of the response, and the cookies it set are stored for each caller,
+        # as the per-file download cookies are kept apart per caller, see download_cookies.
+        # Requests are only coalesced if they send the same per-file cookies of their download context.
+        if method == 'GET' and not kwargs.get('stream') and _COALESCABLE_REQUEST_ARGS.issuperset(kwargs):
+            from .http_session import _copy_response
 
-        if res.status_code == 404:
-            if 'The file you have requested cannot be found' in res.text:
-                raise Exception('The file you have requested cannot be found.')
-            else:
-                res.raise_for_status()
+            params = kwargs.get('params')
+            key = (url, params if isinstance(params, (str, bytes)) or params is None else urlencode(params, doseq=True),
+                   tuple(sorted(headers.items())), kwargs['allow_redirects'], kwargs['timeout'],
+                   self.session.cookies.download_context_key())
+            res, shared = self._single_flight.do(key, lambda: self._send(method, url, **kwargs), _copy_response)
+            if shared:
+                for response in res.history + [res]:
+                    for cookie in response.cookies:
+                        self.session.cookies.set_cookie(cookie)
+            return res
+
+        return self._send(method, url, **kwargs)
+
+    def _send(self, method, url, **kwargs):
+        # Sends a request through the circuit breaker and checks its response for errors.
+        # Failures are only counted for the requested host, not for the hosts of redirects.
+        import requests
+
+        host = urlparse(url).hostname
+        self.circuit_breaker.before_request(host)
+        try:
+            res = self.session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.RetryError):
+            self.circuit_breaker.record_failure(host)
+            raise
+        if res.status_code >= 500:
+            self.circuit_breaker.record_failure(host)
+        else:
+            self.circuit_breaker.record_success(host)
+
+        # Known SAP error messages are searched in the first bytes of the body only, because `res.text`
+        # decodes the complete body, which is slow for large fuzzy search results and would download
+        # the complete file for streamed downloads.
+        # Example: 'Two-Factor Authentication' is only in `res.text`, which can lead to long execution.
+        if res.status_code in _ERROR_PATTERNS:
+            error = classify_error_response(res.status_code, _peek_body(res, kwargs.get('stream')))
+            if error:
+                res.close()
+                raise error
 
         res.raise_for_status()
         return res
@@ -148,3 +650,12 @@ class ApiClient:
 
     def get_cookies(self):
         return self.session.cookies
+
+    def download_cookies(self):
+        # Returns a context manager for the download of one file, in which the per-file cookies of the software
+        # download server are kept apart from the shared cookies and discarded at its end.
+        # The context applies to the current thread or asyncio task, so concurrent downloads each use their own.
+        #   with client.download_cookies():
+        #       final_url = download.is_download_link_available(client, url)
+        #       download.stream_file_to_disk(client, final_url, filepath)
+        return self.session.cookies.download_context()
@@ -42,5 +42,8 @@ GIGYA_HEADERS = {
 }
 
 # General Configuration
-# The maximum number of times to retry a failed network request.
+# The default maximum number of times to retry a failed network request or download.
 MAX_RETRY_TIMES = 3
+
+# The maximum number of requests issued in parallel over a single session.
+MAX_CONCURRENT_REQUESTS = 4
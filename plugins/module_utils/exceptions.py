@@ -28,3 +28,13 @@ class DownloadError(SapLaunchpadError):
 class FileNotFoundError(SapLaunchpadError):
     # Raised when a searched file cannot be found.
     pass
+
+
+class CircuitOpenError(SapLaunchpadError):
+    # Raised when requests to a host are suspended after repeated failures.
+    pass
+
+
+class InvalidOptionError(SapLaunchpadError, ValueError):
+    # Raised for an invalid option value, like a negative number of retries.
+    pass
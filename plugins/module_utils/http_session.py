@@ -0,0 +1,207 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+# The parts of ApiClient that are based on requests and urllib3.
+# This module is only imported when an ApiClient is created, so module runs that return before sending
+# a request, like check mode or an existing download, do not load requests and urllib3.
+
+import contextlib
+import contextvars
+import re
+import socket
+import time
+
+from urllib.parse import urlparse
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.cookies import RequestsCookieJar
+    _RequestsSession = requests.Session
+except ImportError:
+    HAS_REQUESTS = False
+    # Placeholders to prevent errors on module load
+    requests = None
+    HTTPAdapter = object
+    RequestsCookieJar = object
+    _RequestsSession = object
+else:
+    HAS_REQUESTS = True
+
+try:
+    import urllib3
+    from urllib3.connection import HTTPConnection
+    from urllib3.util.retry import Retry
+except ImportError:
+    HAS_URLLIB3 = False
+    # Placeholders to prevent errors on module load
+    urllib3 = None
+    HTTPConnection = None
+    Retry = object
+else:
+    HAS_URLLIB3 = True
+
+
+class _SessionAllowBasicAuthRedirects(_RequestsSession):
+    # By default, the `Authorization` header for Basic Auth will be removed
+    # if the redirect is to a different host.
+    # In our case, the DirectDownloadLink with `softwaredownloads.sap.com` domain
+    # will be redirected to `origin.softwaredownloads.sap.com`,
+    # so we need to override `rebuild_auth` to perseve the Authorization header
+    # for sap.com domains.
+    # This is only required for legacy API.
+    def rebuild_auth(self, prepared_request, response):
+        # The parent class might not be a real requests.Session if requests is not installed.
+        if HAS_REQUESTS and 'Authorization' in prepared_request.headers:
+            request_hostname = urlparse(prepared_request.url).hostname
+            if not re.match(r'.*sap.com$', request_hostname):
+                del prepared_request.headers['Authorization']
+
+
+# The domain of the software download server, which sets a new cookie for every downloaded file.
+# Only its SESSIONID cookie, which holds the download session, is shared between downloads.
+_DOWNLOAD_COOKIE_DOMAIN = 'softwaredownloads.sap.com'
+_SHARED_DOWNLOAD_COOKIE_NAMES = frozenset(['SESSIONID'])
+
+
+class _DownloadCookieJar(RequestsCookieJar):
+    # The cookie jar of an ApiClient, which keeps the per-file cookies of the software download server apart.
+    #
+    # Within ApiClient.download_cookies(), these cookies are stored in a separate jar of the current thread or
+    # asyncio task, which is layered over the shared cookies: requests of the same context send both, and the
+    # separate jar is discarded at the end of the context. Concurrent downloads therefore neither see nor clear
+    # each other's cookies, and the shared jar does not grow with every downloaded file.
+    def __init__(self, policy=None):
+        super().__init__(policy)
+        self._download_jar = contextvars.ContextVar(f'download_cookies_{id(self)}', default=None)
+
+    def set_cookie(self, cookie, *args, **kwargs):
+        download_jar = self._download_jar.get()
+        if download_jar is not None and _is_download_cookie(cookie):
+            return download_jar.set_cookie(cookie, *args, **kwargs)
+        return super().set_cookie(cookie, *args, **kwargs)
+
+    def __iter__(self):
+        yield from super().__iter__()
+        download_jar = self._download_jar.get()
+        if download_jar is not None:
+            yield from download_jar
+
+    def _cookies_for_request(self, request):
+        # Used by add_cookie_header, which sets the current time on the shared policy before.
+        cookies = super()._cookies_for_request(request)
+        download_jar = self._download_jar.get()
+        if download_jar is not None:
+            download_jar._now = self._now
+            cookies += download_jar._cookies_for_request(request)
+        return cookies
+
+    def clear(self, domain=None, path=None, name=None):
+        # Clears the matching cookies of both the shared jar and the separate jar of the current context.
+        # Like CookieJar.clear, raises KeyError if a domain, path or name is given and no cookie matched.
+        cleared = False
+        for jar in (super(), self._download_jar.get()):
+            if jar is None:
+                continue
+            try:
+                jar.clear(domain, path, name)
+                cleared = True
+            except KeyError:
+                pass
+        if not cleared:
+            raise KeyError(f"No cookies of domain {domain} found.")
+
+    def download_context_key(self):
+        # Returns the per-file download cookies of the current context, which requests send in addition to
+        # the shared cookies, or None outside of a context.
+        download_jar = self._download_jar.get()
+        if download_jar is None:
+            return None
+        return tuple(sorted((c.domain, c.path, c.name, c.value or '') for c in download_jar))
+
+    @contextlib.contextmanager
+    def download_context(self):
+        # Stores the per-file download cookies set within the context in a new separate jar.
+        token = self._download_jar.set(RequestsCookieJar(self._policy))
+        try:
+            yield
+        finally:
+            self._download_jar.reset(token)
+
+
+def _is_download_cookie(cookie):
+    # Returns whether a cookie is a per-file cookie of the software download server.
+    domain = cookie.domain.lstrip('.')
+    return (domain == _DOWNLOAD_COOKIE_DOMAIN or domain.endswith('.' + _DOWNLOAD_COOKIE_DOMAIN)) and \
+        cookie.name not in _SHARED_DOWNLOAD_COOKIE_NAMES
+
+
+class _PoolingHTTPAdapter(HTTPAdapter):
+    # An HTTPAdapter that optionally enables TCP keep-alive probes on its connections,
+    # so that idle pooled connections are not silently dropped by firewalls or proxies.
+    def __init__(self, tcp_keepalive=False, **kwargs):
+        # Set before the parent constructor, which initializes the pool manager.
+        self._tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self._tcp_keepalive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class _PolicyRetry(Retry):
+    # The urllib3 retry configuration of an ApiClient, which takes its delays and budget from a RetryPolicy.
+    # urllib3 creates a new instance for every retry of a request, which carries the policy and the previous delay.
+    def __init__(self, *args, policy=None, previous_delay=0, **kwargs):
+        self.policy = policy
+        self.previous_delay = previous_delay
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.policy = self.policy
+        retry.previous_delay = self.previous_delay
+        return retry
+
+    def is_exhausted(self):
+        return super().is_exhausted() or (self.policy is not None and self.policy.is_exhausted())
+
+    def sleep(self, response=None):
+        if self.policy is None:
+            return super().sleep(response)
+        retry_after = response.headers.get('Retry-After') if response is not None and self.respect_retry_after_header else None
+        delay = self.policy.next_delay(self.previous_delay, retry_after)
+        if delay:
+            self.previous_delay = delay
+            time.sleep(delay)
+        return None
+
+
+def _copy_response(res):
+    # Returns a copy of a response whose body was read, which shares no mutable state with it,
+    # for a caller of a coalesced request. The responses of redirects are copied as well.
+    copied = requests.Response()
+    copied.__setstate__(res.__getstate__())
+    copied.headers = requests.structures.CaseInsensitiveDict(res.headers)
+    copied.cookies = res.cookies.copy()
+    copied.history = [_copy_response(r) for r in res.history]
+    copied.request = res.request.copy() if res.request is not None else None
+    return copied
+
+
+def _is_updated_urllib3():
+    # `method_whitelist` argument for Retry is deprecated since 1.26.0,
+    # and will be removed in v2.0.0.
+    # Typically, the default version on RedHat 8.2 is 1.24.2,
+    # so we need to check the version of urllib3 to see if it's updated.
+    if not HAS_URLLIB3:
+        return False
+
+    urllib3_version = urllib3.__version__.split('.')
+    if len(urllib3_version) == 2:
+        urllib3_version.append('0')
+    major, minor, patch = urllib3_version
+    major, minor, patch = int(major), int(minor), int(patch)
+    return (major, minor, patch) >= (1, 26, 0)
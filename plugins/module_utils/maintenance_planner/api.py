@@ -2,7 +2,15 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import contextlib
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
 import re
+import tempfile
+import threading
 import time
 from html import unescape
 from functools import wraps
@@ -12,34 +20,139 @@ from .. import constants as C
 from .. import exceptions
 from ..auth import get_sso_endpoint_meta
 
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    HAS_BS4 = False
-    BeautifulSoup = None
-else:
-    HAS_BS4 = True
-
-try:
-    from lxml import etree
-except ImportError:
-    HAS_LXML = False
-    etree = None
-else:
-    HAS_LXML = True
-
-try:
-    from requests.exceptions import HTTPError
-except ImportError:
-    HAS_REQUESTS = False
-    HTTPError = None
-else:
-    HAS_REQUESTS = True
+# bs4, lxml and requests are only imported by the functions that use them, to keep the import of this module fast.
+HAS_BS4 = importlib.util.find_spec('bs4') is not None
+HAS_LXML = importlib.util.find_spec('lxml') is not None
+HAS_REQUESTS = importlib.util.find_spec('requests') is not None
+
+
+class _TransactionIndex:
+    # An in-memory store of Maintenance Planner transactions, keyed by 'trans_id'.
+    #
+    # Lookup indexes (attribute -> value -> transaction IDs) are built on first use
+    # of an attribute and maintained incrementally when the store is refreshed,
+    # so repeated lookups and queries avoid scanning the whole transaction list.
+    def __init__(self):
+        self.loaded = False
+        self._transactions = {}
+        self._indexes = {}
+
+    def refresh(self, transactions):
+        # Merges a freshly retrieved transaction list into the store.
+        # Only added, changed and removed transactions are re-indexed.
+        # Returns a dictionary with the IDs of added, changed and removed transactions.
+        fresh = {t['trans_id']: t for t in transactions}
+        delta = {
+            'added': [i for i in fresh if i not in self._transactions],
+            'changed': [i for i in fresh if i in self._transactions and self._transactions[i] != fresh[i]],
+            'removed': [i for i in self._transactions if i not in fresh],
+        }
+
+        for trans_id in delta['changed'] + delta['removed']:
+            self._unindex(trans_id, self._transactions[trans_id])
+        for trans_id in delta['added'] + delta['changed']:
+            self._index(trans_id, fresh[trans_id])
+
+        self._transactions = fresh
+        self.loaded = True
+        return delta
+
+    def restore(self, transactions):
+        # Replaces the store with transactions of an earlier run, which the next refresh is compared with.
+        self._transactions = {t['trans_id']: t for t in transactions}
+        self._indexes = {}
+        self.loaded = False
+
+    def values(self):
+        return list(self._transactions.values())
+
+    def find(self, key, value):
+        # Returns the first transaction whose attribute `key` equals `value`, or None.
+        trans_ids = self._get_index(key).get(value)
+        if not trans_ids:
+            return None
+        return self._transactions[next(iter(trans_ids))]
+
+    def query(self, filters=None, since=None, sort_by=None, descending=False, limit=None):
+        # Returns the transactions matching all criteria.
+        # `filters` maps attributes to a value or a list of accepted values.
+        # `since` maps attributes to an inclusive lower bound, compared as strings,
+        # which suits the sortable timestamp format used by the Maintenance Planner.
+        candidates = None
+        for key, values in (filters or {}).items():
+            if not isinstance(values, list):
+                values = [values]
+            index = self._get_index(key)
+            matches = set()
+            for value in values:
+                matches.update(index.get(str(value), ()))
+            candidates = matches if candidates is None else candidates & matches
+
+        if candidates is None:
+            transactions = self.values()
+        else:
+            # Keep the order in which the Maintenance Planner returned the transactions.
+            transactions = [t for i, t in self._transactions.items() if i in candidates]
+
+        for key, lower_bound in (since or {}).items():
+            transactions = [t for t in transactions if t.get(key, '') >= str(lower_bound)]
+
+        if sort_by:
+            transactions = sorted(transactions, key=lambda t: t.get(sort_by, ''), reverse=descending)
+
+        if limit is not None:
+            transactions = transactions[:limit]
+        return transactions
+
+    def _get_index(self, key):
+        if key not in self._indexes:
+            index = {}
+            for trans_id, t in self._transactions.items():
+                if key in t:
+                    index.setdefault(t[key], {})[trans_id] = None
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _index(self, trans_id, transaction):
+        for key, index in self._indexes.items():
+            if key in transaction:
+                index.setdefault(transaction[key], {})[trans_id] = None
+
+    def _unindex(self, trans_id, transaction):
+        for key, index in self._indexes.items():
+            trans_ids = index.get(transaction.get(key))
+            if trans_ids and trans_id in trans_ids:
+                del trans_ids[trans_id]
+                if not trans_ids:
+                    del index[transaction[key]]
+
+
+# Attributes of the transaction properties with first-class query options, in order of preference.
+# The Maintenance Planner does not document them, so the first candidate present in the transaction list is used.
+_TRANSACTION_FIELD_ATTRIBUTES = {
+    'sid': ('sid', 'trans_sid', 'system_sid'),
+    'status': ('status', 'trans_status'),
+    'created': ('created_on', 'trans_created_on', 'creation_date'),
+    'changed': ('changed_on', 'trans_changed_on', 'last_changed_on', 'modified_on'),
+}
+
+# The creation timestamp at the end of generated transaction names, for example MP_NEW_INST_20211015_044854.
+_TRANSACTION_NAME_TIMESTAMP = re.compile(r'_(\d{8})_(\d{6})$')
 
 # Module-level cache
 _MP_XSRF_TOKEN = None
-_MP_TRANSACTIONS = None
+_MP_TRANSACTIONS = _TransactionIndex()
 _MP_NAMESPACE = 'http://xml.sap.com/2012/01/mnp'
+_MP_ENTITY_TAG = f'{{{_MP_NAMESPACE}}}entity'
+
+# The maximum length of an HTML character reference, like '&CounterClockwiseContourIntegral;'.
+_MAX_CHARREF_LENGTH = 33
+
+# Serializes re-authentication when several requests share one session concurrently.
+_MP_AUTH_LOCK = threading.Lock()
+# Incremented by every authentication, so that concurrent requests whose session expired at the same time
+# re-authenticate only once.
+_MP_AUTH_GENERATION = 0
 
 
 def require_bs4(func):
@@ -76,10 +189,10 @@ def auth_userapps(client):
     # Authenticates against userapps.support.sap.com to establish a session.
     _clear_mp_cookies(client, 'userapps')
 
-    # Reset cache on re-authentication
-    global _MP_XSRF_TOKEN, _MP_TRANSACTIONS
+    # Reset cache on re-authentication. The transactions are kept and merged on the next load.
+    global _MP_XSRF_TOKEN
     _MP_XSRF_TOKEN = None
-    _MP_TRANSACTIONS = None
+    _MP_TRANSACTIONS.loaded = False
 
     endpoint, meta = get_sso_endpoint_meta(client, C.URL_USERAPPS)
 
@@ -88,91 +201,342 @@ def auth_userapps(client):
 
     client.post(endpoint, data=meta)
 
+    global _MP_AUTH_GENERATION
+    _MP_AUTH_GENERATION += 1
+
 
 @require_bs4
 def get_transactions(client):
     # Retrieves a list of all available Maintenance Planner transactions.
-    global _MP_TRANSACTIONS
-    if _MP_TRANSACTIONS is not None:
-        return _MP_TRANSACTIONS
+    if not _MP_TRANSACTIONS.loaded:
+        refresh_transactions(client)
+    return _MP_TRANSACTIONS.values()
+
+
+@require_bs4
+def refresh_transactions(client):
+    # Reloads the Maintenance Planner transactions and merges them into the cached index.
+    # Returns the IDs of added, changed and removed transactions.
+    from bs4 import BeautifulSoup
 
     res = _mp_request(client, params={'action': 'getTransactions'})
     xml = unescape(res.text.replace('\ufeff', ''))
     doc = BeautifulSoup(xml, features='lxml')
-    transactions = [t.attrs for t in doc.find_all('mnp:transaction')]
+    transactions = [_add_transaction_timestamps(t.attrs) for t in doc.find_all('mnp:transaction')]
 
     if not transactions:
         raise exceptions.FileNotFoundError("No Maintenance Planner transactions found for this user.")
 
-    _MP_TRANSACTIONS = transactions
-    return _MP_TRANSACTIONS
+    return _MP_TRANSACTIONS.refresh(transactions)
+
+
+def query_transactions(client, filters=None, since=None, sort_by=None, descending=False, limit=None,
+                       sid=None, status=None, changed_since=None):
+    # Returns the transactions matching the given criteria, see _TransactionIndex.query.
+    # `sid` and `status` are lists of accepted values of the SID and status attributes.
+    # `changed_since` is an inclusive lower bound of the 'changed_at' timestamp, for example '2024-01-31'.
+    get_transactions(client)
+
+    filters = dict(filters or {})
+    for field, values in (('sid', sid), ('status', status)):
+        if values:
+            filters[_get_transaction_attribute(field)] = values
+
+    since = dict(since or {})
+    if changed_since:
+        timestamp = _sortable_timestamp(changed_since)
+        if timestamp is None:
+            raise exceptions.SapLaunchpadError(f"Invalid date for changed_since: '{changed_since}'.")
+        since['changed_at'] = timestamp
+
+    return _MP_TRANSACTIONS.query(filters, since, sort_by, descending, limit)
+
+
+def load_transactions_cache(cache_dir, user):
+    # Restores the transactions that save_transactions_cache stored for the user in an earlier run,
+    # so that the next refresh reports and re-indexes only the transactions changed since.
+    # A missing or unreadable cache is ignored.
+    try:
+        with open(_transactions_cache_path(cache_dir, user), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return
+    if entry.get('user') == user:
+        _MP_TRANSACTIONS.restore(entry['transactions'])
+
+
+def save_transactions_cache(cache_dir, user):
+    # Stores the loaded transactions for the next run, written atomically.
+    # The cache is an optimization only, so write errors are ignored.
+    entry = {'user': user, 'transactions': _MP_TRANSACTIONS.values()}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(temp_file, _transactions_cache_path(cache_dir, user))
+    except OSError:
+        pass
+
+
+def _transactions_cache_path(cache_dir, user):
+    return os.path.join(cache_dir, 'mp_transactions_' + hashlib.sha256(user.encode('utf-8')).hexdigest() + '.json')
+
+
+def _get_transaction_attribute(field):
+    # Returns the attribute of a first-class transaction property, see _TRANSACTION_FIELD_ATTRIBUTES.
+    transactions = _MP_TRANSACTIONS.values()
+    for attribute in _TRANSACTION_FIELD_ATTRIBUTES[field]:
+        if any(attribute in t for t in transactions):
+            return attribute
+    available = sorted({attribute for t in transactions for attribute in t})
+    raise exceptions.SapLaunchpadError(
+        f"The Maintenance Planner transactions have no {field} attribute. "
+        f"Use filters with one of the available attributes instead: {', '.join(available)}"
+    )
+
+
+def _add_transaction_timestamps(transaction):
+    # Adds the sortable timestamps 'created_at' and 'changed_at' in the format YYYYMMDDHHMMSS to a transaction.
+    # Without a creation attribute, the timestamp in a generated transaction name is used.
+    # Without a change attribute, the transaction counts as changed at its creation.
+    created = _first_timestamp(transaction, _TRANSACTION_FIELD_ATTRIBUTES['created'])
+    if created is None:
+        match = _TRANSACTION_NAME_TIMESTAMP.search(transaction.get('trans_name', ''))
+        created = match.group(1) + match.group(2) if match else ''
+    changed = _first_timestamp(transaction, _TRANSACTION_FIELD_ATTRIBUTES['changed'])
+
+    transaction['created_at'] = created
+    transaction['changed_at'] = changed or created
+    return transaction
+
+
+def _first_timestamp(transaction, attributes):
+    for attribute in attributes:
+        timestamp = _sortable_timestamp(transaction.get(attribute))
+        if timestamp is not None:
+            return timestamp
+    return None
+
+
+def _sortable_timestamp(value):
+    # Converts a date or timestamp to the format YYYYMMDDHHMMSS, or returns None if it is not one.
+    # Accepts OData dates like /Date(1634270934000)/ and formats whose digits are ordered from year to second,
+    # for example 20211015044854, 2021-10-15 or 2021-10-15T04:48:54Z.
+    if not value:
+        return None
+    match = re.match(r'/Date\((-?\d+)[^)]*\)/$', value)
+    if match:
+        moment = datetime.datetime.fromtimestamp(int(match.group(1)) / 1000, tz=datetime.timezone.utc)
+        return moment.strftime('%Y%m%d%H%M%S')
+    if not re.match(r'\d{4}-?\d{2}-?\d{2}', value):
+        return None
+    digits = re.sub(r'\D', '', value)[:14]
+    return digits.ljust(14, '0')
 
 
 def get_transaction_id(client, name):
     # Finds a transaction ID by its name or display ID.
-    transactions = get_transactions(client)
+    get_transactions(client)
 
-    # Search by transaction name
-    for t in transactions:
-        if t.get('trans_name') == name:
-            return t['trans_id']
+    # Search by transaction name, then by display ID
+    transaction = _MP_TRANSACTIONS.find('trans_name', name) or _MP_TRANSACTIONS.find('trans_display_id', name)
+    if transaction is None:
+        raise exceptions.FileNotFoundError(f"Transaction '{name}' not found by name or display ID.")
 
-    # If not found, search by display ID
-    for t in transactions:
-        if t.get('trans_display_id') == name:
-            return t['trans_id']
-
-    raise exceptions.FileNotFoundError(f"Transaction '{name}' not found by name or display ID.")
+    return transaction['trans_id']
 
 
 @require_lxml
 @require_requests
 def get_transaction_filename_url(client, trans_id, validate_url=False):
     # Parses the files XML to get a list of (URL, Filename) tuples.
-    xml = _get_download_files_xml(client, trans_id)
-    e = etree.fromstring(xml.encode('utf-16'))
-    stack_files = e.xpath(
-        '//mnp:entity[@id="stack_files"]/mnp:entity',
-        namespaces={'mnp': _MP_NAMESPACE}
-    )
-    if not stack_files:
+    files = list(iter_transaction_filename_url(client, trans_id))
+    if not files:
         raise exceptions.FileNotFoundError(f"No stack files found in transaction ID {trans_id}.")
 
-    files = []
-    for f in stack_files:
-        file_id = urljoin(C.URL_SOFTWARE_DOWNLOAD, '/file/' + f.get('id'))
-        file_name = f.get('label')
-        files.append((file_id, file_name))
-
     if validate_url:
-        for pair in files:
-            url = pair[0]
-            try:
-                client.head(url)
-            except HTTPError:
-                raise exceptions.DownloadError('Download link is not available: {0}'.format(url))
+        validate_download_urls(client, [pair[0] for pair in files])
 
     return files
 
 
-def get_transaction_stack_xml_content(client, trans_id):
-    # Downloads the stack XML file content for a transaction.
-    # The response contains an XML file with XML Element values using appropriate special character predefined entities (e.g. &amp; instead of &).
+@require_lxml
+@require_requests
+def iter_transaction_filename_url(client, trans_id):
+    # Yields (URL, Filename) tuples for a transaction while the files XML is being received and parsed.
+    res = _request_download_files_xml(client, trans_id, stream=True)
+    try:
+        # Without a charset in the response headers, the body is decoded as UTF-8 instead of guessing
+        # the encoding from the complete body like res.text.
+        if res.encoding is None:
+            res.encoding = 'utf-8'
+        chunks = (chunk.replace('\ufeff', '') for chunk in res.iter_content(chunk_size=64 * 1024, decode_unicode=True))
+        yield from _iter_stack_files_from_text(_iter_unescaped(chunks))
+    finally:
+        res.close()
+
+
+@require_lxml
+def iter_stack_files(source):
+    # Incrementally parses a files XML and yields a (URL, Filename) tuple for each stack file.
+    # `source` is a file path or a binary file-like object, for example a file saved by download_transaction_files_xml.
+    from lxml import etree
+
+    yield from _iter_stack_file_elements(etree.iterparse(source, events=('end',), tag=_MP_ENTITY_TAG))
+
+
+def _iter_stack_files_from_text(chunks):
+    # Incrementally parses a files XML from text chunks, like iter_stack_files, while the chunks are being received.
+    from lxml import etree
+
+    parser = etree.XMLPullParser(events=('end',), tag=_MP_ENTITY_TAG)
+
+    def events():
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    yield from _iter_stack_file_elements(events())
+
+
+def _iter_stack_file_elements(events):
+    # Yields a (URL, Filename) tuple for each stack file entity of the parser events of a files XML.
+    # Processed elements and their preceding siblings are released as the parser advances,
+    # so the whole document is never held in memory.
+    for _event, elem in events:
+        parent = elem.getparent()
+        if parent is not None and parent.tag == _MP_ENTITY_TAG and parent.get('id') == 'stack_files':
+            file_id = urljoin(C.URL_SOFTWARE_DOWNLOAD, '/file/' + elem.get('id'))
+            yield (file_id, elem.get('label'))
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def _iter_unescaped(chunks):
+    # Yields the HTML-unescaped text of text chunks, like unescape of the whole text.
+    # A character reference at the end of a chunk, which may continue in the next chunk, is held back until then.
+    pending = ''
+    for chunk in chunks:
+        text = pending + chunk
+        ampersand = text.rfind('&')
+        if ampersand != -1 and ';' not in text[ampersand:] and len(text) - ampersand <= _MAX_CHARREF_LENGTH:
+            text, pending = text[:ampersand], text[ampersand:]
+        else:
+            pending = ''
+        yield unescape(text)
+    if pending:
+        yield unescape(pending)
+
+
+@require_requests
+def validate_download_urls(client, urls):
+    # Verifies that each download URL is accessible, raising on the first unavailable link.
+    from requests.exceptions import HTTPError
+
+    for url in urls:
+        try:
+            client.head(url)
+        except HTTPError:
+            raise exceptions.DownloadError('Download link is not available: {0}'.format(url))
+
+
+@require_requests
+def download_transaction_stack_xml(client, trans_id, dest, default_filename):
+    # Streams the stack XML file for a transaction into the destination directory.
+    # The response is written unmodified to a temporary file in `dest`, which replaces the target file atomically.
+    # If an existing file has the same SHA256 digest, it is kept untouched.
+    # Returns a tuple of the file path and whether the file was changed.
     params = {
         'action': 'downloadFiles',
         'sub_action': 'stack-plan',
         'session_id': trans_id,
     }
-    res = _mp_request(client, params=params)
+    res = _mp_request(client, params=params, stream=True)
+
+    try:
+        filename = _get_content_disposition_filename(res) or default_filename
+        output_file = os.path.join(dest, filename)
+        changed = _write_file_if_changed(res.iter_content(chunk_size=64 * 1024), output_file)
+    finally:
+        res.close()
+
+    return output_file, changed
+
 
-    filename = None
+@require_lxml
+@require_requests
+def download_transaction_files_xml(client, trans_id, dest, filename):
+    # Saves the files XML of a transaction into the destination directory, so that it can be read
+    # offline with iter_stack_files. The XML is stored in the UTF-16 encoding it is parsed with.
+    # Returns a tuple of the file path and whether the file was changed.
+    xml = _get_download_files_xml(client, trans_id)
+    output_file = os.path.join(dest, filename)
+    return output_file, _write_file_if_changed([xml.encode('utf-16')], output_file)
+
+
+def _write_file_if_changed(chunks, output_file):
+    # Writes the chunks to a temporary file next to output_file, which replaces the target file atomically.
+    # If an existing file has the same SHA256 digest, it is kept untouched.
+    # Returns whether the file was changed.
+    # Only errors of the file operations are converted, errors of the response that yields the chunks are raised as they are.
+    dest, filename = os.path.split(output_file)
+    fd, temp_file = tempfile.mkstemp(prefix=f'.{filename}.', suffix='.tmp', dir=dest)
+    try:
+        digest = hashlib.sha256()
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                with _destination_errors(output_file):
+                    f.write(chunk)
+                digest.update(chunk)
+            with _destination_errors(output_file):
+                f.flush()
+
+        if os.path.isfile(output_file) and _file_sha256(output_file) == digest.hexdigest():
+            return False
+
+        with _destination_errors(output_file):
+            # mkstemp creates files readable only by the owner, apply the default permissions instead.
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_file, 0o666 & ~umask)
+            os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return True
+
+
+@contextlib.contextmanager
+def _destination_errors(output_file):
+    # Raises the OSErrors of file operations on the destination file as DownloadError.
+    try:
+        yield
+    except OSError as e:
+        raise exceptions.DownloadError(f"Failed to write to destination file {output_file}: {e}")
+
+
+def _get_content_disposition_filename(res):
+    # Extracts the filename from the 'content-disposition' header, if present.
     content_disposition = res.headers.get('content-disposition')
     if content_disposition:
         match = re.search(r'filename="?([^"]+)"?', content_disposition)
         if match:
-            filename = match.group(1)
+            return match.group(1)
+    return None
+
 
-    return res.text, filename
+def _file_sha256(filepath):
+    # Computes the SHA256 hex digest of a local file.
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def _mp_request(client, **kwargs):
@@ -184,22 +548,26 @@ def _mp_request(client, **kwargs):
 
     method = 'POST' if 'data' in kwargs or 'json' in kwargs else 'GET'
 
-    headers = kwargs.get('headers', {}).copy()
-    if params.get('action') != 'getInitialData':
-        headers['xsrf-token'] = _get_xsrf_token(client)
-    kwargs['headers'] = headers
-
     if 'allow_redirects' not in kwargs:
         kwargs['allow_redirects'] = False
 
     def do_request():
-        return client.request(method, C.URL_USERAPP_MP_SERVICE, **kwargs)
+        headers = kwargs.get('headers', {}).copy()
+        if params.get('action') != 'getInitialData':
+            headers['xsrf-token'] = _get_xsrf_token(client)
+        return client.request(method, C.URL_USERAPP_MP_SERVICE, **dict(kwargs, headers=headers))
 
+    auth_generation = _MP_AUTH_GENERATION
     res = do_request()
 
     if (res.status_code == 302 and res.headers.get('location', '').startswith(C.URL_ACCOUNT)):
         # Session for userapps has expired, re-authenticate and retry.
-        auth_userapps(client)
+        # Another thread may already have re-authenticated since this request was sent, which also
+        # reset the XSRF token, so the retry fetches the token again.
+        res.close()
+        with _MP_AUTH_LOCK:
+            if _MP_AUTH_GENERATION == auth_generation:
+                auth_userapps(client)
         res = do_request()
 
     return res
@@ -223,6 +591,13 @@ def _get_xsrf_token(client):
 
 def _get_download_files_xml(client, trans_id):
     # Fetches the XML defining the files for a given transaction.
+    res = _request_download_files_xml(client, trans_id)
+    xml = unescape(res.text.replace('\ufeff', ''))
+    return xml
+
+
+def _request_download_files_xml(client, trans_id, **kwargs):
+    # Requests the files XML of a transaction, and returns the response.
     trans_name = _get_transaction(client, 'trans_id', trans_id)['trans_name']
     request_xml = _build_mnp_xml(
         action='postProcessStack',
@@ -230,23 +605,23 @@ def _get_download_files_xml(client, trans_id):
         sessionid=trans_id,
         trans_name=trans_name
     )
-    res = _mp_request(client, data=request_xml)
-    xml = unescape(res.text.replace('\ufeff', ''))
-    return xml
+    return _mp_request(client, data=request_xml, **kwargs)
 
 
 def _get_transaction(client, key, value):
     # Helper to find a single transaction by a specific key-value pair.
-    transactions = get_transactions(client)
-    for t in transactions:
-        if t.get(key) == value:
-            return t
-    raise exceptions.FileNotFoundError(f"Transaction with {key}='{value}' not found.")
+    get_transactions(client)
+    transaction = _MP_TRANSACTIONS.find(key, value)
+    if transaction is None:
+        raise exceptions.FileNotFoundError(f"Transaction with {key}='{value}' not found.")
+    return transaction
 
 
 @require_lxml
 def _build_mnp_xml(**params):
     # Constructs the MNP XML payload for API requests.
+    from lxml import etree
+
     mnp = f'{{{_MP_NAMESPACE}}}'
 
     request_keys = ['action', 'trans_name', 'sub_action', 'navigation']
@@ -2,10 +2,16 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import os
 import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import auth, exceptions
+from .. import constants as C
+from ..async_client import AsyncApiClient
 from ..client import ApiClient
+from ..software_center import download
 from . import api
 
 
@@ -17,20 +23,34 @@ def run_files(params):
         msg=''
     )
 
+    client = None
     try:
-        client = ApiClient()
+        client = ApiClient.from_params(params)
         username = params['suser_id']
         password = params['suser_password']
-        transaction_name = params['transaction_name']
         validate_url = params['validate_url']
 
+        # Duplicate names are dropped while keeping the order given by the user.
+        transaction_names = params['transaction_names'] if params.get('transaction_names') is not None else [params['transaction_name']]
+        transaction_names = list(dict.fromkeys(transaction_names))
+
         auth.login(client, username, password)
         api.auth_userapps(client)
 
-        transaction_id = api.get_transaction_id(client, transaction_name)
-        download_basket_details = api.get_transaction_filename_url(client, transaction_id, validate_url)
+        # Resolving the IDs populates the transaction list and XSRF token caches
+        # before the concurrent requests below share the session.
+        transaction_ids = [api.get_transaction_id(client, name) for name in transaction_names]
+
+        max_workers = min(len(transaction_ids), C.MAX_CONCURRENT_REQUESTS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            files_per_transaction = list(executor.map(
+                lambda trans_id: api.get_transaction_filename_url(client, trans_id), transaction_ids))
+
+        download_basket = _merge_download_baskets(transaction_names, files_per_transaction)
+        if validate_url:
+            api.validate_download_urls(client, [i['DirectLink'] for i in download_basket])
 
-        result['download_basket'] = [{'DirectLink': i[0], 'Filename': i[1]} for i in download_basket_details]
+        result['download_basket'] = download_basket
         result['changed'] = True
         result['msg'] = "Successfully retrieved file list from SAP Maintenance Planner."
 
@@ -52,51 +72,385 @@ def run_files(params):
     except Exception as e:
         result['failed'] = True
         result['msg'] = f"An unexpected error occurred: {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
 
     return result
 
 
-def run_stack_xml_download(params):
-    # Runner for maintenance_planner_stack_xml_download module.
+def run_transactions_info(params):
+    # Runner for maintenance_planner_transactions_info module.
+    result = dict(
+        transactions=[],
+        changed=False,
+        msg=''
+    )
+
+    client = None
+    try:
+        client = ApiClient.from_params(params)
+        auth.login(client, params['suser_id'], params['suser_password'])
+        api.auth_userapps(client)
+
+        # With a cache, the transactions of the previous run are compared with the current list.
+        cache_path = params.get('cache_path')
+        if cache_path:
+            api.load_transactions_cache(cache_path, params['suser_id'])
+        changes = api.refresh_transactions(client)
+        if cache_path:
+            api.save_transactions_cache(cache_path, params['suser_id'])
+            result['changes'] = changes
+
+        result['transactions'] = api.query_transactions(
+            client,
+            filters=params.get('filters'),
+            since=params.get('since'),
+            sort_by=params.get('sort_by'),
+            descending=params.get('descending'),
+            limit=params.get('limit'),
+            sid=params.get('sid'),
+            status=params.get('status'),
+            changed_since=params.get('changed_since')
+        )
+        result['msg'] = f"Found {len(result['transactions'])} matching SAP Maintenance Planner transaction(s)."
+
+    except ImportError as e:
+        result['failed'] = True
+        if 'requests' in str(e):
+            result['missing_dependency'] = 'requests'
+        elif 'urllib3' in str(e):
+            result['missing_dependency'] = 'urllib3'
+        elif 'beautifulsoup4' in str(e):
+            result['missing_dependency'] = 'beautifulsoup4'
+        elif 'lxml' in str(e):
+            result['missing_dependency'] = 'lxml'
+        else:
+            result['msg'] = "An unexpected import error occurred: {0}".format(e)
+    except exceptions.SapLaunchpadError as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    except Exception as e:
+        result['failed'] = True
+        result['msg'] = f"An unexpected error occurred: {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
+
+    return result
+
+
+def run_files_xml(params):
+    # Runner for maintenance_planner_files_xml module.
+    # Resolves the download basket from a local files XML without connecting to SAP.
     result = dict(
+        download_basket=[],
         changed=False,
         msg=''
     )
 
     try:
-        client = ApiClient()
+        src = params['src']
+        if not pathlib.Path(src).is_file():
+            result['failed'] = True
+            result['msg'] = f"Source file does not exist: {src}"
+            return result
+
+        download_basket = [{'DirectLink': i[0], 'Filename': i[1]} for i in api.iter_stack_files(src)]
+        if not download_basket:
+            # A stack.xml does not list the download links, only the files XML of the transaction does.
+            raise exceptions.FileNotFoundError(
+                f"No stack files found in {src}. The files XML saved by maintenance_planner_stack_xml_download "
+                "with files_xml=true is required, the stack.xml file cannot be read."
+            )
+
+        result['download_basket'] = download_basket
+        result['msg'] = f"Successfully retrieved file list from {src}."
+
+    except ImportError as e:
+        result['failed'] = True
+        if 'lxml' in str(e):
+            result['missing_dependency'] = 'lxml'
+        else:
+            result['msg'] = "An unexpected import error occurred: {0}".format(e)
+    except exceptions.SapLaunchpadError as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    except Exception as e:
+        result['failed'] = True
+        result['msg'] = f"An unexpected error occurred: {e}"
+
+    return result
+
+
+def run_files_download(params):
+    # Runner for maintenance_planner_files_download module.
+    # Files are handed to the download workers as soon as they are parsed from the
+    # Maintenance Planner response, reusing the same authenticated session throughout.
+    result = dict(
+        download_basket=[],
+        changed=False,
+        msg=''
+    )
+
+    client = None
+    try:
+        client = ApiClient.from_params(params)
         username = params['suser_id']
         password = params['suser_password']
         transaction_name = params['transaction_name']
         dest = params['dest']
+        validate_checksum = params['validate_checksum']
+        max_workers = params['max_workers']
+
+        if not pathlib.Path(dest).is_dir():
+            result['failed'] = True
+            result['msg'] = f"Destination directory does not exist: {dest}"
+            return result
 
         auth.login(client, username, password)
         api.auth_userapps(client)
 
         transaction_id = api.get_transaction_id(client, transaction_name)
-        xml_content, filename = api.get_transaction_stack_xml_content(client, transaction_id)
+        files = api.iter_transaction_filename_url(client, transaction_id)
+        if params.get('engine') == 'asyncio':
+            import asyncio
 
-        if not filename:
-            filename = f"{transaction_name}_stack.xml"
+            download_basket = asyncio.run(_async_download_pipeline(client, files, dest, validate_checksum, max_workers))
+        else:
+            download_basket = _download_pipeline(client, files, dest, validate_checksum, max_workers)
 
-        dest_path = pathlib.Path(dest)
-        if not dest_path.is_dir():
+        if not download_basket:
+            raise exceptions.FileNotFoundError(f"No stack files found in transaction ID {transaction_id}.")
+
+        failed_files = [i['Filename'] for i in download_basket if i['failed']]
+        result['download_basket'] = download_basket
+        result['changed'] = any(i['changed'] for i in download_basket)
+        if failed_files:
             result['failed'] = True
-            result['msg'] = f"Destination directory does not exist: {dest}"
-            return result
+            result['msg'] = f"Failed to download {len(failed_files)} of {len(download_basket)} file(s): {', '.join(failed_files)}"
+        else:
+            result['msg'] = f"Successfully processed {len(download_basket)} file(s) from SAP Maintenance Planner transaction {transaction_name}."
 
-        output_file = dest_path / filename
+    except ImportError as e:
+        result['failed'] = True
+        if 'requests' in str(e):
+            result['missing_dependency'] = 'requests'
+        elif 'urllib3' in str(e):
+            result['missing_dependency'] = 'urllib3'
+        elif 'beautifulsoup4' in str(e):
+            result['missing_dependency'] = 'beautifulsoup4'
+        elif 'lxml' in str(e):
+            result['missing_dependency'] = 'lxml'
+        elif 'aiohttp' in str(e):
+            result['missing_dependency'] = 'aiohttp'
+        else:
+            result['msg'] = "An unexpected import error occurred: {0}".format(e)
+    except exceptions.SapLaunchpadError as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    except Exception as e:
+        result['failed'] = True
+        result['msg'] = f"An unexpected error occurred: {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
 
+    return result
+
+
+def _download_pipeline(client, files, dest, validate_checksum, max_workers):
+    # Downloads (URL, Filename) tuples from an iterable while it is still being produced.
+    # The semaphore keeps the producer at most a few entries ahead of the downloads, and is released
+    # by every download, also a failed one, so the producer cannot block forever.
+    # Returns the per-file results in the order of the iterable.
+    pending = threading.BoundedSemaphore(max_workers * 2)
+    downloads = []
+
+    def download_file(direct_link, filename):
+        try:
+            return _download_file(client, direct_link, filename, dest, validate_checksum)
+        finally:
+            pending.release()
+
+    # Leaving the executor waits for the downloads that were already started, also if reading the iterable failed.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for direct_link, filename in files:
+            pending.acquire()
+            downloads.append((direct_link, filename, executor.submit(download_file, direct_link, filename)))
+
+    return [_download_result(direct_link, filename, future.exception() or future.result())
+            for direct_link, filename, future in downloads]
+
+
+async def _async_download_pipeline(client, files, dest, validate_checksum, max_workers):
+    # The asyncio version of _download_pipeline, with up to max_workers concurrent downloads on one event loop.
+    # The iterable is read in a thread, as it sends its requests with the synchronous client.
+    # Returns the per-file results in the order of the iterable.
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    files = iter(files)
+    semaphore = asyncio.Semaphore(max_workers)
+    items = []
+    tasks = []
+
+    async def download_file(direct_link, filename):
+        async with semaphore:
+            return await _async_download_file(async_client, direct_link, filename, dest, validate_checksum)
+
+    async with AsyncApiClient(client) as async_client:
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(xml_content)
-        except IOError as e:
+            while True:
+                item = await loop.run_in_executor(None, next, files, None)
+                if item is None:
+                    break
+                direct_link, filename = item
+                items.append(item)
+                tasks.append(asyncio.ensure_future(download_file(direct_link, filename)))
+        finally:
+            # Downloads that were already started are completed, also if reading the iterable failed.
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    return [_download_result(direct_link, filename, result) for (direct_link, filename), result in zip(items, results)]
+
+
+async def _async_download_file(async_client, direct_link, filename, dest, validate_checksum):
+    # The asyncio version of _download_file. The existing file is checked in a thread,
+    # as its checksum is validated with the synchronous client.
+    import asyncio
+
+    entry = await asyncio.get_running_loop().run_in_executor(
+        None, _check_existing_file, async_client.client, direct_link, filename, dest, validate_checksum)
+    if entry['skipped']:
+        return entry
+
+    with async_client.client.download_cookies():
+        final_url = await download.async_is_download_link_available(async_client, direct_link)
+        if final_url:
+            await download.async_stream_file_to_disk(async_client, final_url, os.path.join(dest, filename))
+    return _complete_download_entry(entry, final_url)
+
+
+def _download_file(client, direct_link, filename, dest, validate_checksum):
+    # Downloads a single basket entry, following the same rules as software_center_download
+    # for existing files and checksum validation. Errors are reported in the entry by _download_result.
+    entry = _check_existing_file(client, direct_link, filename, dest, validate_checksum)
+    if entry['skipped']:
+        return entry
+
+    with client.download_cookies():
+        final_url = download.is_download_link_available(client, direct_link)
+        if final_url:
+            download.stream_file_to_disk(client, final_url, os.path.join(dest, filename))
+    return _complete_download_entry(entry, final_url)
+
+
+def _check_existing_file(client, direct_link, filename, dest, validate_checksum):
+    # Returns the result entry of a basket file before its download, which is skipped if the file already exists.
+    # An existing file with an invalid checksum is removed, so that it is downloaded again.
+    entry = _new_download_entry(direct_link, filename)
+    filepath = os.path.join(dest, filename)
+    if not validate_checksum:
+        existing_msg = download.existing_file_message(dest, filename)
+    elif os.path.exists(filepath):
+        validation_result = download.validate_local_file_checksum(client, filepath, download_link=direct_link)
+        existing_msg = download.validated_file_message(filepath, validation_result['validated'], validation_result['message'])
+    else:
+        existing_msg = None
+
+    if existing_msg:
+        entry['skipped'] = True
+        entry['msg'] = existing_msg
+    return entry
+
+
+def _complete_download_entry(entry, final_url):
+    # Returns the result entry of a basket file after its download, or after its download link was not available.
+    if final_url:
+        entry['changed'] = True
+        entry['msg'] = f"Successfully downloaded SAP software: {entry['Filename']}"
+    else:
+        entry['failed'] = True
+        entry['msg'] = f"Download link for {entry['Filename']} is not available."
+    return entry
+
+
+def _new_download_entry(direct_link, filename):
+    # Returns the result entry of a basket file before its download.
+    return {
+        'DirectLink': direct_link,
+        'Filename': filename,
+        'changed': False,
+        'skipped': False,
+        'failed': False,
+        'msg': ''
+    }
+
+
+def _download_result(direct_link, filename, result):
+    # Returns the result entry of a download, which is reported as failed if the download raised an exception.
+    if not isinstance(result, BaseException):
+        return result
+    entry = _new_download_entry(direct_link, filename)
+    entry['failed'] = True
+    if isinstance(result, exceptions.SapLaunchpadError):
+        entry['msg'] = str(result)
+    else:
+        entry['msg'] = f"An unexpected error occurred: {type(result).__name__} - {result}"
+    return entry
+
+
+def _merge_download_baskets(transaction_names, files_per_transaction):
+    # Merges the file lists of several transactions into one basket without duplicates.
+    # Each entry records the transactions it belongs to under the 'Transactions' key.
+    basket = {}
+    for transaction_name, files in zip(transaction_names, files_per_transaction):
+        for direct_link, filename in files:
+            entry = basket.setdefault(direct_link, {'DirectLink': direct_link, 'Filename': filename, 'Transactions': []})
+            if transaction_name not in entry['Transactions']:
+                entry['Transactions'].append(transaction_name)
+    return list(basket.values())
+
+
+def run_stack_xml_download(params):
+    # Runner for maintenance_planner_stack_xml_download module.
+    result = dict(
+        changed=False,
+        msg=''
+    )
+
+    client = None
+    try:
+        client = ApiClient.from_params(params)
+        username = params['suser_id']
+        password = params['suser_password']
+        transaction_name = params['transaction_name']
+        dest = params['dest']
+
+        if not pathlib.Path(dest).is_dir():
             result['failed'] = True
-            result['msg'] = f"Failed to write to destination file {output_file}: {e}"
+            result['msg'] = f"Destination directory does not exist: {dest}"
             return result
 
-        result['changed'] = True
-        result['msg'] = f"SAP Maintenance Planner Stack XML successfully downloaded to {output_file}"
+        auth.login(client, username, password)
+        api.auth_userapps(client)
+
+        transaction_id = api.get_transaction_id(client, transaction_name)
+        output_file, changed = api.download_transaction_stack_xml(
+            client, transaction_id, dest, f"{transaction_name}_stack.xml")
+
+        result['changed'] = changed
+        if changed:
+            result['msg'] = f"SAP Maintenance Planner Stack XML successfully downloaded to {output_file}"
+        else:
+            result['msg'] = f"SAP Maintenance Planner Stack XML is already up to date: {output_file}"
+
+        if params.get('files_xml'):
+            files_xml_file, files_xml_changed = api.download_transaction_files_xml(
+                client, transaction_id, dest, f"{transaction_name}_files.xml")
+            result['files_xml_path'] = files_xml_file
+            result['changed'] = result['changed'] or files_xml_changed
 
     except ImportError as e:
         result['failed'] = True
@@ -114,5 +468,8 @@ def run_stack_xml_download(params):
     except Exception as e:
         result['failed'] = True
         result['msg'] = f"An unexpected error occurred: {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
 
     return result
@@ -4,6 +4,7 @@ __metaclass__ = type
 
 import glob
 import hashlib
+import importlib.util
 import os
 import time
 from functools import wraps
@@ -13,16 +14,23 @@ from .. import constants as C
 from .. import exceptions
 from . import search
 
-try:
-    from requests.exceptions import ConnectionError, HTTPError
-except ImportError:
-    HAS_REQUESTS = False
-    ConnectionError, HTTPError = None, None
-else:
-    HAS_REQUESTS = True
+# requests and urllib3 are only imported by the functions that handle their exceptions,
+# so that a download that already exists does not load them.
+HAS_REQUESTS = importlib.util.find_spec('requests') is not None
 
 _HAS_DOWNLOAD_AUTHORIZATION = None
 
+# Maximum size of the parts in which downloads are written to disk.
+# Parts are written as soon as they are received, so that the transfer rate is also checked on slow connections.
+_STREAM_CHUNK_SIZE = 64 * 1024
+# Minimum size of the reads of urllib3 versions without read1, which wait until all requested bytes are received.
+_STREAM_MIN_READ_SIZE = 1024
+
+
+class _TransferTooSlowError(Exception):
+    # Raised when the transfer rate of a download stays below the minimum speed of the client.
+    pass
+
 
 def require_requests(func):
     # A decorator to check for the 'requests' library before executing a function.
@@ -51,15 +59,13 @@ def validate_local_file_checksum(client, local_filepath, query=None, download_li
             result['remote_filename'] = file_details['filename']
             result['alternative_found'] = file_details['alternative_found']
 
-        download_link_final = _resolve_download_link(client, download_link)
-
-        try:
+        # The download cookies of the file are discarded after reading the headers.
+        with client.download_cookies():
+            download_link_final = _resolve_download_link(client, download_link)
             # A HEAD request is not always supported; a streaming GET is more reliable.
             res = client.get(download_link_final, stream=True)
             headers = res.headers
             res.close()  # We only need the headers, so close the connection.
-        finally:
-            clear_download_key_cookie(client)
 
         remote_etag = headers.get('ETag')
 
@@ -96,6 +102,31 @@ def check_similar_files(dest, filename):
         return False, []
 
 
+def existing_file_message(dest, filename):
+    # Returns the message for skipping the download of a file that, or a file with a similar name, already exists in dest.
+    # Returns None if the file is to be downloaded. Used when the checksum of existing files is not validated.
+    if os.path.exists(os.path.join(dest, filename)):
+        return f"File already exists: {filename}"
+
+    filename_similar_exists, filename_similar_names = check_similar_files(dest, filename)
+    if filename_similar_exists:
+        return f"Similar file(s) already exist: {', '.join(filename_similar_names)}"
+    return None
+
+
+def validated_file_message(filepath, is_valid, message):
+    # Returns the message for skipping the download of an existing file whose checksum is valid or could not be validated,
+    # for the validation result of validate_local_file_checksum.
+    # An existing file with an invalid checksum is removed to allow for re-download, and None is returned.
+    filename = os.path.basename(filepath)
+    if is_valid is True:
+        return f"File already exists and checksum is valid: {filename}"
+    if is_valid is None:
+        return f"File already exists: {filename}. {message}"
+    os.remove(filepath)
+    return None
+
+
 @require_requests
 def _check_download_authorization(client):
     # Verifies that the authenticated user has the "Software Download" authorization.
@@ -129,7 +160,8 @@ def _check_download_authorization(client):
 def is_download_link_available(client, url, retry=0):
     # Verifies if a download link is active and returns the final, resolved URL.
     # Returns None if the link is not available.
-    # IMPORTANT: This function leaves download cookies in the session on success.
+    # The download cookies of the file are needed by stream_file_to_disk, so both must be called
+    # within the same client.download_cookies() context.
     try:
         final_url = _resolve_download_link(client, url)
         # A HEAD request is not always supported; a streaming GET is more reliable.
@@ -144,9 +176,11 @@ def is_download_link_available(client, url, retry=0):
 
 
 @require_requests
-def _resolve_download_link(client, url, retry=0):
+def _resolve_download_link(client, url, retry=0, delay=0):
     # Resolves a tokengen URL to the final, direct download URL.
-    # This encapsulates the SAML token exchange logic and includes retries.
+    # This encapsulates the SAML token exchange logic and includes retries with the retry policy of the client.
+    from requests.exceptions import ConnectionError, HTTPError
+
     _check_download_authorization(client)
     endpoint = url
 
@@ -163,57 +197,273 @@ def _resolve_download_link(client, url, retry=0):
             res.close()  # We don't need the content, just the redirect URL and cookies.
             return res.url
         except (HTTPError, ConnectionError) as e:
-            client.session.cookies.clear(domain='.softwaredownloads.sap.com')
+            _clear_download_session(client.session.cookies)
             # Retry on 403 (Forbidden) as it can be a temporary token issue.
-            if (isinstance(e, HTTPError) and e.response.status_code != 403) or retry >= C.MAX_RETRY_TIMES:
-                raise exceptions.DownloadError(f"Could not resolve download URL after {C.MAX_RETRY_TIMES} retries: {e}")
+            next_delay = None
+            if not isinstance(e, HTTPError) or e.response.status_code == 403:
+                next_delay = _next_retry_delay(client.retry_policy, retry, delay, e.response if isinstance(e, HTTPError) else None)
+            if next_delay is None:
+                raise exceptions.DownloadError(f"Could not resolve download URL after {retry} retries: {e}")
 
-            time.sleep(60 * (retry + 1))
-            return _resolve_download_link(client, url, retry + 1)
+            time.sleep(next_delay)
+            return _resolve_download_link(client, url, retry + 1, next_delay)
 
     # If a session already exists, the provided URL can be used directly.
     return endpoint
 
 
+async def async_is_download_link_available(async_client, url):
+    # The asyncio version of is_download_link_available.
+    try:
+        final_url = await async_resolve_download_link(async_client, url)
+        res = await async_client.get(final_url)
+        res.release()  # We only need the headers, so close the connection.
+        content_header = res.headers.get('Content-Disposition')
+        if content_header and 'attachment;' in content_header:
+            return final_url
+        return None
+    except exceptions.DownloadError:
+        return None
+
+
+async def async_resolve_download_link(async_client, url, retry=0, delay=0):
+    # The asyncio version of _resolve_download_link, which sends the requests with an AsyncApiClient.
+    # The authorization check is done once with the synchronous client, outside of the event loop.
+    # asyncio and aiohttp are already imported by the event loop and the AsyncApiClient.
+    import asyncio
+    from aiohttp import ClientConnectionError, ClientResponseError
+
+    if _HAS_DOWNLOAD_AUTHORIZATION is None:
+        await asyncio.get_running_loop().run_in_executor(None, _check_download_authorization, async_client.client)
+    else:
+        _check_download_authorization(async_client.client)
+    endpoint = url
+    cookies = async_client.cookies
+
+    if not cookies.get('SESSIONID', domain='.softwaredownloads.sap.com'):
+        try:
+            meta = {}
+            while 'SAMLResponse' not in meta:
+                endpoint, meta = await auth.async_get_sso_endpoint_meta(async_client, endpoint, data=meta)
+
+            # This POST will result in a redirect to the actual file URL.
+            res = await async_client.post(endpoint, data=meta)
+            res.release()  # We don't need the content, just the redirect URL and cookies.
+            return str(res.url)
+        except (ClientResponseError, ClientConnectionError) as e:
+            _clear_download_session(cookies)
+            next_delay = None
+            if not isinstance(e, ClientResponseError) or e.status == 403:
+                next_delay = _next_retry_delay(async_client.client.retry_policy, retry, delay, e if isinstance(e, ClientResponseError) else None)
+            if next_delay is None:
+                raise exceptions.DownloadError(f"Could not resolve download URL after {retry} retries: {e}")
+
+            await asyncio.sleep(next_delay)
+            return await async_resolve_download_link(async_client, url, retry + 1, next_delay)
+
+    return endpoint
+
+
 @require_requests
 def stream_file_to_disk(client, url, filepath, retry=0, **kwargs):
     # Streams a large file to disk and verifies its checksum.
+    # Transfers that fail or stay below the minimum speed of the client are retried with the retry policy of the client.
+    # If the server supports range requests, the retry resumes from the part already written, otherwise it starts over.
+    from requests.exceptions import ConnectionError, HTTPError, Timeout
+
     kwargs.update({'stream': True})
-    try:
-        res = client.get(url, **kwargs)
-        with open(filepath, 'wb') as f:
-            for chunk in res.iter_content(chunk_size=1024 * 1024):  # 1MiB chunks
-                f.write(chunk)
-    except ConnectionError as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        if retry >= C.MAX_RETRY_TIMES:
-            raise exceptions.DownloadError(f"Connection failed after {C.MAX_RETRY_TIMES} retries: {e}")
-        time.sleep(60 * (retry + 1))
-        return stream_file_to_disk(client, url, filepath, retry + 1, **kwargs)
-
-    res.close()
-    clear_download_key_cookie(client)
-
-    checksum = res.headers.get('ETag', '').replace('"', '')
+    request_headers = kwargs.pop('headers', None) or {}
+    resume_from = 0
+    delay = 0
+    etag = ''
+    while True:
+        res = None
+        headers = dict(request_headers, Range=f'bytes={resume_from}-') if resume_from else request_headers
+        try:
+            res = client.get(url, headers=headers, **kwargs)
+            if resume_from and not res.headers.get('Content-Range', '').startswith(f'bytes {resume_from}-'):
+                # The server sent the complete file instead of the requested range.
+                resume_from = 0
+            etag = res.headers.get('ETag', '')
+            with open(filepath, 'ab' if resume_from else 'wb') as f:
+                _write_response_body(res, f, client.low_speed_limit, client.low_speed_time)
+            break
+        except HTTPError as e:
+            # The part already written is the complete file.
+            if resume_from and e.response is not None and e.response.status_code == 416:
+                break
+            raise
+        except (ConnectionError, Timeout, _TransferTooSlowError) as e:
+            # Too slow transfers are retried at once, as the connection itself works.
+            delay = _next_retry_delay(client.retry_policy, retry, delay, wait=not isinstance(e, _TransferTooSlowError))
+            if delay is None:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                raise exceptions.DownloadError(f"Connection failed after {retry} retries: {e}")
+            retry += 1
+            can_resume = res is not None and res.headers.get('Accept-Ranges') == 'bytes' and os.path.exists(filepath)
+            resume_from = os.path.getsize(filepath) if can_resume else 0
+            time.sleep(delay)
+        finally:
+            if res is not None:
+                res.close()
+
+    checksum = etag.replace('"', '')
     if not checksum or _is_checksum_matched(filepath, checksum):
         return
 
     if os.path.exists(filepath):
         os.remove(filepath)
 
-    if retry >= C.MAX_RETRY_TIMES:
-        raise exceptions.DownloadError(f'Failed to download {url}: checksum mismatch after {C.MAX_RETRY_TIMES} retries')
-    return stream_file_to_disk(client, url, filepath, retry + 1, **kwargs)
+    if _next_retry_delay(client.retry_policy, retry, wait=False) is None:
+        raise exceptions.DownloadError(f'Failed to download {url}: checksum mismatch after {retry} retries')
+    return stream_file_to_disk(client, url, filepath, retry + 1, headers=request_headers, **kwargs)
 
 
-def clear_download_key_cookie(client):
-    # Clears download-specific cookies to prevent the cookie header from becoming too large.
-    # The software download server generates a cookie for every single file.
-    # If we don't clear it after download, the cookie header will become too long and the server will reject the request.
-    for c in list(client.session.cookies):
-        if c.domain == '.softwaredownloads.sap.com' and c.name != 'SESSIONID':
-            client.session.cookies.clear(name=c.name, domain=c.domain, path='/')
+async def async_stream_file_to_disk(async_client, url, filepath, retry=0, headers=None):
+    # The asyncio version of stream_file_to_disk, which downloads with an AsyncApiClient.
+    # Reading from the network does not block the event loop, so many downloads can run concurrently.
+    import asyncio
+    from aiohttp import ClientConnectionError, ClientPayloadError, ClientResponseError
+
+    request_headers = headers or {}
+    resume_from = 0
+    delay = 0
+    etag = ''
+    while True:
+        res = None
+        headers = dict(request_headers, Range=f'bytes={resume_from}-') if resume_from else request_headers
+        try:
+            res = await async_client.get(url, headers=headers)
+            if resume_from and not res.headers.get('Content-Range', '').startswith(f'bytes {resume_from}-'):
+                # The server sent the complete file instead of the requested range.
+                resume_from = 0
+            etag = res.headers.get('ETag', '')
+            with open(filepath, 'ab' if resume_from else 'wb') as f:
+                await _async_write_response_body(res, f, async_client.low_speed_limit, async_client.low_speed_time)
+            break
+        except ClientResponseError as e:
+            # The part already written is the complete file.
+            if resume_from and e.status == 416:
+                break
+            raise
+        except (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError, _TransferTooSlowError) as e:
+            delay = _next_retry_delay(async_client.client.retry_policy, retry, delay, wait=not isinstance(e, _TransferTooSlowError))
+            if delay is None:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                raise exceptions.DownloadError(f"Connection failed after {retry} retries: {e}")
+            retry += 1
+            can_resume = res is not None and res.headers.get('Accept-Ranges') == 'bytes' and os.path.exists(filepath)
+            resume_from = os.path.getsize(filepath) if can_resume else 0
+            await asyncio.sleep(delay)
+        finally:
+            if res is not None:
+                res.release()
+
+    # Hashing a large file would block the event loop, so it is done in a thread.
+    checksum = etag.replace('"', '')
+    if not checksum or await asyncio.get_running_loop().run_in_executor(None, _is_checksum_matched, filepath, checksum):
+        return
+
+    if os.path.exists(filepath):
+        os.remove(filepath)
+
+    if _next_retry_delay(async_client.client.retry_policy, retry, wait=False) is None:
+        raise exceptions.DownloadError(f'Failed to download {url}: checksum mismatch after {retry} retries')
+    return await async_stream_file_to_disk(async_client, url, filepath, retry + 1, headers=request_headers)
+
+
+def _write_response_body(res, f, low_speed_limit, low_speed_time):
+    # Writes the body of a streamed response to a file.
+    # Raises _TransferTooSlowError if fewer than low_speed_limit bytes per second are received for low_speed_time seconds.
+    # Complete stalls are ended earlier by the read timeout of the client.
+    window_start = time.monotonic()
+    window_bytes = 0
+    for chunk in _iter_received(res.raw, low_speed_limit):
+        f.write(chunk)
+        window_bytes += len(chunk)
+        elapsed = time.monotonic() - window_start
+        if low_speed_limit and elapsed >= low_speed_time:
+            if window_bytes < low_speed_limit * elapsed:
+                raise _TransferTooSlowError(
+                    f"Transfer rate of {int(window_bytes / elapsed)} bytes/s was below {low_speed_limit} bytes/s for {int(elapsed)} seconds."
+                )
+            window_start = time.monotonic()
+            window_bytes = 0
+
+
+def _iter_received(raw, low_speed_limit):
+    # Yields the decoded body of a streamed response in the parts in which it is received, up to _STREAM_CHUNK_SIZE bytes.
+    # Unlike iter_content, which waits for complete chunks, a read returns as soon as any data is received,
+    # so that a connection that trickles data is detected after low_speed_time, and not after a full chunk.
+    # urllib3 versions without read1 read parts that take about a second at the minimum speed instead.
+    # Errors are raised as the same requests exceptions as by iter_content.
+    from requests.exceptions import ChunkedEncodingError, ConnectionError, ContentDecodingError, SSLError
+    from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+    from urllib3.exceptions import SSLError as Urllib3SSLError
+
+    if hasattr(raw, 'read1'):
+        def read():
+            return raw.read1(_STREAM_CHUNK_SIZE, decode_content=True)
+    else:
+        read_size = min(_STREAM_CHUNK_SIZE, max(_STREAM_MIN_READ_SIZE, low_speed_limit))
+
+        def read():
+            return raw.read(read_size, decode_content=True)
+
+    while True:
+        try:
+            chunk = read()
+        except ProtocolError as e:
+            raise ChunkedEncodingError(e)
+        except DecodeError as e:
+            raise ContentDecodingError(e)
+        except ReadTimeoutError as e:
+            raise ConnectionError(e)
+        except Urllib3SSLError as e:
+            raise SSLError(e)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _async_write_response_body(res, f, low_speed_limit, low_speed_time):
+    # The asyncio version of _write_response_body for aiohttp responses.
+    # iter_chunked already returns the data received so far, without waiting for complete chunks.
+    window_start = time.monotonic()
+    window_bytes = 0
+    async for chunk in res.content.iter_chunked(_STREAM_CHUNK_SIZE):
+        f.write(chunk)
+        window_bytes += len(chunk)
+        elapsed = time.monotonic() - window_start
+        if low_speed_limit and elapsed >= low_speed_time:
+            if window_bytes < low_speed_limit * elapsed:
+                raise _TransferTooSlowError(
+                    f"Transfer rate of {int(window_bytes / elapsed)} bytes/s was below {low_speed_limit} bytes/s for {int(elapsed)} seconds."
+                )
+            window_start = time.monotonic()
+            window_bytes = 0
+
+
+def _clear_download_session(cookies):
+    # Removes the cookies of the download domain, so that the next attempt goes through the SAML SSO flow again.
+    # The cookie jar of an ApiClient also removes them from the download context of the caller, see download_cookies.
+    try:
+        cookies.clear(domain='.softwaredownloads.sap.com')
+    except KeyError:
+        # No cookies of the download domain were set yet.
+        pass
+
+
+def _next_retry_delay(retry_policy, retry, previous_delay=0, response=None, wait=True):
+    # Returns the delay before the next retry of an operation that was already retried retry times,
+    # or None if the operation must not be retried anymore.
+    # response is the failed response of requests or aiohttp, whose Retry-After header is honoured.
+    if retry >= retry_policy.retries:
+        return None
+    retry_after = response.headers.get('Retry-After') if response is not None and response.headers else None
+    return retry_policy.next_delay(previous_delay, retry_after, wait)
 
 
 def _is_checksum_matched(filepath, etag):
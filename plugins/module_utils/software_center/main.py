@@ -57,19 +57,15 @@ def run_software_download(params):
     # If checksum validation is not requested, we can perform a quick check
     # for the file's existence and skip authentication if it's already there.
     if not validate_checksum:
-        if os.path.exists(filepath):
+        existing_msg = download.existing_file_message(dest, filename)
+        if existing_msg:
             result['skipped'] = True
-            result['msg'] = f"File already exists: {filename}"
-            return result
-
-        filename_similar_exists, filename_similar_names = download.check_similar_files(dest, filename)
-        if filename_similar_exists:
-            result['skipped'] = True
-            result['msg'] = f"Similar file(s) already exist: {', '.join(filename_similar_names)}"
+            result['msg'] = existing_msg
             return result
 
+    client = None
     try:
-        client = ApiClient()
+        client = ApiClient.from_params(params)
         auth.login(client, username, password)
 
         validation_result = None
@@ -93,17 +89,11 @@ def run_software_download(params):
             if validation_result['alternative_found']:
                 is_valid = False
 
-            if is_valid is True:
-                result['skipped'] = True
-                result['msg'] = f"File already exists and checksum is valid: {filename}"
-                return result
-            elif is_valid is False:
-                # The existing file is invalid, remove it to allow for re-download.
-                # The final message will explain why the re-download occurred.
-                os.remove(filepath)
-            else:  # Validation could not be performed
+            # An invalid file is removed, and the final message will explain why the re-download occurred.
+            existing_msg = download.validated_file_message(filepath, is_valid, validation_result['message'])
+            if existing_msg:
                 result['skipped'] = True
-                result['msg'] = f"File already exists: {filename}. {validation_result['message']}"
+                result['msg'] = existing_msg
                 return result
 
         alternative_found = False
@@ -137,31 +127,33 @@ def run_software_download(params):
                     result['msg'] = f"File with correct/alternative name already exists: {download_filename}"
                     return result
 
-        final_url = download.is_download_link_available(client, download_link)
-        if final_url:
-            if dry_run:
-                msg = f"SAP Software is available to download: {download_filename}"
-                if alternative_found:
-                    msg = f"Alternative SAP Software is available to download: {download_filename} - original file {query} is not available"
-                result['msg'] = msg
-            else:
-                # The link is already resolved, just download it.
-                filepath = os.path.join(dest, download_filename)
-                download.stream_file_to_disk(client, final_url, filepath)
-                result['changed'] = True
-
-                if validation_result and validation_result.get('validated') is False:
-                    result['msg'] = f"Successfully re-downloaded {download_filename} due to an invalid checksum."
-                elif alternative_found:
-                    result['msg'] = (
-                        f"Successfully downloaded alternative SAP software: {download_filename}"
-                        f" - original file {query} is not available to download"
-                    )
+        # The per-file download cookies are only kept until the file is downloaded.
+        with client.download_cookies():
+            final_url = download.is_download_link_available(client, download_link)
+            if final_url:
+                if dry_run:
+                    msg = f"SAP Software is available to download: {download_filename}"
+                    if alternative_found:
+                        msg = f"Alternative SAP Software is available to download: {download_filename} - original file {query} is not available"
+                    result['msg'] = msg
                 else:
-                    result['msg'] = f"Successfully downloaded SAP software: {download_filename}"
-        else:
-            result['failed'] = True
-            result['msg'] = f"Download link for {download_filename} is not available."
+                    # The link is already resolved, just download it.
+                    filepath = os.path.join(dest, download_filename)
+                    download.stream_file_to_disk(client, final_url, filepath)
+                    result['changed'] = True
+
+                    if validation_result and validation_result.get('validated') is False:
+                        result['msg'] = f"Successfully re-downloaded {download_filename} due to an invalid checksum."
+                    elif alternative_found:
+                        result['msg'] = (
+                            f"Successfully downloaded alternative SAP software: {download_filename}"
+                            f" - original file {query} is not available to download"
+                        )
+                    else:
+                        result['msg'] = f"Successfully downloaded SAP software: {download_filename}"
+            else:
+                result['failed'] = True
+                result['msg'] = f"Download link for {download_filename} is not available."
 
     except ImportError as e:
         result['failed'] = True
@@ -182,6 +174,7 @@ def run_software_download(params):
         result['failed'] = True
         result['msg'] = f"An unexpected error occurred: {type(e).__name__} - {e}"
     finally:
-        download.clear_download_key_cookie(client)
+        if client is not None:
+            result['http_stats'] = client.get_stats()
 
     return result
@@ -6,18 +6,45 @@ import json
 import os
 import re
 
+from urllib.parse import urlencode
+
 from .. import constants as C
 from ..exceptions import FileNotFoundError
 
+_SEARCH_HEADERS = {'User-Agent': C.USER_AGENT_CHROME, 'Accept': 'application/json'}
+
 
 def find_file(client, name, deduplicate, search_alternatives):
     # Main search function to find a software file.
     # It performs a direct search and, if requested, a fuzzy search for alternatives.
     # Returns a dictionary with file details.
+    steps = _find_file_steps(name, deduplicate, search_alternatives)
+    try:
+        search_url = next(steps)
+        while True:
+            search_url = steps.send(_get_search_results(client, search_url))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def async_find_file(async_client, name, deduplicate, search_alternatives):
+    # The asyncio version of find_file, which sends the search requests with an AsyncApiClient.
+    steps = _find_file_steps(name, deduplicate, search_alternatives)
+    try:
+        search_url = next(steps)
+        while True:
+            search_url = steps.send(await _async_get_search_results(async_client, search_url))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _find_file_steps(name, deduplicate, search_alternatives):
+    # The search logic of find_file and async_find_file, independent of how requests are sent.
+    # The generator yields the URL of each search request and receives its results.
     alternative_found = False
 
     # First, attempt a direct search for the exact filename.
-    software_search = _search_software(client, name)
+    software_search = yield from _search_software(name)
     software_filtered = [r for r in software_search if r['Title'] == name or r['Description'] == name]
 
     files_count = len(software_filtered)
@@ -26,7 +53,7 @@ def find_file(client, name, deduplicate, search_alternatives):
         if not search_alternatives:
             raise FileNotFoundError(f'File "{name}" is not available. To find a replacement, enable "search_alternatives".')
 
-        software_fuzzy_found = _search_software_fuzzy(client, name)
+        software_fuzzy_found = yield from _search_software_fuzzy(name)
         software_fuzzy_filtered, suggested_filename = _filter_fuzzy_search(software_fuzzy_found, name)
         if len(software_fuzzy_filtered) == 0:
             raise FileNotFoundError(f'File "{name}" is not available and no alternatives could be found.')
@@ -36,7 +63,7 @@ def find_file(client, name, deduplicate, search_alternatives):
         # The fuzzy search can return duplicates (e.g., .sar and .SAR).
         # We must perform another direct search on the best alternative and filter it.
         # duplicates like 70SWPM10SP43_2-20009701.sar for SWPM10SP43_2-20009701.SAR
-        software_search_alternatives = _search_software(client, software_fuzzy_alternatives)
+        software_search_alternatives = yield from _search_software(software_fuzzy_alternatives)
         software_search_alternatives_filtered = [
             file for file in software_search_alternatives
             if file.get('Title', '').startswith(suggested_filename)
@@ -78,7 +105,7 @@ def find_file(client, name, deduplicate, search_alternatives):
     }
 
 
-def _search_software(client, keyword):
+def _search_software(keyword):
     # Performs a direct search for a software file by keyword.
     url = C.URL_SOFTWARE_CENTER_SERVICE + '/SearchResultSet'
     params = {
@@ -86,21 +113,11 @@ def _search_software(client, keyword):
         'RESULT_PER_PAGE': 500,
         'SEARCH_STRING': keyword,
     }
-    headers = {'User-Agent': C.USER_AGENT_CHROME, 'Accept': 'application/json'}
-    results = []
-    try:
-        res = client.get(url, params=params, headers=headers, allow_redirects=False)
-        json_data = res.json()
-        results = json_data.get('d', {}).get('results', [])
-    except json.JSONDecodeError:
-        # This can happen if the user lacks authorization for a specific file.
-        # The API returns non-JSON, so we return an empty list.
-        pass
-
+    results = yield '?'.join((url, urlencode(params)))
     return results
 
 
-def _search_software_fuzzy(client, query):
+def _search_software_fuzzy(query):
     # Executes a fuzzy search using the unique software ID from the filename.
     filename_base = os.path.splitext(query)[0]
 
@@ -109,7 +126,7 @@ def _search_software_fuzzy(client, query):
         return []
 
     filename_id = filename_base.split('-')[-1]
-    results = _search_software(client, filename_id)
+    results = yield from _search_software(filename_id)
     num = 0
 
     fuzzy_results = []
@@ -127,13 +144,36 @@ def _search_software_fuzzy(client, query):
             break
 
         url = C.URL_SOFTWARE_CENTER_SERVICE + '/SearchResultSet'
-        query_url = '?'.join((url, query_string))
-        headers = {'User-Agent': C.USER_AGENT_CHROME, 'Accept': 'application/json'}
-        results = client.get(query_url, headers=headers, allow_redirects=False).json().get('d', {}).get('results', [])
+        results = yield '?'.join((url, query_string))
 
     return fuzzy_results
 
 
+def _get_search_results(client, search_url):
+    # Sends a search request and returns its results.
+    try:
+        res = client.get(search_url, headers=_SEARCH_HEADERS, allow_redirects=False)
+        return _get_results(res.json())
+    except json.JSONDecodeError:
+        # This can happen if the user lacks authorization for a specific file.
+        # The API returns non-JSON, so we return an empty list.
+        return []
+
+
+async def _async_get_search_results(async_client, search_url):
+    # The asyncio version of _get_search_results.
+    res = await async_client.get(search_url, headers=_SEARCH_HEADERS, allow_redirects=False)
+    try:
+        return _get_results(json.loads(await res.read()))
+    except json.JSONDecodeError:
+        return []
+
+
+def _get_results(json_data):
+    # Returns the results of a search response.
+    return json_data.get('d', {}).get('results', [])
+
+
 def _filter_fuzzy_search(fuzzy_results, filename):
     # Filters fuzzy search output using the original filename.
     if '*' in filename:
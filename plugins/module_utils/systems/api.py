@@ -2,7 +2,13 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import hashlib
+import importlib.util
 import json
+import os
+import random
+import tempfile
+import threading
 import time
 from functools import wraps
 
@@ -10,6 +16,7 @@ from urllib.parse import urljoin
 
 from .. import constants as C
 from .. import exceptions
+from ..client import build_odata_batch, parse_odata_batch
 
 
 class InstallationNotFoundError(Exception):
@@ -59,13 +66,98 @@ class DataInvalidError(Exception):
         )
 
 
-try:
-    from requests.exceptions import HTTPError
-except ImportError:
-    HAS_REQUESTS = False
-    HTTPError = None
-else:
-    HAS_REQUESTS = True
+# requests is only imported by the functions that handle its exceptions, to keep the import of this module fast.
+HAS_REQUESTS = importlib.util.find_spec('requests') is not None
+
+# Polling of new license key numbers, which can be delayed by replication in the backend.
+# Delays are in seconds and grow exponentially up to the maximum, until the deadline is reached.
+_LICENSE_KEY_POLL_INITIAL_DELAY = 2
+_LICENSE_KEY_POLL_MAX_DELAY = 20
+_LICENSE_KEY_POLL_DEADLINE = 90
+
+# Minimum and maximum number of operations per OData $batch request.
+# Fewer operations are sent as individual requests, which are not slower over reused connections.
+_BATCH_MIN_OPERATIONS = 3
+_BATCH_MAX_OPERATIONS = 50
+
+# Status codes of a $batch request with which the service does not support $batch requests at all.
+_BATCH_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+
+class _MetadataCache:
+    # Caches catalogue responses of the systems provisioning service, such as products,
+    # versions, system fields and license types, for a limited time.
+    #
+    # Entries are keyed by their query path, which contains the user, installation,
+    # product and version. They are kept in memory for the current run and, if a
+    # directory is configured, persisted as one JSON file per entry for later runs.
+    def __init__(self):
+        self.ttl = 3600
+        self.cache_dir = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def configure(self, ttl=None, cache_dir=None):
+        if ttl is not None:
+            self.ttl = ttl
+        self.cache_dir = cache_dir
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.cache_dir:
+            entry = self._read_file(key)
+            if entry is not None:
+                with self._lock:
+                    self._entries[key] = entry
+        if entry is None or now - entry['stored_at'] > self.ttl:
+            return None
+        return entry['value']
+
+    def set(self, key, value):
+        entry = {'key': key, 'stored_at': time.time(), 'value': value}
+        with self._lock:
+            self._entries[key] = entry
+        if self.cache_dir:
+            self._write_file(key, entry)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _read_file(self, key):
+        # Unreadable or foreign entries are treated as missing.
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get('key') == key else None
+
+    def _write_file(self, key, entry):
+        # Written atomically, so concurrent runs never read a partial entry.
+        # The cache is an optimization only, so write errors are ignored.
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_file = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(temp_file, self._path(key))
+        except OSError:
+            pass
+
+
+_METADATA_CACHE = _MetadataCache()
+
+# Module-level cache
+_CSRF_TOKEN = None
+_BATCH_SUPPORTED = True
+_FIELD_INDEXES = {}
+
+
+def configure_metadata_cache(ttl=None, cache_dir=None):
+    # Sets the lifetime in seconds and the optional directory of the metadata cache.
+    _METADATA_CACHE.configure(ttl, cache_dir)
 
 
 def require_requests(func):
@@ -81,16 +173,52 @@ def require_requests(func):
 @require_requests
 def get_systems(client, filter_str):
     # Retrieves a list of systems based on an OData filter string.
+    return list(iter_systems(client, filter_str))
+
+
+@require_requests
+def iter_systems(client, filter_str, fields=None, page_size=None, max_results=None):
+    # Yields the systems matching an OData filter string page by page, so they never have to be held in memory at once.
+    # Server-driven paging ('__next' links) is always followed. With a page size, pages are also requested with $top/$skip.
+    # Fields limits the returned properties with $select, and max_results stops the query after that many systems.
     query_path = f"Systems?$filter={filter_str}"
-    return client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+    if fields:
+        query_path += f"&$select={','.join(fields)}"
+
+    skip = 0
+    url = _url(_page_path(query_path, page_size, skip))
+    count = 0
+    previous_first = None
+    while url and (max_results is None or count < max_results):
+        page = client.get(url, headers=_headers({})).json()['d']
+        results = page['results']
+        # A backend that ignores $skip or returns the same '__next' link would otherwise be queried forever.
+        if not results or results[0] == previous_first:
+            return
+        previous_first = results[0]
+        for system in results:
+            if max_results is not None and count >= max_results:
+                return
+            count += 1
+            yield system
+
+        # The offset also counts the systems of server-driven pages, in case paging continues with $skip.
+        skip += len(results)
+        if page.get('__next'):
+            url = urljoin(_url(''), page['__next'])
+        elif page_size and len(results) == page_size:
+            url = _url(_page_path(query_path, page_size, skip))
+        else:
+            url = None
 
 
 @require_requests
 def get_system(client, system_nr, installation_nr, username):
     # Retrieves details for a single, specific system.
-    filter_str = f"Uname eq '{username}' and Insnr eq '{installation_nr}' and Sysnr eq '{system_nr}'"
+    from requests.exceptions import HTTPError
+
     try:
-        systems = get_systems(client, filter_str)
+        systems = _get_results(client, _system_path(system_nr, installation_nr, username))
     except HTTPError as err:
         # In case the system is not found, the backend doesn't return an empty result set or a 404, but a 400.
         # To make the error checking here as resilient as possible, just consider an error 400 as an invalid user error and return it to the user.
@@ -98,25 +226,20 @@ def get_system(client, system_nr, installation_nr, username):
             raise SystemNotFoundError(system_nr, err.response.content)
         else:
             raise err
+    return _select_system(systems, system_nr)
 
-    if len(systems) == 0:
-        raise SystemNotFoundError(system_nr, "no systems returned by API")
 
-    system = systems[0]
-    if 'Prodver' not in system and 'Version' not in system:
-        raise exceptions.SapLaunchpadError(
-            f"System {system_nr} was found, but it is missing a required Product Version ID "
-            f"(checked for 'Prodver' and 'Version' keys). System details: {system}"
-        )
-
-    return system
+@require_requests
+def get_system_and_licenses(client, system_nr, installation_nr, username):
+    # Retrieves details for a single system and its existing license keys.
+    # Two queries are not worth a $batch request, see _BATCH_MIN_OPERATIONS.
+    return get_system(client, system_nr, installation_nr, username), get_existing_licenses(client, system_nr, username)
 
 
 @require_requests
 def get_product_id(client, product_name, installation_nr, username):
     # Finds the internal product ID for a given product name.
-    query_path = f"SysProducts?$filter=Uname eq '{username}' and Insnr eq '{installation_nr}' and Sysnr eq '' and Nocheck eq ''"
-    products = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+    products = _get_metadata_results(client, _products_path(username, installation_nr))
     product = next((p for p in products if p['Description'] == product_name), None)
     if product is None:
         raise ProductNotFoundError(product_name, [p['Description'] for p in products])
@@ -127,7 +250,7 @@ def get_product_id(client, product_name, installation_nr, username):
 def get_version_id(client, version_name, product_id, installation_nr, username):
     # Finds the internal version ID for a given product version name.
     query_path = f"SysVersions?$filter=Uname eq '{username}' and Insnr eq '{installation_nr}' and Product eq '{product_id}' and Nocheck eq ''"
-    versions = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+    versions = _get_metadata_results(client, query_path)
     version = next((v for v in versions if v['Description'] == version_name), None)
     if version is None:
         raise VersionNotFoundError(version_name, [v['Description'] for v in versions])
@@ -137,8 +260,7 @@ def get_version_id(client, version_name, product_id, installation_nr, username):
 @require_requests
 def validate_installation(client, installation_nr, username):
     # Checks if the user has access to the specified installation number.
-    query_path = f"Installations?$filter=Ubname eq '{username}' and ValidateOnly eq ''"
-    installations = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+    installations = _get_metadata_results(client, _installations_path(username))
     if not any(i['Insnr'] == installation_nr for i in installations):
         raise InstallationNotFoundError(installation_nr, [i['Insnr'] for i in installations])
 
@@ -147,9 +269,9 @@ def validate_installation(client, installation_nr, username):
 def validate_system_data(client, data, version_id, system_nr, installation_nr, username):
     # Validates user-provided system data against the fields supported by the API for a given product version.
     query_path = f"SystData?$filter=Pvnr eq '{version_id}' and Insnr eq '{installation_nr}'"
-    results = client.get(_url(query_path), headers=_headers({})).json()['d']['results'][0]
-    possible_fields = json.loads(results['Output'])
-    final_fields = _validate_user_data_against_supported_fields("system", data, possible_fields)
+    results = _get_metadata_results(client, query_path)
+    field_index = _get_index(query_path, results, lambda r: _FieldIndex(json.loads(r[0]['Output'])))
+    final_fields = _validate_user_data_against_supported_fields("system", data, field_index)
 
     final_fields['Version'] = version_id
     final_fields['Insnr'] = installation_nr
@@ -171,16 +293,18 @@ def validate_system_data(client, data, version_id, system_nr, installation_nr, u
 def validate_licenses(client, licenses, version_id, installation_nr, username):
     # Validates user-provided license data against the license types and fields supported by the API.
     query_path = f"LicenseType?$filter=PRODUCT eq '{version_id}' and INSNR eq '{installation_nr}' and Uname eq '{username}' and Nocheck eq 'X'"
-    results = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
-    available_license_types = {r["LICENSETYPE"] for r in results}
+    results = _get_metadata_results(client, query_path)
+    license_types = _get_index(query_path, results, _index_license_types)
+    available_license_types = set(license_types)
     license_data = []
 
     for lic in licenses:
-        result = next((r for r in results if r["LICENSETYPE"] == lic['type']), None)
-        if result is None:
+        license_type = license_types.get(lic['type'])
+        if license_type is None:
             raise LicenseTypeInvalidError(lic['type'], available_license_types)
 
-        final_fields = _validate_user_data_against_supported_fields(f'license {lic["type"]}', lic['data'], json.loads(result["Selfields"]))
+        result, field_index = license_type
+        final_fields = _validate_user_data_against_supported_fields(f'license {lic["type"]}', lic['data'], field_index)
         final_fields = {k.upper(): v for k, v in final_fields.items()}
         final_fields["LICENSETYPE"] = result['PRODID']
         final_fields["LICENSETYPETEXT"] = result['LICENSETYPE']
@@ -193,16 +317,23 @@ def get_existing_licenses(client, system_nr, username):
     # Retrieves all existing license keys for a given system.
     # When updating the licenses based on the results here, the backend expects a completely different format.
     # This function transforms the response to the format the backend expects for subsequent update calls.
-    query_path = f"LicenseKeys?$filter=Uname eq '{username}' and Sysnr eq '{system_nr}'"
-    results = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
-    return [
-        {
-            "LICENSETYPETEXT": r["LicenseDescr"], "LICENSETYPE": r["Prodid"], "HWKEY": r["Hwkey"],
-            "EXPDATE": r["LidatC"], "STATUS": r["Status"], "STATUSCODE": r["StatusCode"],
-            "KEYNR": r["Keynr"], "QUANTITY": r["Ulimit"], "QUANTITY_C": r["UlimitC"],
-            "MAXEXPDATE": r["MaxLiDat"]
-        } for r in results
-    ]
+    return _to_existing_licenses(_get_results(client, _license_keys_path(system_nr, username)))
+
+
+@require_requests
+def get_existing_licenses_of_systems(client, system_nrs, username):
+    # Retrieves the existing license keys of several systems, grouped into OData $batch requests.
+    # Returns the licenses by system number, in the format of get_existing_licenses.
+    licenses = {}
+    for start in range(0, len(system_nrs), _BATCH_MAX_OPERATIONS):
+        chunk = system_nrs[start:start + _BATCH_MAX_OPERATIONS]
+        results = _batch_results(client, [_license_keys_path(system_nr, username) for system_nr in chunk])
+        for system_nr, license_keys in zip(chunk, results):
+            if license_keys is None:
+                licenses[system_nr] = get_existing_licenses(client, system_nr, username)
+            else:
+                licenses[system_nr] = _to_existing_licenses(license_keys)
+    return licenses
 
 
 @require_requests
@@ -212,12 +343,7 @@ def generate_licenses(client, license_data, existing_licenses, version_id, insta
         "Prodver": version_id, "ActionCode": "add", "ExistingData": json.dumps(existing_licenses),
         "Entry": json.dumps(license_data), "Nocheck": "", "Insnr": installation_nr, "Uname": username
     }
-    token = _get_csrf_token(client)
-    post_headers = _headers({
-        'x-csrf-token': token,
-        'X-Requested-With': 'XMLHttpRequest'
-    })
-    response = client.post(_url("BSHWKEY"), json=body, headers=post_headers).json()
+    response = _post_with_csrf_token(client, "BSHWKEY", json=body).json()
     return json.loads(response['d']['Result'])
 
 
@@ -236,12 +362,7 @@ def submit_system(client, is_new, system_data, generated_licenses, username):
             } for lic in generated_licenses
         ])
     }
-    token = _get_csrf_token(client)
-    post_headers = _headers({
-        'x-csrf-token': token,
-        'X-Requested-With': 'XMLHttpRequest'
-    })
-    response = client.post(_url("Submit"), json=body, headers=post_headers).json()
+    response = _post_with_csrf_token(client, "Submit", json=body).json()
     licdata = json.loads(response['d']['licdata'])
     if not licdata:
         raise exceptions.SapLaunchpadError(
@@ -254,26 +375,49 @@ def submit_system(client, is_new, system_data, generated_licenses, username):
 @require_requests
 def get_license_key_numbers(client, license_data, system_nr, username):
     # Retrieves the unique key numbers for a list of recently created licenses.
-    key_nrs = []
-    for lic in license_data:
-        query_path = f"LicenseKeys?$filter=Uname eq '{username}' and Sysnr eq '{system_nr}' and Prodid eq '{lic['LICENSETYPE']}' and Hwkey eq '{lic['HWKEY']}'"
-
-        # Retry logic to handle potential replication delay in the backend API after a license is submitted.
-        for attempt in range(9):
-            results = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
-            if results:
-                key_nrs.append(results[0]['Keynr'])
-                break  # Found it, break the retry loop
-
-            if attempt < 8:  # Don't sleep on the last attempt
-                time.sleep(10)  # Wait 10 seconds before retrying
-        else:  # This 'else' belongs to the 'for' loop, it runs if the loop completes without a 'break'
+    # All pending licenses are resolved from a single query of the system's license keys per round,
+    # polling with exponential backoff and jitter to handle replication delay in the backend.
+    query_path = _license_keys_path(system_nr, username)
+    pending = {(lic['LICENSETYPE'], lic['HWKEY']) for lic in license_data}
+    key_nrs_found = {}
+
+    deadline = time.monotonic() + _LICENSE_KEY_POLL_DEADLINE
+    delay = _LICENSE_KEY_POLL_INITIAL_DELAY
+    while True:
+        results = client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+        for r in results:
+            key = (r['Prodid'], r['Hwkey'])
+            if key in pending:
+                key_nrs_found.setdefault(key, r['Keynr'])
+        pending.difference_update(key_nrs_found)
+
+        if not pending:
+            break
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            missing = ', '.join(f"license type '{prodid}' and HW key '{hwkey}'" for prodid, hwkey in sorted(pending))
             raise exceptions.SapLaunchpadError(
-                f"Could not find license key number for license type '{lic['LICENSETYPE']}' and HW key '{lic['HWKEY']}' "
+                f"Could not find license key number for {missing} "
                 f"on system '{system_nr}' after submitting the changes. There might be a replication delay in the SAP backend."
             )
 
-    return key_nrs
+        time.sleep(min(random.uniform(delay / 2, delay), remaining))
+        delay = min(delay * 2, _LICENSE_KEY_POLL_MAX_DELAY)
+
+    return [key_nrs_found[(lic['LICENSETYPE'], lic['HWKEY'])] for lic in license_data]
+
+
+@require_requests
+def prefetch_installation_metadata(client, installation_nrs, username):
+    # Loads the installations and the products of the given installations into the metadata cache
+    # with a single OData $batch request.
+    # Prefetching is best effort: entries that cannot be prefetched are retrieved individually when needed.
+    query_paths = [_installations_path(username)] + [_products_path(username, nr) for nr in dict.fromkeys(installation_nrs)]
+    missing = [p for p in query_paths if _METADATA_CACHE.get(p) is None]
+    for query_path, results in zip(missing, _batch_results(client, missing)):
+        if results is not None:
+            _METADATA_CACHE.set(query_path, results)
 
 
 @require_requests
@@ -290,12 +434,7 @@ def delete_licenses(client, licenses_to_delete, existing_licenses, version_id, i
         "Prodver": version_id, "ActionCode": "delete", "ExistingData": json.dumps(existing_licenses),
         "Entry": json.dumps(licenses_to_delete), "Nocheck": "", "Insnr": installation_nr, "Uname": username
     }
-    token = _get_csrf_token(client)
-    post_headers = _headers({
-        'x-csrf-token': token,
-        'X-Requested-With': 'XMLHttpRequest'
-    })
-    response = client.post(_url("BSHWKEY"), json=body, headers=post_headers).json()
+    response = _post_with_csrf_token(client, "BSHWKEY", json=body).json()
     return json.loads(response['d']['Result'])
 
 
@@ -304,11 +443,142 @@ def _url(query_path):
     return f'{C.URL_SYSTEMS_PROVISIONING}/{query_path}'
 
 
+@require_requests
+def _get_metadata_results(client, query_path):
+    # Retrieves the results of a catalogue query, served from the metadata cache when possible.
+    results = _METADATA_CACHE.get(query_path)
+    if results is None:
+        results = _get_results(client, query_path)
+        _METADATA_CACHE.set(query_path, results)
+    return results
+
+
+@require_requests
+def _get_results(client, query_path):
+    # Retrieves the results of a single read query.
+    return client.get(_url(query_path), headers=_headers({})).json()['d']['results']
+
+
+def _select_system(systems, system_nr):
+    # Returns the system from the results of a system query, which must contain a product version ID.
+    if len(systems) == 0:
+        raise SystemNotFoundError(system_nr, "no systems returned by API")
+
+    system = systems[0]
+    if 'Prodver' not in system and 'Version' not in system:
+        raise exceptions.SapLaunchpadError(
+            f"System {system_nr} was found, but it is missing a required Product Version ID "
+            f"(checked for 'Prodver' and 'Version' keys). System details: {system}"
+        )
+
+    return system
+
+
+def _to_existing_licenses(results):
+    # Transforms license keys as returned by the API to the format the backend expects for subsequent update calls.
+    return [
+        {
+            "LICENSETYPETEXT": r["LicenseDescr"], "LICENSETYPE": r["Prodid"], "HWKEY": r["Hwkey"],
+            "EXPDATE": r["LidatC"], "STATUS": r["Status"], "STATUSCODE": r["StatusCode"],
+            "KEYNR": r["Keynr"], "QUANTITY": r["Ulimit"], "QUANTITY_C": r["UlimitC"],
+            "MAXEXPDATE": r["MaxLiDat"]
+        } for r in results
+    ]
+
+
+def _page_path(query_path, page_size, skip):
+    # Appends $top and $skip for client-driven paging, if a page size is set.
+    if not page_size:
+        return query_path
+    return f"{query_path}&$top={page_size}&$skip={skip}"
+
+
+def _system_path(system_nr, installation_nr, username):
+    return f"Systems?$filter=Uname eq '{username}' and Insnr eq '{installation_nr}' and Sysnr eq '{system_nr}'"
+
+
+def _license_keys_path(system_nr, username):
+    return f"LicenseKeys?$filter=Uname eq '{username}' and Sysnr eq '{system_nr}'"
+
+
+def _installations_path(username):
+    return f"Installations?$filter=Ubname eq '{username}' and ValidateOnly eq ''"
+
+
+def _products_path(username, installation_nr):
+    return f"SysProducts?$filter=Uname eq '{username}' and Insnr eq '{installation_nr}' and Sysnr eq '' and Nocheck eq ''"
+
+
+@require_requests
+def _batch_results(client, query_paths):
+    # Retrieves the results of several read queries with a single OData $batch request.
+    # Returns the results per query path in order, with None for every operation that did not succeed.
+    # Fewer than _BATCH_MIN_OPERATIONS queries are not batched and return None for every operation.
+    # If the service does not know $batch requests, they are not attempted again for the rest of the run.
+    # Other errors, like an invalid CSRF token or a server error, only fail this batch.
+    global _BATCH_SUPPORTED
+    from requests.exceptions import HTTPError, RequestException
+
+    results = [None] * len(query_paths)
+    if not _BATCH_SUPPORTED or len(query_paths) < _BATCH_MIN_OPERATIONS:
+        return results
+
+    content_type, body = build_odata_batch(query_paths, {'Accept': 'application/json'})
+    try:
+        res = _post_with_csrf_token(client, '$batch', data=body, headers={'Accept': 'multipart/mixed', 'Content-Type': content_type})
+        operations = parse_odata_batch(res.headers.get('Content-Type'), res.text)
+    except HTTPError as err:
+        if err.response is not None and err.response.status_code in _BATCH_UNSUPPORTED_STATUS_CODES:
+            _BATCH_SUPPORTED = False
+        return results
+    except (ValueError, RequestException, exceptions.SapLaunchpadError):
+        return results
+
+    if len(operations) != len(query_paths):
+        return results
+    for index, (status_code, content) in enumerate(operations):
+        if status_code == 200:
+            try:
+                results[index] = json.loads(content)['d']['results']
+            except (ValueError, KeyError, TypeError):
+                pass
+    return results
+
+
 def _headers(additional_headers):
     # Helper to construct standard request headers.
     return {**{'Accept': 'application/json'}, **additional_headers}
 
 
+@require_requests
+def _post_with_csrf_token(client, query_path, headers=None, **kwargs):
+    # Sends a write request using the cached CSRF token, fetching one only if none is cached.
+    # If the server rejects the token as invalid or expired, a new token is fetched and the request is retried once.
+    global _CSRF_TOKEN
+    from requests.exceptions import HTTPError
+
+    for attempt in range(2):
+        token = _CSRF_TOKEN or _get_csrf_token(client)
+        _CSRF_TOKEN = token
+        post_headers = _headers({
+            'x-csrf-token': token,
+            'X-Requested-With': 'XMLHttpRequest',
+            **(headers or {})
+        })
+        try:
+            return client.post(_url(query_path), headers=post_headers, **kwargs)
+        except HTTPError as err:
+            if attempt > 0 or not _is_csrf_token_required(err.response):
+                raise
+            _CSRF_TOKEN = None
+
+
+def _is_csrf_token_required(response):
+    # The service answers with 403 and the header 'x-csrf-token: Required' when the token is not accepted.
+    return (response is not None and response.status_code == 403
+            and response.headers.get('x-csrf-token', '').lower() == 'required')
+
+
 @require_requests
 def _get_csrf_token(client):
     # Fetches the CSRF token required for POST/write operations.
@@ -337,26 +607,59 @@ def _get_csrf_token(client):
     return token
 
 
-def _validate_user_data_against_supported_fields(scope, user_data, possible_fields):
-    # A generic helper to validate a dictionary of user data against a list of API-supported fields.
-    unknown_fields = {field for field in user_data if not any(field == pf['FIELD'] for pf in possible_fields)}
+class _FieldIndex:
+    # Index of the fields supported by the API for one scope, such as the system data of a product version
+    # or the data of a license type, for lookups by field name and by option value.
+    def __init__(self, possible_fields):
+        self.fields = {}
+        self.options = {}
+        for pf in possible_fields:
+            self.fields.setdefault(pf['FIELD'], pf)
+            options = self.options.setdefault(pf['FIELD'], {})
+            for entry in pf['DATA']:
+                options.setdefault(entry['VALUE'], entry['NAME'])
+
+
+def _index_license_types(results):
+    # Indexes the license types of a product version by name, together with the index of their fields.
+    license_types = {}
+    for r in results:
+        if r['LICENSETYPE'] not in license_types:
+            license_types[r['LICENSETYPE']] = (r, _FieldIndex(json.loads(r['Selfields'])))
+    return license_types
+
+
+def _get_index(query_path, results, build):
+    # Returns the index built from the results of a catalogue query.
+    # The index is reused for as long as the metadata cache returns the same results for the query.
+    cached = _FIELD_INDEXES.get(query_path)
+    if cached is None or cached[0] is not results:
+        cached = (results, build(results))
+        _FIELD_INDEXES[query_path] = cached
+    return cached[1]
+
+
+def _validate_user_data_against_supported_fields(scope, user_data, field_index):
+    # A generic helper to validate a dictionary of user data against the indexed fields supported by the API.
+    unknown_fields = {field for field in user_data if field not in field_index.fields}
     missing_required_fields = {}
     fields_with_invalid_option = {}
     final_fields = {}
 
-    for pf in possible_fields:
-        user_value = user_data.get(pf["FIELD"])
+    for field, pf in field_index.fields.items():
+        user_value = user_data.get(field)
         if user_value is not None:
             if len(pf["DATA"]) == 0:
-                final_fields[pf["FIELD"]] = user_value
+                final_fields[field] = user_value
             else:
-                resolved_value = next((entry["NAME"] for entry in pf["DATA"] if entry['VALUE'] == user_value), None)
+                options = field_index.options[field]
+                resolved_value = options.get(user_value) if not isinstance(user_value, (dict, list)) else None
                 if resolved_value is None:
-                    fields_with_invalid_option[pf["FIELD"]] = [d['VALUE'] for d in pf["DATA"]]
+                    fields_with_invalid_option[field] = list(options)
                 else:
-                    final_fields[pf["FIELD"]] = resolved_value
+                    final_fields[field] = resolved_value
         elif pf['REQUIRED'] == "X":
-            missing_required_fields[pf["FIELD"]] = [d['VALUE'] for d in pf["DATA"]]
+            missing_required_fields[field] = list(field_index.options[field])
 
     if len(unknown_fields) > 0 or len(missing_required_fields) > 0 or len(fields_with_invalid_option) > 0:
         raise DataInvalidError(scope, unknown_fields, missing_required_fields, fields_with_invalid_option)
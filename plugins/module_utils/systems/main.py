@@ -2,21 +2,50 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import filecmp
+import json
+import os
 import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from .. import auth, exceptions
 from ..client import ApiClient
 from . import api
 
+# Errors reported as a failure message of the license_keys runners.
+_LICENSE_KEYS_ERRORS = (
+    exceptions.SapLaunchpadError,
+    api.InstallationNotFoundError,
+    api.SystemNotFoundError,
+    api.ProductNotFoundError,
+    api.VersionNotFoundError,
+    api.LicenseTypeInvalidError,
+    api.DataInvalidError,
+)
+
+# The number of independent lookups of one system that are run concurrently.
+_ENTRY_CONCURRENCY = 2
+
 
 def run_systems_info(params):
     # Main runner function for the systems_info module.
-    result = {'changed': False, 'failed': False, 'systems': []}
+    result = {'changed': False, 'failed': False, 'systems': [], 'count': 0}
 
+    client = None
     try:
-        client = ApiClient()
+        client = ApiClient.from_params(params)
         auth.login(client, params['suser_id'], params['suser_password'])
-        result['systems'] = api.get_systems(client, params['filter'])
+        snapshot_path = params.get('snapshot_path')
+        systems = api.iter_systems(client, params['filter'], _query_fields(params, bool(snapshot_path)), params.get('page_size'), params.get('max_results'))
+
+        if snapshot_path:
+            # Only the difference to the snapshot is returned. The snapshot is written by the systems_export module.
+            result['delta'], snapshot, result['warnings'] = _compare_snapshot(systems, snapshot_path, _snapshot_query(params))
+            result['count'] = len(snapshot['systems'])
+        else:
+            result['systems'] = list(systems)
+            result['count'] = len(result['systems'])
     except ImportError as e:
         result['failed'] = True
         if 'requests' in str(e):
@@ -30,167 +59,213 @@ def run_systems_info(params):
     except (exceptions.SapLaunchpadError, api.SystemNotFoundError) as e:
         result['failed'] = True
         result['msg'] = str(e)
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
+
     return result
 
 
+def run_systems_export(params):
+    # Main runner function for the systems_export module.
+    # Systems are streamed to the file as they are retrieved, instead of being returned in the module result.
+    result = {'changed': False, 'failed': False, 'count': 0, 'dest': params['dest']}
+
+    client = None
+    try:
+        client = ApiClient.from_params(params)
+        auth.login(client, params['suser_id'], params['suser_password'])
+        is_snapshot = params.get('format') == 'snapshot'
+        systems = api.iter_systems(client, params['filter'], _query_fields(params, is_snapshot), params.get('page_size'), params.get('max_results'))
+
+        if is_snapshot:
+            # The snapshot replaces the previous one, and the difference to it is returned.
+            result['delta'], snapshot, result['warnings'] = _compare_snapshot(systems, params['dest'], _snapshot_query(params))
+            result['count'] = len(snapshot['systems'])
+            result['changed'] = _write_file_if_changed(params['dest'], lambda f: json.dump(snapshot, f, sort_keys=True, indent=1))
+        else:
+            result['count'], result['changed'] = _write_json_lines(systems, params['dest'])
+    except ImportError as e:
+        result['failed'] = True
+        if 'requests' in str(e):
+            result['missing_dependency'] = 'requests'
+        elif 'urllib3' in str(e):
+            result['missing_dependency'] = 'urllib3'
+        elif 'beautifulsoup4' in str(e):
+            result['missing_dependency'] = 'beautifulsoup4'
+        else:
+            result['msg'] = "An unexpected import error occurred: {0}".format(e)
+    except (exceptions.SapLaunchpadError, api.SystemNotFoundError) as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
+
+    return result
+
+
+def _write_json_lines(systems, output_file):
+    # Writes one JSON object per system to the output file and returns the number of systems written.
+    count = 0
+
+    def write(f):
+        nonlocal count
+        for system in systems:
+            f.write(json.dumps(system, sort_keys=True) + '\n')
+            count += 1
+
+    changed = _write_file_if_changed(output_file, write)
+    return count, changed
+
+
+def _query_fields(params, is_snapshot):
+    # Returns the system properties to retrieve. Snapshots are keyed by the system number, which is always retrieved for them.
+    fields = params.get('fields')
+    if fields and is_snapshot and 'Sysnr' not in fields:
+        return fields + ['Sysnr']
+    return fields
+
+
+def _snapshot_query(params):
+    # Returns the query stored with a snapshot, to detect a comparison with a snapshot of a different query.
+    return {'filter': params['filter'], 'fields': params.get('fields')}
+
+
+def _compare_snapshot(systems, snapshot_path, query):
+    # Compares the retrieved systems with the snapshot file of a previous run, keyed by system number.
+    # A missing snapshot file counts as empty snapshot. The snapshot file is not changed.
+    # Returns the delta, the snapshot of the retrieved systems, and warnings.
+    current = {system['Sysnr']: system for system in systems}
+
+    previous = {'query': query, 'systems': {}}
+    if os.path.isfile(snapshot_path):
+        try:
+            with open(snapshot_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            raise exceptions.SapLaunchpadError(f"Cannot read the systems snapshot '{snapshot_path}': {e}")
+        if not isinstance(previous, dict) or not isinstance(previous.get('systems'), dict):
+            raise exceptions.SapLaunchpadError(f"The systems snapshot '{snapshot_path}' has an unexpected format.")
+
+    warnings = []
+    if previous.get('query') != query:
+        warnings.append(f"The snapshot '{snapshot_path}' was taken with a different filter or fields, the delta may include unrelated systems.")
+
+    previous_systems = previous['systems']
+    delta = {
+        'added': [current[nr] for nr in current if nr not in previous_systems],
+        'removed': [previous_systems[nr] for nr in previous_systems if nr not in current],
+        'modified': [current[nr] for nr in current if nr in previous_systems and previous_systems[nr] != current[nr]],
+    }
+    return delta, {'query': query, 'systems': current}, warnings
+
+
+def _write_file_if_changed(output_file, write):
+    # Writes a file with the given function, first to a temporary file that only replaces the output file if its content changed.
+    # Returns whether the output file was changed.
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    if os.path.isdir(output_file) or not os.path.isdir(output_dir):
+        raise exceptions.SapLaunchpadError(f"Cannot write systems to '{output_file}': the parent directory must exist and the path must not be a directory.")
+    fd, temp_file = tempfile.mkstemp(suffix='.tmp', dir=output_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            write(f)
+
+        if os.path.isfile(output_file) and filecmp.cmp(temp_file, output_file, shallow=False):
+            return False
+
+        # mkstemp creates files readable only by the owner, apply the default permissions instead.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_file, 0o666 & ~umask)
+        os.replace(temp_file, output_file)
+        return True
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
 def run_license_keys(params):
     # Main runner function for the license_keys module.
     result = {'changed': False, 'failed': False, 'warnings': []}
 
+    client = None
     try:
-        client = ApiClient()
-        username = params['suser_id']
-        password = params['suser_password']
-        installation_nr = params['installation_nr']
-        system_nr = params['system_nr']
-        state = params['state']
-
-        auth.login(client, username, password)
-        api.validate_installation(client, installation_nr, username)
-
-        # If system_nr is not provided, try to find it using the SID for idempotency.
-        if not system_nr:
-            system_data_params = params.get('system_data', {})
-            sid = system_data_params.get('sysid')
-            if sid:
-                filter_str = f"Insnr eq '{installation_nr}' and sysid eq '{sid}'"
-                existing_systems = api.get_systems(client, filter_str)
-                if len(existing_systems) == 1:
-                    system_nr = existing_systems[0]['Sysnr']
-                    result['warnings'].append(f"A system with SID '{sid}' already exists. Using system number {system_nr} for update.")
-                elif len(existing_systems) > 1:
-                    # Ambiguous situation: multiple systems with the same SID.
-                    # Force user to provide system_nr to select one.
-                    system_nrs_found = [s['Sysnr'] for s in existing_systems]
-                    result['failed'] = True
-                    result['msg'] = (f"Multiple systems with SID '{sid}' found under installation '{installation_nr}': "
-                                     f"{', '.join(system_nrs_found)}. Please provide a specific 'system_nr' to select which system to update.")
-                    return result
+        client = ApiClient.from_params(params)
+        api.configure_metadata_cache(params.get('metadata_cache_ttl'), params.get('metadata_cache_path'))
+        auth.login(client, params['suser_id'], params['suser_password'])
+        _ensure_license_keys(client, params, result, min(_ENTRY_CONCURRENCY, client.pool_maxsize))
 
-        is_new_system = not system_nr
-        if is_new_system:
-            if state == 'absent':
-                result['msg'] = "Cannot ensure absence of a new system; system_nr is required."
-                result['failed'] = True
-                return result
+    except ImportError as e:
+        result['failed'] = True
+        if 'requests' in str(e):
+            result['missing_dependency'] = 'requests'
+        elif 'urllib3' in str(e):
+            result['missing_dependency'] = 'urllib3'
+        elif 'beautifulsoup4' in str(e):
+            result['missing_dependency'] = 'beautifulsoup4'
+        else:
+            result['msg'] = "An unexpected import error occurred: {0}".format(e)
 
-            product_id = api.get_product_id(client, params['product_name'], installation_nr, username)
-            version_id = api.get_version_id(client, params['product_version'], product_id, installation_nr, username)
+    except _LICENSE_KEYS_ERRORS as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    except Exception as e:
+        result['failed'] = True
+        result['msg'] = f"An unexpected error occurred: {type(e).__name__} - {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
 
-            system_data, warning = api.validate_system_data(client, params['system_data'], version_id, system_nr, installation_nr, username)
-            if warning:
-                result['warnings'].append(warning)
+    return result
 
-            license_data = api.validate_licenses(client, params['licenses'], version_id, installation_nr, username)
-            generated_licenses = api.generate_licenses(client, license_data, [], version_id, installation_nr, username)
-            system_nr = api.submit_system(client, True, system_data, generated_licenses, username)
 
-            result['changed'] = True
-            result['system_nr'] = system_nr
-            result['msg'] = f"System {system_nr} created successfully."
-
-        else:  # Existing system
-            system = api.get_system(client, system_nr, installation_nr, username)
-            # The API has been observed to return the version ID under the 'Version' key for existing systems.
-            # We check for 'Version' first, then fall back to 'Prodver' for compatibility.
-            version_id = system.get('Version') or system.get('Prodver')
-            if not version_id:
-                raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required Product Version ID.")
-            existing_licenses = api.get_existing_licenses(client, system_nr, username)
-
-            # The API requires a sysdata payload even for an edit operation.
-            # It must contain at least the installation number, system number, product version, and system ID.
-            sysid = system.get('sysid')
-            if not sysid:
-                raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required System ID ('sysid').")
-
-            systype = system.get('systype')
-            if not systype:
-                raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required System Type ('systype').")
-
-            sysdata_for_edit = [
-                {"name": "insnr", "value": installation_nr},
-                {"name": "sysnr", "value": system_nr},
-                {"name": "prodver", "value": version_id},
-                {"name": "sysid", "value": sysid},
-                {"name": "systype", "value": systype}
-            ]
+def run_license_keys_batch(params):
+    # Main runner function for the license_keys_batch module.
+    # All systems share one authenticated session and the cached installation and product version lookups.
+    # Systems are processed concurrently, while all entries for the same system run in the given order.
+    result = {'changed': False, 'failed': False, 'results': [], 'msg': ''}
 
-            if state == 'present':
-                user_licenses = params.get('licenses')
-                if not user_licenses:
-                    result['msg'] = "System already present. No licenses specified to update."
-                    return result
-
-                license_data = api.validate_licenses(client, user_licenses, version_id, installation_nr, username)
-                new_or_changed = [
-                    l for l in license_data if not any(
-                        l['HWKEY'] == el['HWKEY'] and l['LICENSETYPE'] == el['LICENSETYPE']
-                        for el in existing_licenses
-                    )
-                ]
+    client = None
+    try:
+        client = ApiClient.from_params(params)
+        api.configure_metadata_cache(params.get('metadata_cache_ttl'), params.get('metadata_cache_path'))
+        auth.login(client, params['suser_id'], params['suser_password'])
 
-                if not new_or_changed:
-                    result['msg'] = "System and licenses are already in the desired state."
-                    return result
-
-                generated = api.generate_licenses(client, new_or_changed, existing_licenses, version_id, installation_nr, username)
-                api.submit_system(client, False, sysdata_for_edit, generated, username)
-                result['changed'] = True
-                result['msg'] = f"System {system_nr} licenses updated successfully."
-
-            elif state == 'absent':
-                user_licenses_to_keep = params.get('licenses', [])
-                if not user_licenses_to_keep:  # Delete all licenses
-                    licenses_to_delete = existing_licenses
-                else:
-                    validated_to_keep = api.validate_licenses(client, user_licenses_to_keep, version_id, installation_nr, username)
-                    key_nrs_to_keep = [
-                        l['KEYNR'] for l in existing_licenses if any(
-                            k['HWKEY'] == l['HWKEY'] and k['LICENSETYPE'] == l['LICENSETYPE']
-                            for k in validated_to_keep
-                        )
-                    ]
-                    licenses_to_delete = [l for l in existing_licenses if l['KEYNR'] not in key_nrs_to_keep]
-
-                if not licenses_to_delete:
-                    result['msg'] = "All specified licenses are already absent or were not present."
-                    return result
-
-                deleted_licenses = api.delete_licenses(client, licenses_to_delete, existing_licenses, version_id, installation_nr, username)
-                api.submit_system(client, False, sysdata_for_edit, deleted_licenses, username)
-                result['changed'] = True
-                result['msg'] = f"Successfully deleted licenses from system {system_nr}."
-
-        # Download/return license file content if applicable
-        if state == 'present':
-            user_licenses = params.get('licenses')
-            if user_licenses:
-                validated_licenses = api.validate_licenses(client, user_licenses, version_id, installation_nr, username)
-                key_nrs = api.get_license_key_numbers(client, validated_licenses, system_nr, username)
-                content_bytes = api.download_licenses(client, key_nrs)
-                content_str = content_bytes.decode('utf-8')
-
-                result['license_file'] = content_str
-
-                if params.get('download_path'):
-                    dest_path = pathlib.Path(params['download_path'])
-                    if not dest_path.is_dir():
-                        result['failed'] = True
-                        result['msg'] = f"Destination for license file does not exist or is not a directory: {dest_path}"
-                        return result
-
-                    output_file = dest_path / f"{system_nr}_licenses.txt"
-                    try:
-                        with open(output_file, 'w', encoding='utf-8') as f:
-                            f.write(content_str)
-
-                        current_msg = result.get('msg', '')
-                        download_msg = f"License file downloaded to {output_file}."
-                        result['msg'] = f"{current_msg} {download_msg}".strip()
-                    except IOError as e:
-                        result['failed'] = True
-                        result['msg'] = f"Failed to write license file: {e}"
+        # All concurrent requests of the workers and of their systems stay within the connections of the pool.
+        max_workers = min(params['max_workers'], client.pool_maxsize)
+        systems_params = [_batch_entry_to_params(params, entry) for entry in params['systems']]
+        _resolve_sids(client, systems_params, max_workers)
+        groups = {}
+        for index, system_params in enumerate(systems_params):
+            groups.setdefault(_system_key(index, system_params), []).append(index)
+
+        # The installations and the products needed by new systems are retrieved in one round trip up front.
+        api.prefetch_installation_metadata(
+            client, [p['installation_nr'] for p in systems_params if not p['system_nr']], params['suser_id'])
+
+        results = [None] * len(systems_params)
+
+        workers = min(max_workers, len(groups))
+        concurrency = min(_ENTRY_CONCURRENCY, max(1, client.pool_maxsize // max(1, workers)))
+
+        def process_group(indexes):
+            for index in indexes:
+                results[index] = _run_batch_entry(client, systems_params[index], concurrency)
+
+        if groups:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(process_group, groups.values()))
+
+        failed_count = sum(1 for r in results if r['failed'])
+        result['results'] = results
+        result['changed'] = any(r['changed'] for r in results)
+        if failed_count:
+            result['failed'] = True
+            result['msg'] = f"Failed to process {failed_count} of {len(results)} system(s)."
+        else:
+            result['msg'] = f"Successfully processed {len(results)} system(s)."
 
     except ImportError as e:
         result['failed'] = True
@@ -202,15 +277,81 @@ def run_license_keys(params):
             result['missing_dependency'] = 'beautifulsoup4'
         else:
             result['msg'] = "An unexpected import error occurred: {0}".format(e)
+    except _LICENSE_KEYS_ERRORS as e:
+        result['failed'] = True
+        result['msg'] = str(e)
+    except Exception as e:
+        result['failed'] = True
+        result['msg'] = f"An unexpected error occurred: {type(e).__name__} - {e}"
+    finally:
+        if client is not None:
+            result['http_stats'] = client.get_stats()
+
+    return result
 
-    except (exceptions.SapLaunchpadError,
-            api.InstallationNotFoundError,
-            api.SystemNotFoundError,
-            api.ProductNotFoundError,
-            api.VersionNotFoundError,
-            api.LicenseTypeInvalidError,
-            api.DataInvalidError,
-            ValueError) as e:
+
+def _batch_entry_to_params(params, entry):
+    # Translates one entry of the license_keys_batch 'systems' option to the flat runner parameters.
+    system_info = entry['system']
+    return {
+        'suser_id': params['suser_id'],
+        'installation_nr': entry['installation_nr'],
+        'system_nr': system_info.get('nr'),
+        'product_name': system_info.get('product'),
+        'product_version': system_info.get('version'),
+        'system_data': system_info.get('data'),
+        'licenses': entry['licenses'],
+        'download_path': entry.get('download_path'),
+        'state': 'absent' if entry.get('delete_other_licenses') else 'present',
+    }
+
+
+def _resolve_sids(client, systems_params, max_workers):
+    # Looks up the existing systems of all batch entries that address a system by SID only, once per SID.
+    # The result is kept in 'sid_systems' of the entry, so that entries for the same system are grouped
+    # by its system number, however they address it.
+    lookups = {}
+    for params in systems_params:
+        sid = (params.get('system_data') or {}).get('sysid')
+        if not params['system_nr'] and sid:
+            lookups.setdefault((params['installation_nr'], sid), []).append(params)
+    if not lookups:
+        return
+
+    def lookup(key):
+        installation_nr, sid = key
+        return api.get_systems(client, f"Insnr eq '{installation_nr}' and sysid eq '{sid}'")
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(lookups))) as executor:
+        for key, existing_systems in zip(lookups, executor.map(lookup, lookups)):
+            for params in lookups[key]:
+                params['sid_systems'] = existing_systems
+
+
+def _system_key(index, params):
+    # Identifies the system targeted by a batch entry by its system number, also if it is addressed by SID.
+    # A SID without an existing system identifies the system created by the first of its entries.
+    # Entries without either always create a new system and are never grouped.
+    if params['system_nr']:
+        return (params['installation_nr'], params['system_nr'])
+    sid_systems = params.get('sid_systems')
+    if sid_systems and len(sid_systems) == 1:
+        return (params['installation_nr'], sid_systems[0]['Sysnr'])
+    sid = (params.get('system_data') or {}).get('sysid')
+    if sid:
+        return (params['installation_nr'], 'sysid', sid)
+    return ('new', index)
+
+
+def _run_batch_entry(client, params, concurrency):
+    # Processes one system of a batch and returns its individual result.
+    result = {'changed': False, 'failed': False, 'warnings': [], 'installation_nr': params['installation_nr']}
+    if params['system_nr']:
+        result['system_nr'] = params['system_nr']
+
+    try:
+        _ensure_license_keys(client, params, result, concurrency)
+    except _LICENSE_KEYS_ERRORS as e:
         result['failed'] = True
         result['msg'] = str(e)
     except Exception as e:
@@ -218,3 +359,186 @@ def run_license_keys(params):
         result['msg'] = f"An unexpected error occurred: {type(e).__name__} - {e}"
 
     return result
+
+
+def _resolve_version_id(client, params, installation_nr, username, product_lookup=None):
+    # Resolves the product version ID of a new system from its product name and version.
+    # The product ID is taken from `product_lookup`, if it was already submitted.
+    if product_lookup is not None:
+        product_id = product_lookup.result()
+    else:
+        product_id = api.get_product_id(client, params['product_name'], installation_nr, username)
+    return api.get_version_id(client, params['product_version'], product_id, installation_nr, username)
+
+
+def _ensure_license_keys(client, params, result, concurrency):
+    # Creates or updates one system and its licenses with an authenticated client.
+    # Up to `concurrency` independent lookups are run at the same time. The outcome is recorded in `result`.
+    username = params['suser_id']
+    installation_nr = params['installation_nr']
+    system_nr = params['system_nr']
+    state = params['state']
+
+    # The installation check, the SID lookup and the product lookup do not depend on each other.
+    # They are run concurrently over the shared session; errors are raised in the original order of the checks.
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        installation_check = executor.submit(api.validate_installation, client, installation_nr, username)
+        sid_lookup = None
+        product_lookup = None
+        if not system_nr:
+            system_data_params = params.get('system_data', {})
+            sid = system_data_params.get('sysid')
+            # A system resolved before the batch was grouped still exists, other lookups are repeated,
+            # as an earlier entry of the group may have created the system in the meantime.
+            if len(params.get('sid_systems') or []) != 1:
+                if sid:
+                    filter_str = f"Insnr eq '{installation_nr}' and sysid eq '{sid}'"
+                    sid_lookup = executor.submit(api.get_systems, client, filter_str)
+                # The system is probably new, so its product is looked up in advance.
+                # The result, or its error, is only used if the SID lookup finds no system.
+                if params.get('product_name'):
+                    product_lookup = executor.submit(api.get_product_id, client, params['product_name'], installation_nr, username)
+        installation_check.result()
+        existing_systems = sid_lookup.result() if sid_lookup else params.get('sid_systems') or []
+
+    # If system_nr is not provided, try to find it using the SID for idempotency.
+    if len(existing_systems) == 1:
+        system_nr = existing_systems[0]['Sysnr']
+        result['warnings'].append(f"A system with SID '{sid}' already exists. Using system number {system_nr} for update.")
+    elif len(existing_systems) > 1:
+        # Ambiguous situation: multiple systems with the same SID.
+        # Force user to provide system_nr to select one.
+        system_nrs_found = [s['Sysnr'] for s in existing_systems]
+        result['failed'] = True
+        result['msg'] = (f"Multiple systems with SID '{sid}' found under installation '{installation_nr}': "
+                         f"{', '.join(system_nrs_found)}. Please provide a specific 'system_nr' to select which system to update.")
+        return
+
+    is_new_system = not system_nr
+    if is_new_system:
+        if state == 'absent':
+            result['msg'] = "Cannot ensure absence of a new system; system_nr is required."
+            result['failed'] = True
+            return
+
+        # The product version is only resolved once it is known that a new system is created.
+        version_id = _resolve_version_id(client, params, installation_nr, username, product_lookup)
+
+        # SystData and LicenseType only depend on the resolved version.
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            system_data_check = executor.submit(api.validate_system_data, client, params['system_data'], version_id, system_nr, installation_nr, username)
+            licenses_check = executor.submit(api.validate_licenses, client, params['licenses'], version_id, installation_nr, username)
+
+        system_data, warning = system_data_check.result()
+        if warning:
+            result['warnings'].append(warning)
+
+        license_data = licenses_check.result()
+        generated_licenses = api.generate_licenses(client, license_data, [], version_id, installation_nr, username)
+        system_nr = api.submit_system(client, True, system_data, generated_licenses, username)
+
+        result['changed'] = True
+        result['system_nr'] = system_nr
+        result['msg'] = f"System {system_nr} created successfully."
+
+    else:  # Existing system
+        system, existing_licenses = api.get_system_and_licenses(client, system_nr, installation_nr, username)
+        # The API has been observed to return the version ID under the 'Version' key for existing systems.
+        # We check for 'Version' first, then fall back to 'Prodver' for compatibility.
+        version_id = system.get('Version') or system.get('Prodver')
+        if not version_id:
+            raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required Product Version ID.")
+
+        # The API requires a sysdata payload even for an edit operation.
+        # It must contain at least the installation number, system number, product version, and system ID.
+        sysid = system.get('sysid')
+        if not sysid:
+            raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required System ID ('sysid').")
+
+        systype = system.get('systype')
+        if not systype:
+            raise exceptions.SapLaunchpadError(f"System {system_nr} is missing a required System Type ('systype').")
+
+        sysdata_for_edit = [
+            {"name": "insnr", "value": installation_nr},
+            {"name": "sysnr", "value": system_nr},
+            {"name": "prodver", "value": version_id},
+            {"name": "sysid", "value": sysid},
+            {"name": "systype", "value": systype}
+        ]
+
+        if state == 'present':
+            user_licenses = params.get('licenses')
+            if not user_licenses:
+                result['msg'] = "System already present. No licenses specified to update."
+                return
+
+            license_data = api.validate_licenses(client, user_licenses, version_id, installation_nr, username)
+            new_or_changed = [
+                l for l in license_data if not any(
+                    l['HWKEY'] == el['HWKEY'] and l['LICENSETYPE'] == el['LICENSETYPE']
+                    for el in existing_licenses
+                )
+            ]
+
+            if not new_or_changed:
+                result['msg'] = "System and licenses are already in the desired state."
+                return
+
+            generated = api.generate_licenses(client, new_or_changed, existing_licenses, version_id, installation_nr, username)
+            api.submit_system(client, False, sysdata_for_edit, generated, username)
+            result['changed'] = True
+            result['msg'] = f"System {system_nr} licenses updated successfully."
+
+        elif state == 'absent':
+            user_licenses_to_keep = params.get('licenses', [])
+            if not user_licenses_to_keep:  # Delete all licenses
+                licenses_to_delete = existing_licenses
+            else:
+                validated_to_keep = api.validate_licenses(client, user_licenses_to_keep, version_id, installation_nr, username)
+                key_nrs_to_keep = [
+                    l['KEYNR'] for l in existing_licenses if any(
+                        k['HWKEY'] == l['HWKEY'] and k['LICENSETYPE'] == l['LICENSETYPE']
+                        for k in validated_to_keep
+                    )
+                ]
+                licenses_to_delete = [l for l in existing_licenses if l['KEYNR'] not in key_nrs_to_keep]
+
+            if not licenses_to_delete:
+                result['msg'] = "All specified licenses are already absent or were not present."
+                return
+
+            deleted_licenses = api.delete_licenses(client, licenses_to_delete, existing_licenses, version_id, installation_nr, username)
+            api.submit_system(client, False, sysdata_for_edit, deleted_licenses, username)
+            result['changed'] = True
+            result['msg'] = f"Successfully deleted licenses from system {system_nr}."
+
+    # Download/return license file content if applicable
+    if state == 'present':
+        user_licenses = params.get('licenses')
+        if user_licenses:
+            # The licenses were already validated for the create or update above.
+            key_nrs = api.get_license_key_numbers(client, license_data, system_nr, username)
+            content_bytes = api.download_licenses(client, key_nrs)
+            content_str = content_bytes.decode('utf-8')
+
+            result['license_file'] = content_str
+
+            if params.get('download_path'):
+                dest_path = pathlib.Path(params['download_path'])
+                if not dest_path.is_dir():
+                    result['failed'] = True
+                    result['msg'] = f"Destination for license file does not exist or is not a directory: {dest_path}"
+                    return
+
+                output_file = dest_path / f"{system_nr}_licenses.txt"
+                try:
+                    with open(output_file, 'w', encoding='utf-8') as f:
+                        f.write(content_str)
+
+                    current_msg = result.get('msg', '')
+                    download_msg = f"License file downloaded to {output_file}."
+                    result['msg'] = f"{current_msg} {download_msg}".strip()
+                except IOError as e:
+                    result['failed'] = True
+                    result['msg'] = f"Failed to write license file: {e}"
@@ -97,6 +97,22 @@ options:
     description: If specified, the generated license key file will be downloaded to this directory.
     required: false
     type: path
+  metadata_cache_path:
+    description:
+      - Directory to persist the catalogue data of the SAP backend, such as products, versions, system fields and license types.
+      - Subsequent runs against the same installations and product versions reuse this data instead of querying the backend.
+      - If not specified, the data is only cached for the duration of the run.
+    required: false
+    type: path
+  metadata_cache_ttl:
+    description:
+      - Number of seconds for which cached catalogue data is used.
+    required: false
+    type: int
+    default: 3600
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
 
 author:
     - Matthias Winzeler (@MatthiasWinzeler)
@@ -173,9 +189,42 @@ system_nr:
   returned: on success
   type: str
   sample: "0000123456"
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
 from ..module_utils.systems import main as systems_runner
 
 
@@ -200,8 +249,11 @@ def run_module():
             data=dict(type='dict', required=True),
         )),
         delete_other_licenses=dict(type='bool', required=False, default=False),
-        download_path=dict(type='path', required=False)
+        download_path=dict(type='path', required=False),
+        metadata_cache_path=dict(type='path', required=False),
+        metadata_cache_ttl=dict(type='int', required=False, default=3600)
     )
+    module_args.update(http_client_argument_spec())
 
     module = AnsibleModule(
         argument_spec=module_args,
@@ -0,0 +1,308 @@
+#!/usr/bin/python
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: license_keys_batch
+
+short_description: Creates many systems and license keys on me.sap.com/licensekey in one run
+
+description:
+ - This ansible module creates and updates multiple systems and their license keys using the Launchpad API.
+ - Each entry of C(systems) is handled like a single run of M(community.sap_launchpad.license_keys).
+ - All systems share one authenticated session, and installation and product version lookups are done once per installation.
+ - Systems are processed concurrently. Entries for the same system, identified by system number, also if given by SID, are processed in the given order.
+
+version_added: 1.4.0
+
+options:
+  suser_id:
+    description:
+      - SAP S-User ID.
+    required: true
+    type: str
+  suser_password:
+    description:
+      - SAP S-User Password.
+    required: true
+    type: str
+  systems:
+    description:
+      - List of systems to create/update.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      installation_nr:
+        description:
+          - Number of the Installation for which the system should be created/updated
+        required: true
+        type: str
+      system:
+        description:
+          - The system to create/update
+        required: true
+        type: dict
+        suboptions:
+          nr:
+            description:
+              - The number of the system to update. If this attribute is not provided, a new system is created.
+            required: false
+            type: str
+          product:
+            description:
+              - The product description as found in the SAP portal, e.g. SAP S/4HANA
+            required: true
+            type: str
+          version:
+            description:
+              - The description of the product version, as found in the SAP portal, e.g. SAP S/4HANA 2022
+            required: true
+            type: str
+          data:
+            description:
+              - The data attributes of the system. The possible attributes are defined by product and version.
+            required: true
+            type: dict
+      licenses:
+        description:
+          - List of licenses to create for the system.
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+          type:
+            description:
+              - The license type description as found in the SAP portal, e.g. Maintenance Entitlement
+            required: true
+            type: str
+          data:
+            description:
+              - The data attributes of the licenses. The possible attributes are defined by product and version.
+            required: true
+            type: dict
+      delete_other_licenses:
+        description:
+          - Whether licenses other than the ones specified in the licenses attributes should be deleted.
+        type: bool
+        required: false
+        default: false
+      download_path:
+        description: If specified, the generated license key file will be downloaded to this directory.
+        required: false
+        type: path
+  max_workers:
+    description:
+      - The number of systems processed in parallel.
+      - It is limited to C(pool_maxsize), so that all concurrent requests reuse the connections of the pool.
+    type: int
+    required: false
+    default: 4
+  metadata_cache_path:
+    description:
+      - Directory to persist the catalogue data of the SAP backend, such as products, versions, system fields and license types.
+      - Subsequent runs against the same installations and product versions reuse this data instead of querying the backend.
+      - If not specified, the data is only cached for the duration of the run.
+    required: false
+    type: path
+  metadata_cache_ttl:
+    description:
+      - Number of seconds for which cached catalogue data is used.
+    required: false
+    type: int
+    default: 3600
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
+author:
+    - Matthias Winzeler (@MatthiasWinzeler)
+    - Marcel Mamula (@marcelmamula)
+
+'''
+
+
+EXAMPLES = r'''
+- name: create license keys for multiple systems
+  community.sap_launchpad.license_keys_batch:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    systems:
+      - installation_nr: 12345678
+        system:
+          nr: 23456789
+          product: SAP S/4HANA
+          version: SAP S/4HANA 2022
+          data:
+            sysid: H01
+            sysname: Test-System
+            systype: Development system
+            sysdb: SAP HANA database
+            sysos: Linux
+            sys_depl: Public - Microsoft Azure
+        licenses:
+          - type: Maintenance Entitlement
+            data:
+              hwkey: H1234567890
+              expdate: 99991231
+      - installation_nr: 12345678
+        system:
+          product: SAP S/4HANA
+          version: SAP S/4HANA 2022
+          data:
+            sysid: H02
+            sysname: Test-System-2
+            systype: Development system
+            sysdb: SAP HANA database
+            sysos: Linux
+            sys_depl: Public - Microsoft Azure
+        licenses:
+          - type: Maintenance Entitlement
+            data:
+              hwkey: H0987654321
+              expdate: 99991231
+  register: result
+
+- name: Display the license files of all systems
+  debug:
+    msg: "{{ result.results | map(attribute='license_file', default='') | list }}"
+'''
+
+
+RETURN = r'''
+msg:
+  description: A message indicating the status of the operation.
+  returned: always
+  type: str
+  sample: "Successfully processed 2 system(s)."
+results:
+  description:
+    - The result of each entry of C(systems), in the same order.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    installation_nr:
+      description: The installation number of the system.
+      type: str
+      sample: "12345678"
+    system_nr:
+      description: The number of the system which was created/updated.
+      type: str
+      sample: "0000123456"
+    changed:
+      description: Whether the system or its licenses were changed.
+      type: bool
+    failed:
+      description: Whether the processing of the system failed.
+      type: bool
+    msg:
+      description: A message indicating the status of the system.
+      type: str
+      sample: "System 0000123456 created successfully."
+    warnings:
+      description: Warnings returned for the system.
+      type: list
+      elements: str
+    license_file:
+      description: The license file content containing the digital signatures of the specified licenses.
+      type: str
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
+from ..module_utils.systems import main as systems_runner
+
+
+def run_module():
+    # Define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        suser_id=dict(type='str', required=True),
+        suser_password=dict(type='str', required=True, no_log=True),
+        systems=dict(type='list', required=True, elements='dict', options=dict(
+            installation_nr=dict(type='str', required=True),
+            system=dict(
+                type='dict',
+                required=True,
+                options=dict(
+                    nr=dict(type='str', required=False),
+                    product=dict(type='str', required=True),
+                    version=dict(type='str', required=True),
+                    data=dict(type='dict', required=True)
+                )
+            ),
+            licenses=dict(type='list', required=True, elements='dict', options=dict(
+                type=dict(type='str', required=True),
+                data=dict(type='dict', required=True),
+            )),
+            delete_other_licenses=dict(type='bool', required=False, default=False),
+            download_path=dict(type='path', required=False)
+        )),
+        max_workers=dict(type='int', required=False, default=4),
+        metadata_cache_path=dict(type='path', required=False),
+        metadata_cache_ttl=dict(type='int', required=False, default=3600)
+    )
+    module_args.update(http_client_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    if module.params['max_workers'] < 1:
+        module.fail_json(msg="The option 'max_workers' must be at least 1.")
+
+    if module.check_mode:
+        module.exit_json(changed=False, msg="Check mode not supported for license key management.")
+
+    result = systems_runner.run_license_keys_batch(module.params)
+
+    if result.get('failed'):
+        if result.get('missing_dependency'):
+            module.fail_json(msg=missing_required_lib(result['missing_dependency']))
+        module.fail_json(**result)
+    else:
+        module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
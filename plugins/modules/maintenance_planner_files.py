@@ -14,6 +14,7 @@ description:
   - This module connects to the SAP Maintenance Planner to retrieve a list of all downloadable files associated with a specific transaction.
   - It returns a list containing direct download links and filenames for each file.
   - This is useful for automating the download of a complete stack file set defined in a Maintenance Planner transaction.
+  - Multiple transactions can be retrieved in a single run, sharing one authenticated session. Their files are merged into one basket without duplicates.
 
 version_added: 1.0.0
 
@@ -31,13 +32,26 @@ options:
   transaction_name:
     description:
       - Transaction Name or Transaction Display ID from Maintenance Planner.
-    required: true
+      - Mutually exclusive with C(transaction_names).
+    required: false
     type: str
+  transaction_names:
+    description:
+      - List of Transaction Names or Transaction Display IDs from Maintenance Planner.
+      - The stack files of all transactions are retrieved concurrently and merged into one download basket.
+      - Mutually exclusive with C(transaction_name). One of both options is required.
+    required: false
+    type: list
+    elements: str
   validate_url:
     description:
       - Validates if the download URLs are accessible before returning them.
     type: bool
     default: false
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
 author:
     - Matthias Winzeler (@MatthiasWinzeler)
     - Marcel Mamula (@marcelmamula)
@@ -54,6 +68,14 @@ EXAMPLES = r'''
 - name: Display the list of download links and filenames
   ansible.builtin.debug:
     msg: "Files found for transaction: {{ sap_mp_register.download_basket }}"
+- name: Retrieve a merged list of downloadable files from multiple Maintenance Planner transactions
+  community.sap_launchpad.maintenance_planner_files:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    transaction_names:
+      - 'MP_NEW_INST_20211015_044854'
+      - 'MP_NEW_INST_20211015_051012'
+  register: sap_mp_register
 '''
 
 RETURN = r'''
@@ -76,9 +98,47 @@ download_basket:
       description: The name of the file.
       type: str
       sample: "SAPCAR_1324-80000936.EXE"
+    Transactions:
+      description: The names of the requested transactions which contain the file.
+      type: list
+      elements: str
+      sample: ["MP_NEW_INST_20211015_044854"]
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
 from ..module_utils.maintenance_planner import main as maintenance_planner_runner
 
 
@@ -88,9 +148,11 @@ def run_module():
     module_args = dict(
         suser_id=dict(type='str', required=True),
         suser_password=dict(type='str', required=True, no_log=True),
-        transaction_name=dict(type='str', required=True),
+        transaction_name=dict(type='str', required=False),
+        transaction_names=dict(type='list', required=False, elements='str'),
         validate_url=dict(type='bool', required=False, default=False)
     )
+    module_args.update(http_client_argument_spec())
 
     # Define result dictionary objects to be passed back to Ansible
     result = dict(
@@ -100,9 +162,15 @@ def run_module():
     # Instantiate module
     module = AnsibleModule(
         argument_spec=module_args,
+        required_one_of=[('transaction_name', 'transaction_names')],
+        mutually_exclusive=[('transaction_name', 'transaction_names')],
         supports_check_mode=True
     )
 
+    # An empty list satisfies required_one_of, but names no transaction.
+    if module.params['transaction_names'] == []:
+        module.fail_json(msg="transaction_names must contain at least one transaction name.")
+
     # Check mode
     if module.check_mode:
         module.exit_json(changed=False, download_basket={})
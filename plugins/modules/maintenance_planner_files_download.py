@@ -0,0 +1,206 @@
+#!/usr/bin/python
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: maintenance_planner_files_download
+
+short_description: Downloads all files of an SAP Maintenance Planner transaction.
+
+description:
+  - This module connects to the SAP Maintenance Planner to retrieve the files of a specific transaction and downloads them from the SAP Software Center.
+  - It combines M(community.sap_launchpad.maintenance_planner_files) and M(community.sap_launchpad.software_center_download) in a single run.
+  - One authenticated session is used for the Maintenance Planner and all downloads.
+  - Downloads start as soon as the first file is read from the Maintenance Planner response, instead of after the complete list is retrieved.
+  - Existing files are skipped, or validated against the remote checksum when C(validate_checksum) is enabled.
+
+version_added: 1.4.0
+
+options:
+  suser_id:
+    description:
+      - SAP S-User ID.
+    required: true
+    type: str
+  suser_password:
+    description:
+      - SAP S-User Password.
+    required: true
+    type: str
+  transaction_name:
+    description:
+      - Transaction Name or Transaction Display ID from Maintenance Planner.
+    required: true
+    type: str
+  dest:
+    description:
+      - Destination folder path.
+    required: true
+    type: str
+  validate_checksum:
+    description:
+      - If a file with the same name already exists at the destination, validate its checksum against the remote file.
+      - If the checksum is invalid, the local file will be removed and re-downloaded.
+    required: false
+    default: false
+    type: bool
+  max_workers:
+    description:
+      - The number of files downloaded in parallel.
+    required: false
+    default: 1
+    type: int
+  engine:
+    description:
+      - How concurrent downloads are run.
+      - C(threads) downloads each file in a separate thread with the C(requests) library.
+      - C(asyncio) downloads all files on one asyncio event loop with the C(aiohttp) library, which uses fewer resources for many files.
+        The login and the Maintenance Planner requests still use the C(requests) library.
+    required: false
+    default: threads
+    type: str
+    choices:
+      - threads
+      - asyncio
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
+author:
+    - Marcel Mamula (@marcelmamula)
+
+'''
+
+EXAMPLES = r'''
+- name: Download all files of a Maintenance Planner transaction
+  community.sap_launchpad.maintenance_planner_files_download:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    transaction_name: 'MP_NEW_INST_20211015_044854'
+    dest: "/sap_media"
+    validate_checksum: true
+  register: sap_mp_download_register
+- name: Display the result of each file
+  ansible.builtin.debug:
+    msg: "{{ sap_mp_download_register.download_basket }}"
+'''
+
+RETURN = r'''
+msg:
+  description: A message indicating the status of the operation.
+  returned: always
+  type: str
+  sample: "Successfully processed 12 file(s) from SAP Maintenance Planner transaction MP_NEW_INST_20211015_044854."
+download_basket:
+  description: The files of the Maintenance Planner transaction with the result of their download.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    DirectLink:
+      description: The direct URL to download the file.
+      type: str
+      sample: "https://softwaredownloads.sap.com/file/0020000001234562023"
+    Filename:
+      description: The name of the file.
+      type: str
+      sample: "SAPCAR_1324-80000936.EXE"
+    changed:
+      description: Whether the file was downloaded.
+      type: bool
+    skipped:
+      description: Whether the download was skipped because the file already exists.
+      type: bool
+    failed:
+      description: Whether the download of the file failed.
+      type: bool
+    msg:
+      description: A message indicating the status of the file.
+      type: str
+      sample: "Successfully downloaded SAP software: SAPCAR_1324-80000936.EXE"
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
+from ..module_utils.maintenance_planner import main as maintenance_planner_runner
+
+
+def run_module():
+
+    # Define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        suser_id=dict(type='str', required=True),
+        suser_password=dict(type='str', required=True, no_log=True),
+        transaction_name=dict(type='str', required=True),
+        dest=dict(type='str', required=True),
+        validate_checksum=dict(type='bool', required=False, default=False),
+        max_workers=dict(type='int', required=False, default=1),
+        engine=dict(type='str', required=False, default='threads', choices=['threads', 'asyncio'])
+    )
+    module_args.update(http_client_argument_spec())
+
+    # Instantiate module
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    if module.params['max_workers'] < 1:
+        module.fail_json(msg="The option 'max_workers' must be at least 1.")
+
+    # Check mode
+    if module.check_mode:
+        module.exit_json(changed=False, download_basket=[])
+
+    result = maintenance_planner_runner.run_files_download(module.params)
+
+    # The runner function indicates failure via a key in the result.
+    if result.get('failed'):
+        if result.get('missing_dependency'):
+            module.fail_json(msg=missing_required_lib(result['missing_dependency']))
+        module.fail_json(**result)
+    else:
+        module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: maintenance_planner_files_xml
+
+short_description: Retrieves a list of files from a local SAP Maintenance Planner files XML.
+
+description:
+  - This module reads a files XML of an SAP Maintenance Planner transaction from the managed node and returns the downloadable files listed in it.
+  - The files XML is saved by M(community.sap_launchpad.maintenance_planner_stack_xml_download) with C(files_xml=true).
+    The stack.xml file itself does not list the download links and cannot be read by this module.
+  - It returns the same list of direct download links and filenames as M(community.sap_launchpad.maintenance_planner_files).
+  - No connection to SAP is made, which makes it suitable for repeated runs against a file that was already retrieved or shared by another team.
+  - The XML is parsed incrementally, so large files are not loaded into memory at once.
+
+version_added: 1.4.0
+
+options:
+  src:
+    description:
+      - Path to the files XML on the managed node, named C(<transaction_name>_files.xml) by
+        M(community.sap_launchpad.maintenance_planner_stack_xml_download).
+    required: true
+    type: path
+author:
+    - Marcel Mamula (@marcelmamula)
+
+'''
+
+EXAMPLES = r'''
+- name: Save the files XML of a Maintenance Planner transaction
+  community.sap_launchpad.maintenance_planner_stack_xml_download:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    transaction_name: 'MP_NEW_INST_20211015_044854'
+    dest: "/tmp/"
+    files_xml: true
+- name: Retrieve a list of downloadable files from the local files XML
+  community.sap_launchpad.maintenance_planner_files_xml:
+    src: "/tmp/MP_NEW_INST_20211015_044854_files.xml"
+  register: sap_mp_register
+- name: Display the list of download links and filenames
+  ansible.builtin.debug:
+    msg: "Files found in files XML: {{ sap_mp_register.download_basket }}"
+'''
+
+RETURN = r'''
+msg:
+  description: A message indicating the status of the operation.
+  returned: always
+  type: str
+  sample: "Successfully retrieved file list from /tmp/MP_NEW_INST_20211015_044854_files.xml."
+download_basket:
+  description: A list of files listed in the files XML.
+  returned: always
+  type: list
+  elements: dict
+  contains:
+    DirectLink:
+      description: The direct URL to download the file.
+      type: str
+      sample: "https://softwaredownloads.sap.com/file/0020000001234562023"
+    Filename:
+      description: The name of the file.
+      type: str
+      sample: "SAPCAR_1324-80000936.EXE"
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.maintenance_planner import main as maintenance_planner_runner
+
+
+def run_module():
+
+    # Define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        src=dict(type='path', required=True)
+    )
+
+    # Instantiate module
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    # The module only reads a local file, so it runs unchanged in check mode.
+    result = maintenance_planner_runner.run_files_xml(module.params)
+
+    # The runner function indicates failure via a key in the result.
+    if result.get('failed'):
+        if result.get('missing_dependency'):
+            module.fail_json(msg=missing_required_lib(result['missing_dependency']))
+        module.fail_json(**result)
+    else:
+        module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,7 @@ description:
   - This module connects to the SAP Maintenance Planner to download the stack.xml file associated with a specific transaction.
   - The stack.xml file contains the plan for a system update or installation and is used by tools like Software Update Manager (SUM).
   - The file is saved to the specified destination directory.
+  - The file is streamed to disk unmodified. An existing file with identical content is kept and the module reports no change.
 
 version_added: 1.0.0
 
@@ -38,6 +39,19 @@ options:
       - The path to an existing destination directory where the stack.xml file will be saved.
     required: true
     type: str
+  files_xml:
+    description:
+      - Whether to also save the files XML of the transaction as C(<transaction_name>_files.xml) in C(dest).
+      - The files XML lists the downloadable files of the transaction and can be read offline
+        with M(community.sap_launchpad.maintenance_planner_files_xml).
+    required: false
+    type: bool
+    default: false
+    version_added: 1.4.0
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
 author:
     - Matthias Winzeler (@MatthiasWinzeler)
     - Sean Freeman (@sean-freeman)
@@ -56,6 +70,14 @@ EXAMPLES = r'''
 - name: Display the result message
   ansible.builtin.debug:
     msg: "{{ sap_mp_stack_xml_result.msg }}"
+
+- name: Download the Stack XML file together with the files XML for offline use
+  community.sap_launchpad.maintenance_planner_stack_xml_download:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    transaction_name: 'MP_NEW_INST_20211015_044854'
+    dest: "/tmp/"
+    files_xml: true
 '''
 
 RETURN = r'''
@@ -64,9 +86,47 @@ msg:
   returned: always
   type: str
   sample: "SAP Maintenance Planner Stack XML successfully downloaded to /tmp/MP_STACK_20211015_044854.xml"
+files_xml_path:
+  description: The path of the saved files XML.
+  returned: when C(files_xml) is true
+  type: str
+  sample: "/tmp/MP_NEW_INST_20211015_044854_files.xml"
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
 from ..module_utils.maintenance_planner import main as maintenance_planner_runner
 
 
@@ -77,8 +137,10 @@ def run_module():
         suser_id=dict(type='str', required=True),
         suser_password=dict(type='str', required=True, no_log=True),
         transaction_name=dict(type='str', required=True),
-        dest=dict(type='str', required=True)
+        dest=dict(type='str', required=True),
+        files_xml=dict(type='bool', required=False, default=False)
     )
+    module_args.update(http_client_argument_spec())
 
     # Define result dictionary objects to be passed back to Ansible
     result = dict(
@@ -0,0 +1,251 @@
+#!/usr/bin/python
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: maintenance_planner_transactions_info
+
+short_description: Retrieves SAP Maintenance Planner transactions.
+
+description:
+  - This module connects to the SAP Maintenance Planner and returns the transactions available to the user.
+  - The transaction list is loaded once into an indexed store, which is then filtered, sorted and limited by the module.
+  - This allows to look up transactions, for example the latest transaction of a system, without processing the complete list in the playbook.
+  - Each returned transaction contains the sortable timestamps C(created_at) and C(changed_at) in the format C(YYYYMMDDHHMMSS).
+  - The Maintenance Planner always returns the complete transaction list. With C(cache_path), the list of the previous run is kept,
+    and the module reports which transactions were added, changed or removed since.
+
+version_added: 1.4.0
+
+options:
+  suser_id:
+    description:
+      - SAP S-User ID.
+    required: true
+    type: str
+  suser_password:
+    description:
+      - SAP S-User Password.
+    required: true
+    type: str
+  sid:
+    description:
+      - List of system IDs. Only transactions of one of these systems are returned.
+    required: false
+    type: list
+    elements: str
+  status:
+    description:
+      - List of transaction statuses. Only transactions with one of these statuses are returned.
+    required: false
+    type: list
+    elements: str
+  changed_since:
+    description:
+      - Only transactions changed at or after this date are returned, for example C(2024-01-31) or C(2024-01-31T12:00:00).
+      - Transactions without a change date count as changed at their creation.
+    required: false
+    type: str
+  filters:
+    description:
+      - Dictionary of transaction attributes and the values they must match.
+      - A list of values matches any of the listed values.
+      - Attribute names are the ones returned by the Maintenance Planner, for example C(trans_name), C(trans_display_id) or C(trans_id).
+    required: false
+    type: dict
+  since:
+    description:
+      - Dictionary of transaction attributes and their inclusive lower bound.
+      - Values are compared as strings, which is suitable for the sortable timestamps returned by the Maintenance Planner.
+    required: false
+    type: dict
+  sort_by:
+    description:
+      - Transaction attribute used to sort the result.
+      - Use C(changed_at) or C(created_at) to sort by date.
+    required: false
+    type: str
+  descending:
+    description:
+      - Sort the result in descending order.
+    required: false
+    default: false
+    type: bool
+  limit:
+    description:
+      - Maximum number of transactions to return.
+    required: false
+    type: int
+  cache_path:
+    description:
+      - A directory to keep the transaction list in between runs, in one file per S-User ID.
+      - The list of the previous run is compared with the current list, and the differences are returned in C(changes).
+      - If not specified, the list is only kept for the duration of the run.
+    required: false
+    type: path
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
+author:
+    - Marcel Mamula (@marcelmamula)
+
+'''
+
+EXAMPLES = r'''
+- name: Retrieve the Maintenance Planner transaction with a specific display ID
+  community.sap_launchpad.maintenance_planner_transactions_info:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    filters:
+      trans_display_id: '1234567890'
+  register: sap_mp_transactions
+
+- name: Retrieve the five most recently changed Maintenance Planner transactions
+  community.sap_launchpad.maintenance_planner_transactions_info:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    sort_by: changed_at
+    descending: true
+    limit: 5
+  register: sap_mp_transactions
+
+- name: Retrieve the latest transaction of system S4H changed this year, and the transactions changed since the last run
+  community.sap_launchpad.maintenance_planner_transactions_info:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    sid:
+      - S4H
+    changed_since: '2024-01-01'
+    sort_by: changed_at
+    descending: true
+    limit: 1
+    cache_path: /var/cache/sap_launchpad
+  register: sap_mp_transactions
+'''
+
+RETURN = r'''
+msg:
+  description: A message indicating the status of the operation.
+  returned: always
+  type: str
+  sample: "Found 1 matching SAP Maintenance Planner transaction(s)."
+transactions:
+  description:
+    - A list of matching transactions with the attributes returned by the Maintenance Planner.
+  returned: always
+  type: list
+  elements: dict
+  sample:
+    - trans_id: "0050569F1A3A1EDC9ABCDE0123456789"
+      trans_name: "MP_NEW_INST_20211015_044854"
+      trans_display_id: "1234567890"
+      created_at: "20211015044854"
+      changed_at: "20211015044854"
+changes:
+  description:
+    - The IDs of the transactions that were added, changed or removed since the previous run with the same C(cache_path).
+    - In the first run with a new cache, all transactions are added.
+  returned: when C(cache_path) is specified
+  type: dict
+  contains:
+    added:
+      description: The IDs of added transactions.
+      type: list
+      elements: str
+    changed:
+      description: The IDs of changed transactions.
+      type: list
+      elements: str
+    removed:
+      description: The IDs of removed transactions.
+      type: list
+      elements: str
+  sample:
+    added:
+      - "0050569F1A3A1EDC9ABCDE0123456789"
+    changed: []
+    removed: []
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
+from ..module_utils.maintenance_planner import main as maintenance_planner_runner
+
+
+def run_module():
+
+    # Define available arguments/parameters a user can pass to the module
+    module_args = dict(
+        suser_id=dict(type='str', required=True),
+        suser_password=dict(type='str', required=True, no_log=True),
+        sid=dict(type='list', required=False, elements='str'),
+        status=dict(type='list', required=False, elements='str'),
+        changed_since=dict(type='str', required=False),
+        filters=dict(type='dict', required=False),
+        since=dict(type='dict', required=False),
+        sort_by=dict(type='str', required=False),
+        descending=dict(type='bool', required=False, default=False),
+        limit=dict(type='int', required=False),
+        cache_path=dict(type='path', required=False)
+    )
+    module_args.update(http_client_argument_spec())
+
+    # Instantiate module
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    result = maintenance_planner_runner.run_transactions_info(module.params)
+
+    # The runner function indicates failure via a key in the result.
+    if result.get('failed'):
+        if result.get('missing_dependency'):
+            module.fail_json(msg=missing_required_lib(result['missing_dependency']))
+        module.fail_json(**result)
+    else:
+        module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -86,6 +86,10 @@ options:
     required: false
     default: false
     type: bool
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
 author:
     - Matthias Winzeler (@MatthiasWinzeler)
     - Sean Freeman (@sean-freeman)
@@ -141,9 +145,42 @@ skipped:
   description: A boolean indicating if the download was skipped (e.g., file already exists and checksum is valid).
   returned: always
   type: bool
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
 from ..module_utils.software_center import main as software_center_runner
 
 
@@ -163,6 +200,7 @@ def run_module():
         search_alternatives=dict(type='bool', required=False, default=False),
         validate_checksum=dict(type='bool', required=False, default=False)
     )
+    module_args.update(http_client_argument_spec())
 
     # Instantiate module
     module = AnsibleModule(
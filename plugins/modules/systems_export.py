@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: systems_export
+
+short_description: Writes information about SAP systems to a file.
+
+description:
+- This module queries the SAP Launchpad for the registered systems that match a filter string, like M(community.sap_launchpad.systems_info).
+- The systems are written to a file in JSON Lines format, one system per line, as they are retrieved page by page.
+- The systems are not kept in memory or returned in the module result, which allows exporting the systems of large customer numbers.
+- Alternatively, a snapshot of the systems is written, to which later runs are compared with M(community.sap_launchpad.systems_info).
+- An existing file with identical content is left untouched and the module reports no change.
+
+version_added: 1.4.0
+
+options:
+  suser_id:
+    description:
+      - SAP S-User ID.
+    required: true
+    type: str
+  suser_password:
+    description:
+      - SAP S-User Password.
+    required: true
+    type: str
+  filter:
+    description:
+      - An ODATA filter expression to query the systems.
+    required: true
+    type: str
+  fields:
+    description:
+      - A list of system properties to write, for example C(Sysnr), C(sysid) and C(Insnr).
+      - If not set, all properties are written.
+    required: false
+    type: list
+    elements: str
+  page_size:
+    description:
+      - The number of systems to request per page.
+      - If not set, the page size is chosen by the server. Server-driven paging is always followed.
+    required: false
+    type: int
+  max_results:
+    description:
+      - The maximum number of systems to retrieve.
+      - If not set, all matching systems are retrieved.
+    required: false
+    type: int
+  dest:
+    description:
+      - Path of the file to write the systems to. The parent directory must exist.
+      - The file is replaced only if its content changed.
+    required: true
+    type: path
+  format:
+    description:
+      - The format of the file.
+      - C(jsonl) writes one system per line in JSON Lines format.
+      - C(snapshot) writes a JSON snapshot of the systems keyed by system number, and returns the difference to the previous snapshot in C(delta).
+        C(Sysnr) is always retrieved for snapshots.
+      - C(snapshot) is mutually exclusive with C(max_results).
+    required: false
+    type: str
+    choices: [jsonl, snapshot]
+    default: jsonl
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
+author:
+    - Matthias Winzeler (@MatthiasWinzeler)
+    - Marcel Mamula (@marcelmamula)
+
+'''
+
+
+EXAMPLES = r'''
+- name: Write the number and SID of all systems to a JSON Lines file
+  community.sap_launchpad.systems_export:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    filter: "Insnr eq '1234567890'"
+    fields:
+      - Sysnr
+      - sysid
+    page_size: 500
+    dest: /tmp/systems.jsonl
+
+- name: Replace the snapshot of all systems and get the systems added, removed or modified since the previous snapshot
+  community.sap_launchpad.systems_export:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    filter: "Insnr eq '1234567890'"
+    format: snapshot
+    dest: /var/lib/cmdb/systems_snapshot.json
+  register: result
+'''
+
+
+RETURN = r'''
+dest:
+  description:
+    - The path of the JSON Lines file the systems were written to.
+  returned: always
+  type: str
+  sample: /tmp/systems.jsonl
+count:
+  description:
+    - The number of systems written.
+  returned: always
+  type: int
+  sample: 1
+delta:
+  description:
+    - The difference between the systems retrieved by this run and the previous snapshot in C(dest).
+  returned: when C(format=snapshot)
+  type: dict
+  contains:
+    added:
+      description: The systems that are not in the previous snapshot.
+      type: list
+      elements: dict
+    removed:
+      description: The systems of the previous snapshot that were not retrieved anymore, as stored in the snapshot.
+      type: list
+      elements: dict
+    modified:
+      description: The systems whose details differ from the previous snapshot, as retrieved by this run.
+      type: list
+      elements: dict
+  sample:
+    added:
+      - Sysnr: "0000123457"
+        sysid: "S4Q"
+    removed: []
+    modified: []
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
+'''
+
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
+from ..module_utils.systems import main as systems_runner
+
+
+def run_module():
+    module_args = dict(
+        suser_id=dict(type='str', required=True),
+        suser_password=dict(type='str', required=True, no_log=True),
+        filter=dict(type='str', required=True),
+        fields=dict(type='list', elements='str'),
+        page_size=dict(type='int'),
+        max_results=dict(type='int'),
+        dest=dict(type='path', required=True),
+        format=dict(type='str', choices=['jsonl', 'snapshot'], default='jsonl'),
+    )
+    module_args.update(http_client_argument_spec())
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True
+    )
+
+    for option in ('page_size', 'max_results'):
+        if module.params[option] is not None and module.params[option] < 1:
+            module.fail_json(msg=f"The option '{option}' must be at least 1.")
+    if module.params['format'] == 'snapshot' and module.params['max_results'] is not None:
+        module.fail_json(msg="The option 'max_results' cannot be used with 'format=snapshot'.")
+
+    # Check mode does not write the file.
+    if module.check_mode:
+        module.exit_json(changed=False, dest=module.params['dest'], count=0)
+
+    result = systems_runner.run_systems_export(module.params)
+
+    if result.get('failed'):
+        if result.get('missing_dependency'):
+            module.fail_json(msg=missing_required_lib(result['missing_dependency']))
+        module.fail_json(**result)
+    else:
+        module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
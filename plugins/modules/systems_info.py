@@ -13,6 +13,8 @@ short_description: Retrieves information about SAP systems.
 description:
 - This module queries the SAP Launchpad to retrieve a list of registered systems based on a filter string.
 - It allows for fetching details about systems associated with the authenticated S-User.
+- Results are retrieved page by page, and can be limited to selected fields for large customer numbers.
+- To write the systems to a file instead of returning them, use M(community.sap_launchpad.systems_export).
 
 version_added: 1.1.0
 
@@ -32,6 +34,38 @@ options:
       - An ODATA filter expression to query the systems.
     required: true
     type: str
+  fields:
+    description:
+      - A list of system properties to retrieve, for example C(Sysnr), C(sysid) and C(Insnr).
+      - If not set, all properties are retrieved.
+    required: false
+    type: list
+    elements: str
+  page_size:
+    description:
+      - The number of systems to request per page.
+      - If not set, the page size is chosen by the server. Server-driven paging is always followed.
+    required: false
+    type: int
+  max_results:
+    description:
+      - The maximum number of systems to retrieve.
+      - If not set, all matching systems are retrieved.
+    required: false
+    type: int
+  snapshot_path:
+    description:
+      - Path of a snapshot file of the systems, keyed by system number, as written by M(community.sap_launchpad.systems_export) with C(format=snapshot).
+      - If set, only the systems added, removed or modified since the snapshot are returned in C(delta), and C(systems) is empty.
+      - If the file does not exist yet, all systems are returned as added.
+      - The snapshot file is only read.
+      - Mutually exclusive with C(max_results).
+    required: false
+    type: path
+
+extends_documentation_fragment:
+  - community.sap_launchpad.http_client
+
 author:
     - Matthias Winzeler (@MatthiasWinzeler)
     - Marcel Mamula (@marcelmamula)
@@ -50,6 +84,14 @@ EXAMPLES = r'''
 - name: Display system details
   debug:
     var: result.systems
+
+- name: Get the systems added, removed or modified since the snapshot
+  community.sap_launchpad.systems_info:
+    suser_id: 'SXXXXXXXX'
+    suser_password: 'password'
+    filter: "Insnr eq '1234567890'"
+    snapshot_path: /var/lib/cmdb/systems_snapshot.json
+  register: result
 '''
 
 
@@ -67,9 +109,72 @@ systems:
       Systxt: "S/4HANA Development System"
       Insnr: "1234567890"
       Version: "73554900100800000266"
+count:
+  description:
+    - The number of systems retrieved.
+  returned: always
+  type: int
+  sample: 1
+delta:
+  description:
+    - The difference between the systems retrieved by this run and the snapshot in C(snapshot_path).
+  returned: when C(snapshot_path) is set
+  type: dict
+  contains:
+    added:
+      description: The systems that are not in the snapshot.
+      type: list
+      elements: dict
+    removed:
+      description: The systems of the snapshot that were not retrieved anymore, as stored in the snapshot.
+      type: list
+      elements: dict
+    modified:
+      description: The systems whose details differ from the snapshot, as retrieved by this run.
+      type: list
+      elements: dict
+  sample:
+    added:
+      - Sysnr: "0000123457"
+        sysid: "S4Q"
+    removed: []
+    modified: []
+http_stats:
+  description:
+    - Statistics of the open HTTP connection pools, of the retries and of coalesced requests.
+    - Fewer connections than requests means that connections were reused.
+  returned: when the HTTP client was created
+  type: dict
+  contains:
+    pools:
+      description: The number of open connection pools, one per host.
+      type: int
+    requests:
+      description: The number of HTTP requests sent, including retries and redirects.
+      type: int
+    connections:
+      description: The number of pooled HTTP connections created.
+      type: int
+    retries:
+      description: The number of retries of failed requests and downloads.
+      type: int
+    retry_wait:
+      description: The total number of seconds waited before retries.
+      type: float
+    coalesced:
+      description: The number of requests that were not sent, because they received the response of an identical concurrent request.
+      type: int
+  sample:
+    pools: 2
+    requests: 14
+    connections: 3
+    retries: 1
+    retry_wait: 2.4
+    coalesced: 0
 '''
 
 from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+from ..module_utils.client import http_client_argument_spec
 from ..module_utils.systems import main as systems_runner
 
 
@@ -78,13 +183,25 @@ def run_module():
         suser_id=dict(type='str', required=True),
         suser_password=dict(type='str', required=True, no_log=True),
         filter=dict(type='str', required=True),
+        fields=dict(type='list', elements='str'),
+        page_size=dict(type='int'),
+        max_results=dict(type='int'),
+        snapshot_path=dict(type='path'),
     )
+    module_args.update(http_client_argument_spec())
 
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[
+            ('snapshot_path', 'max_results'),
+        ],
         supports_check_mode=True
     )
 
+    for option in ('page_size', 'max_results'):
+        if module.params[option] is not None and module.params[option] < 1:
+            module.fail_json(msg=f"The option '{option}' must be at least 1.")
+
     result = systems_runner.run_systems_info(module.params)
 
     if result.get('failed'):
@@ -0,0 +1,98 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import client
+from ansible_collections.community.sap_launchpad.plugins.module_utils.systems import api
+
+requests = pytest.importorskip('requests')
+
+SYSTEMS = '{"d": {"results": [{"Sysnr": "0000000001"}]}}'
+
+
+def _batch_response(*operations):
+    parts = [
+        '--batchresponse_1\r\n'
+        'Content-Type: application/http\r\n'
+        'Content-Transfer-Encoding: binary\r\n'
+        '\r\n'
+        f'HTTP/1.1 {status}\r\n'
+        'Content-Type: application/json\r\n'
+        '\r\n'
+        f'{body}\r\n' for status, body in operations
+    ]
+    return ''.join(parts) + '--batchresponse_1--\r\n'
+
+
+BATCH_RESPONSE = _batch_response(('200 OK', SYSTEMS), ('404 Not Found', '{"error": {}}'))
+
+
+def test_build_odata_batch():
+    content_type, body = client.build_odata_batch(
+        ["Systems?$filter=Insnr eq '0020000000'", 'Installations'], {'Accept': 'application/json'})
+
+    boundary = content_type.split('boundary=')[1]
+    assert content_type.startswith('multipart/mixed; boundary=batch_')
+    parts = body.split(f'--{boundary}')
+    assert len(parts) == 4 and parts[3] == '--\r\n'
+    assert "GET Systems?$filter=Insnr%20eq%20'0020000000' HTTP/1.1\r\nAccept: application/json\r\n\r\n" in parts[1]
+    assert 'GET Installations HTTP/1.1\r\n' in parts[2]
+
+
+def test_parse_odata_batch():
+    operations = client.parse_odata_batch('multipart/mixed; boundary=batchresponse_1', BATCH_RESPONSE)
+
+    assert operations == [(200, SYSTEMS), (404, '{"error": {}}')]
+
+
+@pytest.mark.parametrize('content_type, body', [
+    ('application/json', '{}'),
+    ('multipart/mixed; boundary=batchresponse_1', '--batchresponse_1\r\nContent-Type: application/http\r\n\r\nnot a status line\r\n--batchresponse_1--'),
+])
+def test_parse_odata_batch_rejects_unexpected_responses(content_type, body):
+    with pytest.raises(ValueError):
+        client.parse_odata_batch(content_type, body)
+
+
+@pytest.fixture
+def batch_response(monkeypatch):
+    monkeypatch.setattr(api, '_BATCH_SUPPORTED', True)
+    posts = []
+
+    def respond(status_code, body=BATCH_RESPONSE):
+        def post(client_, query_path, **kwargs):
+            posts.append(query_path)
+            res = requests.Response()
+            res.status_code = status_code
+            res.headers['Content-Type'] = 'multipart/mixed; boundary=batchresponse_1'
+            res._content = body.encode('utf-8')
+            res.raise_for_status()
+            return res
+        monkeypatch.setattr(api, '_post_with_csrf_token', post)
+        return posts
+    return respond
+
+
+def test_batch_results(batch_response):
+    batch_response(200, _batch_response(('200 OK', SYSTEMS), ('404 Not Found', '{"error": {}}'), ('200 OK', SYSTEMS)))
+
+    assert api._batch_results(None, ['A', 'B', 'C']) == [[{'Sysnr': '0000000001'}], None, [{'Sysnr': '0000000001'}]]
+
+
+def test_batch_results_sends_few_operations_individually(batch_response):
+    posts = batch_response(200)
+
+    assert api._batch_results(None, ['A', 'B']) == [None, None]
+    assert posts == []
+
+
+@pytest.mark.parametrize('status_code, supported', [(400, True), (403, True), (500, True), (404, False), (405, False), (501, False)])
+def test_batch_results_detects_unsupported_service(batch_response, status_code, supported):
+    batch_response(status_code, json.dumps({'error': {}}))
+
+    assert api._batch_results(None, ['A', 'B', 'C']) == [None, None, None]
+    assert api._BATCH_SUPPORTED is supported
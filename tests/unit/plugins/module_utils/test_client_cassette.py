@@ -0,0 +1,66 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import http.server
+import json
+import threading
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import cassette, client
+
+pytest.importorskip('requests')
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'{"d": {"results": []}}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'JSESSIONID=secret-session; Path=/; Secure; HttpOnly')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.HTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://userapps.support.sap.com/sap/support/mp/trans?_=1700000000000', 'https://userapps.support.sap.com/sap/support/mp/trans'),
+    ("https://host/Systems?$filter=Insnr%20eq%20'1'&_=17&$top=10", "https://host/Systems?$filter=Insnr%20eq%20'1'&$top=10"),
+    ('https://host/path?__=1&_x=2', 'https://host/path?__=1&_x=2'),
+    ('https://host/path', 'https://host/path'),
+])
+def test_cassette_url(url, expected):
+    assert cassette._cassette_url(url) == expected
+
+
+def test_cassette_replays_requests_with_volatile_parameters_without_cookie_values(tmp_path, server):
+    cassette_path = str(tmp_path / 'cassette.jsonl')
+
+    recording = client.ApiClient(cassette_path=cassette_path)
+    assert recording.get(f'{server}/trans', params={'_': 1700000000000}).json() == {'d': {'results': []}}
+    assert recording.get_cookies().get('JSESSIONID') == 'secret-session'
+
+    cassette = (tmp_path / 'cassette.jsonl').read_text()
+    assert 'secret-session' not in cassette
+    entry = json.loads(cassette)
+    assert entry['url'] == f'{server}/trans'
+    assert ['Set-Cookie', 'JSESSIONID=recorded; Path=/; Secure; HttpOnly'] in entry['headers']
+
+    replaying = client.ApiClient(cassette_path=cassette_path, cassette_mode='replay')
+    res = replaying.get(f'{server}/trans', params={'_': 1700000099999})
+    assert res.json() == {'d': {'results': []}}
+    assert replaying.get_cookies().get('JSESSIONID') == 'recorded'
@@ -0,0 +1,115 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import client, exceptions
+
+HOST = 'launchpad.support.sap.com'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A wall clock that only advances when the test moves it.
+    now = [1000.0]
+    monkeypatch.setattr(client.time, 'time', lambda: now[0])
+    return now
+
+
+def _fail(breaker, times):
+    for _i in range(times):
+        breaker.before_request(HOST)
+        breaker.record_failure(HOST)
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = client.CircuitBreaker(failure_threshold=3, cooldown=60)
+
+    _fail(breaker, 2)
+    breaker.before_request(HOST)
+    breaker.record_success(HOST)
+    _fail(breaker, 2)
+    breaker.before_request(HOST)
+
+    breaker.record_failure(HOST)
+    with pytest.raises(exceptions.CircuitOpenError, match=r'suspended for \d+ seconds after 3 consecutive failures'):
+        breaker.before_request(HOST)
+    # Other hosts are not affected.
+    breaker.before_request('me.sap.com')
+
+
+def test_circuit_lets_one_probe_through_after_cooldown(clock):
+    breaker = client.CircuitBreaker(failure_threshold=1, cooldown=60)
+    _fail(breaker, 1)
+
+    clock[0] += 60
+    breaker.before_request(HOST)
+    with pytest.raises(exceptions.CircuitOpenError, match='until a probe request succeeds'):
+        breaker.before_request(HOST)
+
+    # A failed probe opens the circuit for another cooldown.
+    breaker.record_failure(HOST)
+    with pytest.raises(exceptions.CircuitOpenError, match=r'suspended for \d+ seconds'):
+        breaker.before_request(HOST)
+
+    # A successful probe closes the circuit.
+    clock[0] += 60
+    breaker.before_request(HOST)
+    breaker.record_success(HOST)
+    breaker.before_request(HOST)
+    breaker.before_request(HOST)
+
+
+def test_circuit_breaker_can_be_disabled(clock):
+    breaker = client.CircuitBreaker(failure_threshold=0)
+    _fail(breaker, 10)
+    breaker.before_request(HOST)
+
+
+def test_circuit_state_is_shared_on_transitions_only(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(client, '_CIRCUIT_STATE_SYNC_INTERVAL', 0)
+    writes = []
+    write_state = client.CircuitBreaker._write_state
+
+    def counting_write_state(self, host, state, change):
+        writes.append(host)
+        return write_state(self, host, state, change)
+
+    monkeypatch.setattr(client.CircuitBreaker, '_write_state', counting_write_state)
+    breaker = client.CircuitBreaker(failure_threshold=3, cooldown=60, state_dir=str(tmp_path))
+    other_process = client.CircuitBreaker(failure_threshold=3, cooldown=60, state_dir=str(tmp_path))
+
+    # Failures and requests of a closed circuit are not written.
+    _fail(breaker, 2)
+    assert writes == []
+    _fail(breaker, 1)
+    assert writes == [HOST]
+    assert json.loads((tmp_path / f'{HOST}.json').read_text())['failures'] == 3
+
+    with pytest.raises(exceptions.CircuitOpenError):
+        other_process.before_request(HOST)
+
+    # Only one of the processes lets a probe through.
+    clock[0] += 60
+    other_process.before_request(HOST)
+    with pytest.raises(exceptions.CircuitOpenError, match='until a probe request succeeds'):
+        breaker.before_request(HOST)
+
+    other_process.record_success(HOST)
+    breaker.before_request(HOST)
+    assert writes == [HOST] * 3
+
+
+def test_circuit_state_file_is_read_at_most_once_per_interval(tmp_path, clock, monkeypatch):
+    reads = []
+    read_state = client.CircuitBreaker._read_state
+    monkeypatch.setattr(client.CircuitBreaker, '_read_state', lambda self, host: reads.append(host) or read_state(self, host))
+    breaker = client.CircuitBreaker(failure_threshold=3, cooldown=60, state_dir=str(tmp_path))
+
+    for _i in range(10):
+        breaker.before_request(HOST)
+        breaker.record_success(HOST)
+    assert reads == [HOST]
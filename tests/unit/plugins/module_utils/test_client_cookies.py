@@ -0,0 +1,89 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import client, http_session
+from ansible_collections.community.sap_launchpad.plugins.module_utils.software_center import download
+
+requests = pytest.importorskip('requests')
+
+DOWNLOAD_URL = 'https://softwaredownloads.sap.com/file/0020000001739942021'
+
+
+def _cookie(name, value, domain=http_session._DOWNLOAD_COOKIE_DOMAIN):
+    return requests.cookies.create_cookie(name, value, domain=domain, path='/')
+
+
+def _cookie_header(jar, url=DOWNLOAD_URL):
+    return requests.cookies.get_cookie_header(jar, requests.Request('GET', url).prepare())
+
+
+def test_download_cookies_are_discarded_after_the_context():
+    jar = http_session._DownloadCookieJar()
+    jar.set_cookie(_cookie('IDP_SESSION', 'shared', domain='accounts.sap.com'))
+
+    with jar.download_context():
+        jar.set_cookie(_cookie('SESSIONID', 'download-session'))
+        jar.set_cookie(_cookie('fileToken', 'file-1'))
+        assert {c.name for c in jar} == {'IDP_SESSION', 'SESSIONID', 'fileToken'}
+        assert _cookie_header(jar) == 'SESSIONID=download-session; fileToken=file-1'
+
+    # The SESSIONID holds the download session and is kept for the next file.
+    assert {c.name for c in jar} == {'IDP_SESSION', 'SESSIONID'}
+    assert _cookie_header(jar) == 'SESSIONID=download-session'
+
+
+def test_download_cookies_outside_a_context_are_shared():
+    jar = http_session._DownloadCookieJar()
+    jar.set_cookie(_cookie('fileToken', 'file-1'))
+    assert _cookie_header(jar) == 'fileToken=file-1'
+
+
+def test_concurrent_download_contexts_are_isolated():
+    jar = http_session._DownloadCookieJar()
+    barrier = threading.Barrier(2)
+    headers = {}
+
+    def download(name):
+        with jar.download_context():
+            jar.set_cookie(_cookie('fileToken', name))
+            # Both threads have set their cookie before either sends its request.
+            barrier.wait(10)
+            headers[name] = _cookie_header(jar)
+            barrier.wait(10)
+
+    threads = [threading.Thread(target=download, args=(name,)) for name in ('file-1', 'file-2')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert headers == {'file-1': 'fileToken=file-1', 'file-2': 'fileToken=file-2'}
+    assert list(jar) == []
+
+
+def test_api_client_download_cookies():
+    api_client = client.ApiClient()
+    with api_client.download_cookies():
+        api_client.get_cookies().set_cookie(_cookie('fileToken', 'file-1'))
+        assert api_client.get_cookies().get('fileToken') == 'file-1'
+    assert api_client.get_cookies().get('fileToken') is None
+
+
+def test_clear_download_session_clears_the_download_context():
+    jar = http_session._DownloadCookieJar()
+    jar.set_cookie(_cookie('IDP_SESSION', 'shared', domain='accounts.sap.com'))
+
+    with jar.download_context():
+        jar.set_cookie(_cookie('SESSIONID', 'download-session', domain='.softwaredownloads.sap.com'))
+        jar.set_cookie(_cookie('fileToken', 'file-1', domain='.softwaredownloads.sap.com'))
+        download._clear_download_session(jar)
+        assert [c.name for c in jar] == ['IDP_SESSION']
+        assert _cookie_header(jar) is None
+
+        # Clearing again, without any cookies of the download domain left, is not an error.
+        download._clear_download_session(jar)
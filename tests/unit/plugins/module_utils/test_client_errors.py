@@ -0,0 +1,43 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import io
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import client, exceptions
+
+
+@pytest.mark.parametrize('status_code, body_head, exception_type', [
+    (403, b'<html><p>You are not authorized to download this file</p></html>', exceptions.AuthorizationError),
+    (403, b'<title>Account Temporarily Locked Out</title>', exceptions.AuthenticationError),
+    (404, b'<h1>The file you have requested cannot be found</h1>', exceptions.FileNotFoundError),
+])
+def test_classify_error_response(status_code, body_head, exception_type):
+    error = client.classify_error_response(status_code, body_head)
+    assert isinstance(error, exception_type)
+
+
+@pytest.mark.parametrize('status_code, body_head', [
+    (403, b'<html>Forbidden</html>'),
+    (404, b'You are not authorized to download this file'),
+    (500, b'The file you have requested cannot be found'),
+    (403, b''),
+])
+def test_classify_error_response_ignores_unknown_errors(status_code, body_head):
+    assert client.classify_error_response(status_code, body_head) is None
+
+
+def test_peek_body_keeps_streamed_body_readable():
+    requests = pytest.importorskip('requests')
+    urllib3 = pytest.importorskip('urllib3')
+    body = b'The file you have requested cannot be found' + b'x' * (2 * client._ERROR_SNIFF_SIZE)
+    res = requests.Response()
+    res.raw = urllib3.HTTPResponse(body=io.BytesIO(body), preload_content=False)
+
+    body_head = client._peek_body(res, stream=True)
+
+    # Only the first bytes are read, the complete body can still be read.
+    assert body_head == body[:client._ERROR_SNIFF_SIZE]
+    assert b''.join(res.iter_content(chunk_size=1000)) == body
@@ -0,0 +1,118 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import threading
+import time
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils import client
+
+requests = pytest.importorskip('requests')
+
+URL = 'https://softwaredownloads.sap.com/file/0020000001739942021'
+
+
+def _coalesce(api_client, send):
+    # Sends the same GET request from a leader and a follower thread, each in its own download context,
+    # and returns the results of both. The leader's request only completes once the follower waits for it.
+    def waiting_send(method, url, **kwargs):
+        deadline = time.monotonic() + 10
+        while api_client._single_flight.shared < 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return send()
+
+    api_client._send = waiting_send
+    outcomes = {}
+
+    def call(name):
+        with api_client.download_cookies():
+            try:
+                outcomes[name] = api_client.get(URL)
+            except Exception as e:
+                outcomes[name] = e
+            outcomes[name + '_cookies'] = {c.name: c.value for c in api_client.get_cookies()}
+
+    leader = threading.Thread(target=call, args=('leader',))
+    leader.start()
+    while not api_client._single_flight._calls:
+        time.sleep(0.001)
+    follower = threading.Thread(target=call, args=('follower',))
+    follower.start()
+    leader.join(10)
+    follower.join(10)
+    return outcomes
+
+
+def _response(status_code=200):
+    res = requests.Response()
+    res.status_code = status_code
+    res.url = URL
+    res.headers['Content-Type'] = 'text/plain'
+    res._content = b'file content'
+    res.cookies.set_cookie(requests.cookies.create_cookie('FILETOKEN', 'abc', domain='softwaredownloads.sap.com'))
+    return res
+
+
+def test_followers_receive_own_response_and_cookies():
+    api_client = client.ApiClient()
+    leader_response = _response()
+
+    outcomes = _coalesce(api_client, lambda: leader_response)
+
+    assert outcomes['leader'] is leader_response
+    follower_response = outcomes['follower']
+    assert follower_response is not leader_response
+    assert follower_response.content == b'file content'
+    assert follower_response.raw is None
+    follower_response.headers['Content-Type'] = 'changed'
+    assert leader_response.headers['Content-Type'] == 'text/plain'
+    # The per-file cookie of the response is stored in the download context of the follower.
+    assert outcomes['follower_cookies'] == {'FILETOKEN': 'abc'}
+    assert api_client.get_stats()['coalesced'] == 1
+
+
+def test_followers_receive_own_exception():
+    api_client = client.ApiClient()
+
+    def send():
+        res = _response(503)
+        res.raise_for_status()
+
+    outcomes = _coalesce(api_client, send)
+
+    leader_error, follower_error = outcomes['leader'], outcomes['follower']
+    assert isinstance(follower_error, requests.HTTPError)
+    assert follower_error is not leader_error
+    assert follower_error.__cause__ is leader_error
+    assert follower_error.response is not leader_error.response
+    assert follower_error.response.status_code == 503
+
+
+def test_download_contexts_with_different_cookies_are_not_coalesced():
+    api_client = client.ApiClient()
+    started = threading.Barrier(2, timeout=10)
+    sent_cookies = []
+
+    def send(method, url, **kwargs):
+        # Both requests are in flight at the same time, so they would be coalesced with the same key.
+        sent_cookies.append(dict(api_client.get_cookies()))
+        started.wait()
+        return _response()
+
+    api_client._send = send
+
+    def call(token):
+        with api_client.download_cookies():
+            api_client.get_cookies().set_cookie(requests.cookies.create_cookie('FILETOKEN', token, domain='softwaredownloads.sap.com'))
+            api_client.get(URL)
+
+    threads = [threading.Thread(target=call, args=(token,)) for token in ('abc', 'def')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(cookies['FILETOKEN'] for cookies in sent_cookies) == ['abc', 'def']
+    assert api_client.get_stats()['coalesced'] == 0
@@ -0,0 +1,180 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import html
+import io
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils.maintenance_planner import api
+
+lxml = pytest.importorskip('lxml')
+
+FILES_XML = '''<mnp:response xmlns:mnp="http://xml.sap.com/2012/01/mnp">
+<mnp:entity id="general" label="General"><mnp:entity id="ignored" label="not-a-file"/></mnp:entity>
+<mnp:entity id="stack_files" label="Stack Files">
+<mnp:entity id="0020000001739942021" label="IMDB_SERVER20_060_0-80002031.SAR"/>
+<mnp:entity id="0010000001440232021" label="KD75379.SAR"/>
+</mnp:entity>
+</mnp:response>'''
+
+EXPECTED_FILES = [
+    ('https://softwaredownloads.sap.com/file/0020000001739942021', 'IMDB_SERVER20_060_0-80002031.SAR'),
+    ('https://softwaredownloads.sap.com/file/0010000001440232021', 'KD75379.SAR'),
+]
+
+
+def test_iter_stack_files_yields_stack_files_only():
+    files = list(api.iter_stack_files(io.BytesIO(FILES_XML.encode('utf-8'))))
+    assert files == EXPECTED_FILES
+
+
+def test_iter_stack_files_without_stack_files_entity():
+    xml = '<mnp:response xmlns:mnp="http://xml.sap.com/2012/01/mnp"><mnp:entity id="general"/></mnp:response>'
+    assert list(api.iter_stack_files(io.BytesIO(xml.encode('utf-8')))) == []
+
+
+def test_iter_stack_files_releases_processed_elements():
+    entities = ''.join(f'<mnp:entity id="{i:019d}" label="FILE{i}.SAR"/>' for i in range(1000))
+    xml = f'<mnp:response xmlns:mnp="http://xml.sap.com/2012/01/mnp"><mnp:entity id="stack_files">{entities}</mnp:entity></mnp:response>'
+
+    files = api.iter_stack_files(io.BytesIO(xml.encode('utf-8')))
+    for _i in range(999):
+        next(files)
+    _url, filename = next(files)
+    assert filename == 'FILE999.SAR'
+
+    # The parser is paused at the last file. Only the file before it, which is released when the
+    # generator resumes, may still be attached to the parent.
+    elem = files.gi_yieldfrom.gi_frame.f_locals['elem']
+    assert len(elem.getparent()) <= 2
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_stack_files_are_parsed_from_escaped_text_chunks(chunk_size):
+    text = html.escape('\ufeff' + FILES_XML.replace('KD75379', 'KD75379&amp;1'), quote=False)
+    chunks = (text[i:i + chunk_size].replace('\ufeff', '') for i in range(0, len(text), chunk_size))
+
+    files = list(api._iter_stack_files_from_text(api._iter_unescaped(chunks)))
+    assert files == [EXPECTED_FILES[0], (EXPECTED_FILES[1][0], 'KD75379&1.SAR')]
+
+
+def test_download_transaction_files_xml_is_readable_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, '_get_download_files_xml', lambda client, trans_id: FILES_XML)
+
+    output_file, changed = api.download_transaction_files_xml(None, 'TRANS', str(tmp_path), 'MP_TEST_files.xml')
+    assert changed is True
+    assert output_file == str(tmp_path / 'MP_TEST_files.xml')
+    assert list(api.iter_stack_files(output_file)) == EXPECTED_FILES
+
+    # An unchanged files XML keeps the existing file.
+    assert api.download_transaction_files_xml(None, 'TRANS', str(tmp_path), 'MP_TEST_files.xml') == (output_file, False)
+    assert [p.name for p in tmp_path.iterdir()] == ['MP_TEST_files.xml']
+
+
+def test_write_file_if_changed_reports_only_file_errors(tmp_path):
+    requests = pytest.importorskip('requests')
+
+    def broken_response():
+        yield b'<mnp:response'
+        raise requests.exceptions.ChunkedEncodingError('Connection broken')
+
+    # Errors of the response are raised as they are, although requests exceptions are OSErrors as well.
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        api._write_file_if_changed(broken_response(), str(tmp_path / 'MP_TEST_files.xml'))
+
+    (tmp_path / 'MP_TEST_files.xml').mkdir()
+    with pytest.raises(api.exceptions.DownloadError, match='Failed to write to destination file'):
+        api._write_file_if_changed([b'<mnp:response/>'], str(tmp_path / 'MP_TEST_files.xml'))
+    assert [p.name for p in tmp_path.iterdir()] == ['MP_TEST_files.xml']
+
+
+def test_mp_request_closes_the_redirect_before_reauthentication(monkeypatch):
+    requests = pytest.importorskip('requests')
+    redirect = requests.Response()
+    redirect.status_code = 302
+    redirect.headers['location'] = api.C.URL_ACCOUNT + '/saml2/idp/sso'
+    redirect.raw = io.BytesIO(b'')
+    responses = [redirect, requests.Response()]
+    closed_before_auth = []
+
+    class Client:
+        def request(self, method, url, **kwargs):
+            return responses.pop(0)
+
+    monkeypatch.setattr(api, '_get_xsrf_token', lambda client: 'token')
+    monkeypatch.setattr(api, 'auth_userapps', lambda client: closed_before_auth.append(redirect.raw.closed))
+
+    res = api._mp_request(Client(), params={'action': 'getTransactions'})
+    assert closed_before_auth == [True]
+    assert res is not redirect
+
+
+TRANSACTIONS = [
+    {'trans_id': 'A', 'trans_name': 'MP_NEW_INST_20211015_044854', 'trans_display_id': '1', 'sid': 'S4H', 'changed_on': '20240105120000'},
+    {'trans_id': 'B', 'trans_name': 'MP_UPGRADE_20230301_101010', 'trans_display_id': '2', 'sid': 'BWP'},
+    {'trans_id': 'C', 'trans_name': 'Renamed plan', 'trans_display_id': '3', 'sid': 'S4H', 'created_on': '/Date(1704067200000)/'},
+]
+
+
+@pytest.fixture
+def transactions():
+    index = api._TransactionIndex()
+    index.refresh([api._add_transaction_timestamps(dict(t)) for t in TRANSACTIONS])
+    original = api._MP_TRANSACTIONS
+    api._MP_TRANSACTIONS = index
+    yield index
+    api._MP_TRANSACTIONS = original
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('20211015044854', '20211015044854'),
+    ('2024-01-31', '20240131000000'),
+    ('2024-01-31T12:30:15.123Z', '20240131123015'),
+    ('/Date(1704067200000)/', '20240101000000'),
+    ('yesterday', None),
+    ('', None),
+    (None, None),
+])
+def test_sortable_timestamp(value, expected):
+    assert api._sortable_timestamp(value) == expected
+
+
+def test_transaction_timestamps(transactions):
+    by_id = {t['trans_id']: t for t in transactions.values()}
+    assert (by_id['A']['created_at'], by_id['A']['changed_at']) == ('20211015044854', '20240105120000')
+    assert (by_id['B']['created_at'], by_id['B']['changed_at']) == ('20230301101010', '20230301101010')
+    assert (by_id['C']['created_at'], by_id['C']['changed_at']) == ('20240101000000', '20240101000000')
+
+
+def test_query_transactions_by_sid_and_change_date(transactions):
+    latest = api.query_transactions(None, sid=['S4H'], sort_by='changed_at', descending=True, limit=1)
+    assert [t['trans_id'] for t in latest] == ['A']
+
+    changed = api.query_transactions(None, changed_since='2023-06-01', sort_by='changed_at')
+    assert [t['trans_id'] for t in changed] == ['C', 'A']
+
+
+def test_query_transactions_without_status_attribute(transactions):
+    with pytest.raises(api.exceptions.SapLaunchpadError, match='no status attribute'):
+        api.query_transactions(None, status=['Completed'])
+
+
+def test_transactions_cache_reports_changes_since_the_previous_run(tmp_path, transactions):
+    api.save_transactions_cache(str(tmp_path), 'S0001')
+
+    # A later run starts with an empty index, restores the cache and merges the current list.
+    api._MP_TRANSACTIONS = api._TransactionIndex()
+    api.load_transactions_cache(str(tmp_path), 'S0001')
+    current = [dict(t) for t in TRANSACTIONS if t['trans_id'] != 'B']
+    current[0]['changed_on'] = '20240201000000'
+    current.append({'trans_id': 'D', 'trans_name': 'MP_NEW_INST_20240301_000000', 'trans_display_id': '4'})
+
+    changes = api._MP_TRANSACTIONS.refresh([api._add_transaction_timestamps(t) for t in current])
+    assert changes == {'added': ['D'], 'changed': ['A'], 'removed': ['B']}
+
+    # The cache of another user is not used.
+    api._MP_TRANSACTIONS = api._TransactionIndex()
+    api.load_transactions_cache(str(tmp_path), 'S0002')
+    assert api._MP_TRANSACTIONS.values() == []
@@ -0,0 +1,149 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import asyncio
+import contextlib
+import threading
+import time
+
+from types import SimpleNamespace
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils.maintenance_planner import main
+
+FILES = [(f'https://softwaredownloads.sap.com/file/{i}', f'FILE{i}.SAR') for i in range(20)]
+
+
+def _fake_download_file(client, direct_link, filename, dest, validate_checksum):
+    time.sleep(0.001)
+    if filename == 'FILE3.SAR':
+        raise OSError('Permission denied')
+    entry = main._new_download_entry(direct_link, filename)
+    entry['changed'] = True
+    return entry
+
+
+def _run_in_thread(func, *args):
+    # Runs the pipeline in a thread, so that a deadlock fails the test instead of hanging it.
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func(*args)
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive(), 'The download pipeline did not finish'
+    return outcome
+
+
+def test_download_pipeline_reports_exceptions_as_failed_entries(monkeypatch):
+    monkeypatch.setattr(main, '_download_file', _fake_download_file)
+
+    outcome = _run_in_thread(main._download_pipeline, None, iter(FILES), '/tmp', False, 2)
+
+    results = outcome['result']
+    assert [r['Filename'] for r in results] == [filename for _link, filename in FILES]
+    assert [r['Filename'] for r in results if r['failed']] == ['FILE3.SAR']
+    assert 'Permission denied' in results[3]['msg']
+    assert all(r['changed'] for r in results if not r['failed'])
+
+
+def test_download_pipeline_bounds_the_producer(monkeypatch):
+    started = []
+    produced = []
+    release = threading.Event()
+
+    def blocked_download_file(client, direct_link, filename, dest, validate_checksum):
+        started.append(filename)
+        release.wait(10)
+        return main._new_download_entry(direct_link, filename)
+
+    def producer():
+        for item in FILES:
+            produced.append(item)
+            yield item
+
+    monkeypatch.setattr(main, '_download_file', blocked_download_file)
+    thread = threading.Thread(target=main._download_pipeline, args=(None, producer(), '/tmp', False, 2), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    # Two downloads are running and two more are queued, the producer waits for the fifth entry.
+    assert len(produced) == 5
+    release.set()
+    thread.join(10)
+    assert len(produced) == len(FILES)
+
+
+def test_download_pipeline_completes_started_downloads_if_the_iterable_fails(monkeypatch):
+    downloaded = []
+
+    def recording_download_file(client, direct_link, filename, dest, validate_checksum):
+        downloaded.append(filename)
+        return main._new_download_entry(direct_link, filename)
+
+    def failing_producer():
+        yield from FILES[:3]
+        raise RuntimeError('files XML is truncated')
+
+    monkeypatch.setattr(main, '_download_file', recording_download_file)
+
+    outcome = _run_in_thread(main._download_pipeline, None, failing_producer(), '/tmp', False, 2)
+
+    assert str(outcome['error']) == 'files XML is truncated'
+    assert sorted(downloaded) == ['FILE0.SAR', 'FILE1.SAR', 'FILE2.SAR']
+
+
+def test_async_download_pipeline_reports_exceptions_as_failed_entries(monkeypatch):
+    pytest.importorskip('aiohttp')
+    from ansible_collections.community.sap_launchpad.plugins.module_utils.client import ApiClient
+
+    async def fake_async_download_file(async_client, direct_link, filename, dest, validate_checksum):
+        return _fake_download_file(None, direct_link, filename, dest, validate_checksum)
+
+    monkeypatch.setattr(main, '_async_download_file', fake_async_download_file)
+
+    results = asyncio.run(main._async_download_pipeline(ApiClient(), iter(FILES), '/tmp', False, 4))
+
+    assert [r['Filename'] for r in results] == [filename for _link, filename in FILES]
+    assert [r['Filename'] for r in results if r['failed']] == ['FILE3.SAR']
+
+
+def test_download_file_skips_existing_files_and_reports_errors(tmp_path, monkeypatch):
+    (tmp_path / 'FILE1.SAR').write_bytes(b'existing')
+    (tmp_path / 'FILE2.ZIP').write_bytes(b'similar')
+
+    def unavailable_link(client, direct_link):
+        raise main.exceptions.DownloadError('Download link is not available')
+
+    monkeypatch.setattr(main.download, 'is_download_link_available', unavailable_link)
+    client = SimpleNamespace(download_cookies=contextlib.nullcontext)
+
+    entries = [main._download_result(link, filename, result) for link, filename, result in [
+        (link, filename, main._download_file(client, link, filename, str(tmp_path), False))
+        for link, filename in FILES[1:3]
+    ]]
+    assert [(e['skipped'], e['msg']) for e in entries] == [
+        (True, 'File already exists: FILE1.SAR'),
+        (True, 'Similar file(s) already exist: FILE2.ZIP'),
+    ]
+
+    with pytest.raises(main.exceptions.DownloadError) as error:
+        main._download_file(client, FILES[3][0], 'FILE3.SAR', str(tmp_path), False)
+    entry = main._download_result(FILES[3][0], 'FILE3.SAR', error.value)
+    assert (entry['failed'], entry['msg']) == (True, 'Download link is not available')
+
+
+def test_files_xml_rejects_a_stack_xml(tmp_path):
+    pytest.importorskip('lxml')
+    src = tmp_path / 'MP_NEW_INST_stack.xml'
+    src.write_text('<?xml version="1.0" encoding="UTF-8"?><stack-configuration><component name="SAP_BASIS"/></stack-configuration>')
+
+    result = main.run_files_xml({'src': str(src)})
+    assert result['failed']
+    assert result['msg'].startswith(f'No stack files found in {src}. The files XML')
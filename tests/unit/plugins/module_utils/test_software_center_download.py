@@ -0,0 +1,74 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import io
+import socket
+import threading
+import time
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils.software_center import download
+
+requests = pytest.importorskip('requests')
+
+
+@pytest.fixture
+def trickle_server():
+    # Serves a body of 64 KiB, of which it sends one byte every 10 milliseconds.
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    stop = threading.Event()
+
+    def serve():
+        conn, _addr = server.accept()
+        with conn:
+            conn.recv(65536)
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 65536\r\nContent-Type: application/octet-stream\r\n\r\n')
+            while not stop.is_set():
+                try:
+                    conn.sendall(b'x')
+                except OSError:
+                    return
+                time.sleep(0.01)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.getsockname()[1]}/file.SAR'
+    stop.set()
+    server.close()
+
+
+def test_write_response_body_aborts_trickling_transfer(trickle_server):
+    res = requests.get(trickle_server, stream=True, timeout=5)
+    f = io.BytesIO()
+    started = time.monotonic()
+    with pytest.raises(download._TransferTooSlowError):
+        download._write_response_body(res, f, 1024, 1)
+    res.close()
+
+    # A full chunk of 64 KiB would take more than ten minutes at this rate.
+    assert time.monotonic() - started < 5
+    assert 0 < len(f.getvalue()) < 1024
+
+
+class _ReadOnlyRaw:
+    # A raw stream of urllib3 versions without read1.
+    def __init__(self, raw):
+        self._raw = raw
+
+    def read(self, amt=None, decode_content=None):
+        return self._raw.read(amt, decode_content=decode_content)
+
+
+@pytest.mark.parametrize('wrap', [lambda raw: raw, _ReadOnlyRaw])
+def test_write_response_body_writes_complete_body(wrap):
+    urllib3 = pytest.importorskip('urllib3')
+    res = requests.Response()
+    res.raw = wrap(urllib3.HTTPResponse(body=io.BytesIO(b'x' * 200000), preload_content=False))
+    f = io.BytesIO()
+
+    download._write_response_body(res, f, 1024, 1)
+    assert f.getvalue() == b'x' * 200000
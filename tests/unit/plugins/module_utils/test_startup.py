@@ -0,0 +1,58 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+RUNNERS = [
+    'ansible_collections.community.sap_launchpad.plugins.module_utils.software_center.main',
+    'ansible_collections.community.sap_launchpad.plugins.module_utils.maintenance_planner.main',
+    'ansible_collections.community.sap_launchpad.plugins.module_utils.systems.main',
+]
+
+# Dependencies that are only imported when a module run sends requests, parses HTML or XML, or uses the asyncio engine.
+DEFERRED_IMPORTS = ['requests', 'urllib3', 'bs4', 'lxml', 'aiohttp', 'asyncio']
+
+
+def _run_python(code):
+    # Runs code in a new interpreter with the import path of the tests.
+    # Returns its output and the cumulative import time in microseconds of each top-level import.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, capture_output=True, text=True, timeout=60, check=True)
+    import_times = {}
+    for line in proc.stderr.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            name = fields[2][1:]
+            if not name.startswith(' '):
+                import_times[name] = int(fields[1])
+    return proc.stdout, import_times
+
+
+@pytest.mark.parametrize('runner', RUNNERS)
+def test_runner_import_defers_dependencies(runner):
+    output, _import_times = _run_python(
+        f'import json, sys\nimport {runner}\nprint(json.dumps([n for n in {DEFERRED_IMPORTS!r} if n in sys.modules]))'
+    )
+    assert json.loads(output) == []
+
+
+def test_runner_import_time():
+    # Startup benchmark: importing all runners takes less time than importing the dependencies they defer,
+    # both measured in the same interpreter.
+    # bs4 also imports lxml, if it is installed.
+    for name in ('requests', 'bs4'):
+        pytest.importorskip(name)
+
+    _output, import_times = _run_python('\n'.join(
+        [f'import {runner}' for runner in RUNNERS] + ['import requests', 'import bs4']
+    ))
+    runners_time = sum(import_times[runner] for runner in RUNNERS)
+    deferred_time = sum(import_times[name] for name in ('requests', 'bs4'))
+    print(f'Import of the runners: {runners_time / 1000:.1f} ms, of the deferred dependencies: {deferred_time / 1000:.1f} ms')
+    assert runners_time < deferred_time
@@ -0,0 +1,168 @@
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import threading
+
+import pytest
+
+from ansible_collections.community.sap_launchpad.plugins.module_utils.systems import main
+
+
+def _entry(system_nr=None, sid=None):
+    return {'installation_nr': '0020000000', 'system_nr': system_nr, 'system_data': {'sysid': sid} if sid else None}
+
+
+def test_system_key_groups_entries_by_number_and_sid(monkeypatch):
+    lookups = []
+
+    def get_systems(client, filter_str):
+        lookups.append(filter_str)
+        return [{'Sysnr': '0000000001'}] if "sysid eq 'S4H'" in filter_str else []
+
+    monkeypatch.setattr(main.api, 'get_systems', get_systems)
+    entries = [_entry(system_nr='0000000001'), _entry(sid='S4H'), _entry(sid='S4H'), _entry(sid='NEW'), _entry()]
+
+    main._resolve_sids(None, entries, 4)
+    keys = [main._system_key(index, entry) for index, entry in enumerate(entries)]
+
+    # The SID of an existing system is looked up once and grouped with its system number.
+    assert len(lookups) == 2
+    assert keys[0] == keys[1] == keys[2]
+    assert keys[3] == ('0020000000', 'sysid', 'NEW')
+    assert keys[4] == ('new', 4)
+
+
+def test_version_is_only_resolved_for_new_systems(monkeypatch):
+    resolved = []
+    monkeypatch.setattr(main.api, 'validate_installation', lambda *args: None)
+    monkeypatch.setattr(main.api, 'get_system_and_licenses', lambda *args: (
+        {'Version': '73554900100800000266', 'sysid': 'S4H', 'systype': 'PRODUCTION'}, []))
+    monkeypatch.setattr(main, '_resolve_version_id', lambda *args: resolved.append(args))
+
+    params = dict(_entry(sid='S4H'), suser_id='S0001', state='present', licenses=[], sid_systems=[{'Sysnr': '0000000001'}])
+    result = {'changed': False, 'failed': False, 'warnings': []}
+    main._ensure_license_keys(None, params, result, 1)
+
+    assert resolved == []
+    assert result['msg'] == 'System already present. No licenses specified to update.'
+
+
+def test_snapshot_is_written_by_systems_export_only(tmp_path, monkeypatch):
+    pytest.importorskip('requests')
+    systems = [{'Sysnr': '0000000001', 'sysid': 'S4H'}]
+    monkeypatch.setattr(main.auth, 'login', lambda *args: None)
+    monkeypatch.setattr(main.api, 'iter_systems', lambda *args: iter(systems))
+    snapshot_path = str(tmp_path / 'snapshot.json')
+    params = {'suser_id': 'S0001', 'suser_password': 'secret', 'filter': "Insnr eq '0020000000'"}
+
+    result = main.run_systems_info(dict(params, snapshot_path=snapshot_path))
+    assert (result['changed'], result['delta']['added']) == (False, systems)
+    assert not (tmp_path / 'snapshot.json').exists()
+
+    result = main.run_systems_export(dict(params, dest=snapshot_path, format='snapshot'))
+    assert (result['changed'], result['count'], result['delta']['added']) == (True, 1, systems)
+    assert json.loads((tmp_path / 'snapshot.json').read_text())['systems'] == {'0000000001': systems[0]}
+
+    systems[0] = {'Sysnr': '0000000001', 'sysid': 'S4Q'}
+    result = main.run_systems_info(dict(params, snapshot_path=snapshot_path))
+    assert (result['changed'], result['delta']['modified']) == (False, systems)
+
+
+@pytest.mark.parametrize('runner', [main.run_systems_info, main.run_systems_export, main.run_license_keys])
+def test_invalid_http_client_options_fail_the_run(tmp_path, runner):
+    pytest.importorskip('requests')
+    params = {'suser_id': 'S0001', 'suser_password': 'secret', 'filter': '', 'dest': str(tmp_path / 'systems.jsonl'), 'retries': -1}
+
+    result = runner(params)
+    assert result['failed'] is True
+    assert result['msg'] == "The option 'retries' must not be negative."
+
+
+class _PagedClient:
+    # Returns the OData pages of a systems query in order and records the requested URLs.
+    def __init__(self, pages):
+        self.pages = pages
+        self.urls = []
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        page = self.pages[min(len(self.urls), len(self.pages)) - 1]
+        return type('Response', (), {'json': lambda self: {'d': page}})()
+
+
+def test_iter_systems_stops_when_the_backend_ignores_skip():
+    pytest.importorskip('requests')
+    page = {'results': [{'Sysnr': '0000000001'}, {'Sysnr': '0000000002'}]}
+    client = _PagedClient([page])
+
+    systems = list(main.api.iter_systems(client, "Insnr eq '0020000000'", page_size=2))
+    assert systems == page['results']
+    assert len(client.urls) == 2
+
+
+def test_iter_systems_continues_skip_after_next_links():
+    pytest.importorskip('requests')
+    client = _PagedClient([
+        {'results': [{'Sysnr': '0000000001'}, {'Sysnr': '0000000002'}], '__next': 'Systems?$skiptoken=2'},
+        {'results': [{'Sysnr': '0000000003'}, {'Sysnr': '0000000004'}]},
+        {'results': []},
+    ])
+
+    systems = list(main.api.iter_systems(client, "Insnr eq '0020000000'", page_size=2))
+    assert [system['Sysnr'] for system in systems] == ['0000000001', '0000000002', '0000000003', '0000000004']
+    assert client.urls[1].endswith('Systems?$skiptoken=2')
+    assert client.urls[2].endswith('$top=2&$skip=4')
+
+
+def _patch_new_system_api(monkeypatch, existing_systems, product_error=None):
+    # Records the API calls of _ensure_license_keys. The installation check waits until the product lookup
+    # has started, so both have to run at the same time.
+    calls = []
+    product_started = threading.Event()
+
+    def validate_installation(*args):
+        calls.append(('installation', product_started.wait(5)))
+
+    def get_product_id(client, product_name, installation_nr, username):
+        product_started.set()
+        calls.append(('product', product_name))
+        if product_error:
+            raise product_error
+        return 'S4HANA'
+
+    monkeypatch.setattr(main.api, 'validate_installation', validate_installation)
+    monkeypatch.setattr(main.api, 'get_product_id', get_product_id)
+    monkeypatch.setattr(main.api, 'get_systems', lambda *args: existing_systems)
+    monkeypatch.setattr(main.api, 'get_version_id', lambda client, version, product_id, *args: calls.append(('version', product_id)) or 'V1')
+    monkeypatch.setattr(main.api, 'validate_system_data', lambda *args: ({'sysid': 'NEW'}, None))
+    monkeypatch.setattr(main.api, 'validate_licenses', lambda *args: [])
+    monkeypatch.setattr(main.api, 'generate_licenses', lambda *args: [])
+    monkeypatch.setattr(main.api, 'submit_system', lambda *args: '0000000002')
+    monkeypatch.setattr(main.api, 'get_system_and_licenses', lambda *args: (
+        {'Version': 'V1', 'sysid': 'S4H', 'systype': 'PRODUCTION'}, []))
+    return calls
+
+
+def test_product_is_looked_up_with_the_installation_check_for_new_systems(monkeypatch):
+    calls = _patch_new_system_api(monkeypatch, [])
+    params = dict(_entry(sid='NEW'), suser_id='S0001', state='present', licenses=[],
+                  product_name='SAP S/4HANA', product_version='SAP S/4HANA 2023')
+    result = {'changed': False, 'failed': False, 'warnings': []}
+    main._ensure_license_keys(None, params, result, 2)
+
+    assert ('installation', True) in calls
+    assert calls[-1] == ('version', 'S4HANA')
+    assert result['msg'] == 'System 0000000002 created successfully.'
+
+
+def test_product_lookup_error_is_ignored_for_existing_systems(monkeypatch):
+    _patch_new_system_api(monkeypatch, [{'Sysnr': '0000000001'}], product_error=main.exceptions.SapLaunchpadError('Unknown product'))
+    params = dict(_entry(sid='S4H'), suser_id='S0001', state='present', licenses=[],
+                  product_name='Unknown product', product_version='1')
+    result = {'changed': False, 'failed': False, 'warnings': []}
+    main._ensure_license_keys(None, params, result, 2)
+
+    assert not result['failed']
+    assert result['msg'] == 'System already present. No licenses specified to update.'